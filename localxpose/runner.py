@@ -1,146 +1,1215 @@
+import asyncio
 import http.server
 import json
 import os
+import random
 import re
 import signal
+import socket
 import subprocess
 import threading
 import time
-from typing import Dict, List
+from http import HTTPStatus
+from collections import deque
+from typing import Callable, Deque, Dict, Generic, List, Optional, Tuple, TypeVar
+from urllib.parse import parse_qs, urlsplit
 
-status: Dict[str, object] = {
-    "online": False,
-    "public_url": None,
-    "error": "",
-    "process_exited": False,
-    "pid": None,
-}
-_logs: List[str] = []
-_proc: subprocess.Popen | None = None
+LOG_CAPACITY = 200
+# Restart delays grow from BACKOFF_MIN to BACKOFF_MAX seconds; a run that
+# lasted STABLE_AFTER seconds counts as healthy and resets the backoff.
+BACKOFF_MIN = float(os.environ.get("LOCALXPOSE_BACKOFF_MIN", "1"))
+BACKOFF_MAX = float(os.environ.get("LOCALXPOSE_BACKOFF_MAX", "60"))
+STABLE_AFTER = float(os.environ.get("LOCALXPOSE_STABLE_AFTER", "60"))
+# "threads" (ThreadingHTTPServer plus a reader thread per tunnel) or
+# "asyncio" (everything on one event loop).
+RUNNER_MODE = os.environ.get("RUNNER_MODE", "threads").strip().lower()
+# /status?since=<version> holds the request for up to this many seconds.
+LONG_POLL_DEFAULT = 30
+LONG_POLL_MAX = 120
+STREAM_KEEPALIVE = float(os.environ.get("STATUS_STREAM_KEEPALIVE", "15"))
+REQUEST_TIMEOUT = 10.0
+READ_LIMIT = 1 << 16
+# Probe each tunnel's public address with getinfo every PROBE_INTERVAL
+# seconds (0 disables), keeping the last PROBE_WINDOW outcomes.
+PROBE_INTERVAL = float(os.environ.get("LOCALXPOSE_PROBE_INTERVAL", "10"))
+PROBE_TIMEOUT = float(os.environ.get("LOCALXPOSE_PROBE_TIMEOUT", "2"))
+PROBE_WINDOW = int(os.environ.get("LOCALXPOSE_PROBE_WINDOW", "60"))
+OOB_PREFIX = b"\xff\xff\xff\xff"
+PROBE_PACKET = OOB_PREFIX + b"getinfo runner-probe"
 
+EVENT_CAPACITY = 500
+# Last known endpoint and counters, rewritten (atomically) at most every
+# STATE_SAVE_INTERVAL seconds so a restarted runner can serve them at once.
+STATE_FILE = os.environ.get("LOCALXPOSE_STATE_FILE", "/data/state.json")
+STATE_SAVE_INTERVAL = float(os.environ.get("LOCALXPOSE_STATE_INTERVAL", "10"))
+STATE_FORMAT = 1
 
-def _append_log(line: str) -> None:
-    _logs.append(line)
-    if len(_logs) > 200:
-        del _logs[: len(_logs) - 200]
+# loclx output classification, in priority order: the first pattern that
+# matches a line decides its event type, and lines matching none are not
+# events. Patterns are case-insensitive. The order is deliberate: a line
+# such as "Error: connection lost" is a reconnect (loclx retries on its
+# own), not an error, and "disconnected" never counts as "connected".
+LOG_EVENT_RULES: List[Tuple[str, str]] = [
+    ("endpoint_assigned", r"udp://\S+"),
+    ("rate_limited", r"rate[ -]?limit|too many (?:requests|connections)|\b429\b"),
+    ("reconnecting", r"reconnect|retrying|connection (?:lost|closed|reset|refused)|disconnected"),
+    ("error", r"^error\b|\berror:|\bfailed\b|\bfatal\b|\bpanic\b"),
+    ("connected", r"\bconnected\b|tunnel (?:is )?(?:up|running|established|ready)"),
+]
+_LOG_RULES = [(kind, re.compile(pattern, re.IGNORECASE).search) for kind, pattern in LOG_EVENT_RULES]
+# One pass over the union rejects the (common) lines that match no rule.
+_ANY_LOG_EVENT = re.compile(
+    "|".join(f"(?:{pattern})" for _, pattern in LOG_EVENT_RULES), re.IGNORECASE
+).search
 
 
-def _run_loclx() -> None:
-    global _proc
+def classify_line(line: str) -> Tuple[str, str] | None:
+    """Return ``(event type, matched text)`` for a loclx output line, or None."""
+    if not _ANY_LOG_EVENT(line):
+        return None
+    for kind, search in _LOG_RULES:
+        match = search(line)
+        if match:
+            return kind, match.group(0)
+    return None
+
+
+_stopping = threading.Event()
+
+T = TypeVar("T")
+
+
+class LogBuffer(Generic[T]):
+    """Fixed-capacity ring of entries numbered with increasing sequence ids.
+
+    Appends overwrite the oldest slot instead of shifting a list, and readers
+    can ask for just the entries after the last sequence number they saw.
+    Holds loclx output lines, and the classified events built from them.
+    """
+
+    def __init__(self, capacity: int = LOG_CAPACITY) -> None:
+        self._capacity = capacity
+        self._slots: List[Optional[T]] = [None] * capacity
+        self._next = 1  # sequence number the next line will get
+        self._lock = threading.Lock()
+
+    @property
+    def last_seq(self) -> int:
+        return self._next - 1
+
+    def append(self, line: T) -> int:
+        with self._lock:
+            seq = self._next
+            self._slots[seq % self._capacity] = line
+            self._next = seq + 1
+            return seq
+
+    def after(self, seq: int, limit: Optional[int] = None) -> Tuple[List[Tuple[int, T]], bool]:
+        """Return ``(seq, entry)`` pairs newer than ``seq`` (oldest first).
+
+        The flag is True when some entries newer than ``seq`` are missing
+        from the result, because they were overwritten or cut off by ``limit``.
+        """
+        with self._lock:
+            last = self._next - 1
+            first = max(1, self._next - self._capacity)
+            start = max(seq + 1, first)
+            if limit is not None and limit >= 0:
+                start = max(start, last - limit + 1)
+            lines = [(n, self._slots[n % self._capacity]) for n in range(start, last + 1)]  # type: ignore[misc]
+        return lines, start > seq + 1
+
+    def tail(self, limit: Optional[int] = None) -> List[T]:
+        return [line for _, line in self.after(0, limit)[0]]
+
+
+def _default_spec() -> Dict[str, str]:
+    return {
+        "name": "default",
+        "to": os.environ.get("LOCALXPOSE_TO", "unvanq-server:27960"),
+        "region": os.environ.get("LOCALXPOSE_REGION", ""),
+        "port": os.environ.get("LOCALXPOSE_PORT", ""),
+        "reserved_endpoint": os.environ.get("LOCALXPOSE_RESERVED_ENDPOINT", ""),
+    }
+
+
+def parse_tunnel_specs(raw: str) -> List[Dict[str, str]]:
+    """Parse ``LOCALXPOSE_TUNNELS`` into tunnel specs.
+
+    Accepts either a JSON list of objects with ``name``, ``to`` and the
+    optional ``region``, ``port`` and ``reserved_endpoint`` keys, or a
+    comma-separated list of ``[name=]host:port`` entries that share the
+    global ``LOCALXPOSE_REGION`` setting. Empty input means the single
+    tunnel described by ``LOCALXPOSE_TO`` and friends.
+    """
+    raw = raw.strip()
+    if not raw:
+        return [_default_spec()]
+
+    defaults = _default_spec()
+    if raw.startswith("["):
+        entries = json.loads(raw)
+        if not isinstance(entries, list):
+            raise ValueError("LOCALXPOSE_TUNNELS must be a JSON list")
+    else:
+        entries = []
+        for item in re.split(r"[,\s]+", raw):
+            if not item:
+                continue
+            name, sep, to_addr = item.partition("=")
+            entries.append({"name": name, "to": to_addr} if sep else {"to": item})
+
+    specs: List[Dict[str, str]] = []
+    seen = set()
+    for index, entry in enumerate(entries):
+        if not isinstance(entry, dict) or not entry.get("to"):
+            raise ValueError(f"tunnel #{index + 1} needs a 'to' address")
+        spec = {
+            "name": str(entry.get("name") or f"tunnel{index + 1}"),
+            "to": str(entry["to"]),
+            # Only the global region is shared; ports and reserved endpoints
+            # are unique to one tunnel.
+            "region": str(entry.get("region", defaults["region"]) or ""),
+            "port": str(entry.get("port") or ""),
+            "reserved_endpoint": str(entry.get("reserved_endpoint") or ""),
+        }
+        if spec["name"] in seen:
+            raise ValueError(f"duplicate tunnel name {spec['name']!r}")
+        seen.add(spec["name"])
+        specs.append(spec)
+    return specs
+
+
+# ----------------------------------------------------------------------
+# Tunnel health probing
+# ----------------------------------------------------------------------
+def _percentile(ordered: List[float], fraction: float) -> Optional[float]:
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def _probe_target(public_url: str) -> Tuple[str, int]:
+    url = urlsplit(public_url)
+    if not url.hostname or not url.port:
+        raise ValueError(f"cannot probe {public_url!r}: no host:port")
+    return url.hostname, url.port
 
-    token = os.environ.get("LOCALXPOSE_ACCESS_TOKEN")
-    if not token:
-        status["error"] = "LOCALXPOSE_ACCESS_TOKEN is not set"
-        return
 
-    to_addr = os.environ.get("LOCALXPOSE_TO", "unvanq-server:27960")
-    region = os.environ.get("LOCALXPOSE_REGION", "")
-    port = os.environ.get("LOCALXPOSE_PORT", "")
-    reserved = os.environ.get("LOCALXPOSE_RESERVED_ENDPOINT", "")
-
-    cmd = [
-        "loclx",
-        "tunnel",
-        "--raw-mode",
-        "udp",
-        "--to",
-        to_addr,
-    ]
-
-    if region:
-        cmd.extend(["--region", region])
-    if port:
-        cmd.extend(["--port", port])
-    if reserved:
-        cmd.extend(["--reserved-endpoint", reserved])
-
-    env = os.environ.copy()
-    env["LOCALXPOSE_ACCESS_TOKEN"] = token
-    # Newer LocalXpose builds expect ACCESS_TOKEN instead of LOCALXPOSE_ACCESS_TOKEN
-    # so populate both to keep backward compatibility.
-    env["ACCESS_TOKEN"] = token
+class ProbeStats:
+    """Rolling window of probe outcomes through the public endpoint.
 
+    Same shape as the dashboard's server latency summary, but measured
+    from the runner to the tunnel's public address and back, so it shows
+    what the tunnel adds on top of the game server itself.
+    """
+
+    def __init__(self, window: int = PROBE_WINDOW) -> None:
+        self._lock = threading.Lock()
+        # RTT in milliseconds, or None for a probe that got no answer.
+        self._samples: Deque[Optional[float]] = deque(maxlen=max(1, window))
+        self._total = 0
+        self._lost = 0
+        self._errors = 0
+        self._last_error = ""
+        self._last_sent_at: Optional[float] = None
+        self._target: Optional[str] = None
+
+    def record(self, target: str, sent_at: float, rtt_ms: Optional[float], error: str = "") -> bool:
+        """Record one probe; return True if reachability flipped."""
+        with self._lock:
+            was_reachable = bool(self._samples) and self._samples[-1] is not None
+            self._samples.append(None if rtt_ms is None else round(rtt_ms, 2))
+            self._total += 1
+            if rtt_ms is None:
+                self._lost += 1
+            if error:
+                self._errors += 1
+                self._last_error = error
+            self._last_sent_at = sent_at
+            self._target = target
+            return was_reachable != (rtt_ms is not None)
+
+    @property
+    def total(self) -> int:
+        return self._total
+
+    def export(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "samples": list(self._samples),
+                "total": self._total,
+                "lost": self._lost,
+                "errors": self._errors,
+                "last_error": self._last_error,
+                "last_sent_at": self._last_sent_at,
+                "target": self._target,
+            }
+
+    def restore(self, saved: Dict[str, object]) -> None:
+        with self._lock:
+            samples = saved.get("samples") or []
+            self._samples.extend(s if isinstance(s, (int, float)) else None for s in samples)
+            self._total = int(saved.get("total") or 0)
+            self._lost = int(saved.get("lost") or 0)
+            self._errors = int(saved.get("errors") or 0)
+            self._last_error = str(saved.get("last_error") or "")
+            self._last_sent_at = saved.get("last_sent_at")  # type: ignore[assignment]
+            self._target = saved.get("target")  # type: ignore[assignment]
+
+    def summary(self) -> Dict[str, object]:
+        with self._lock:
+            samples = list(self._samples)
+            totals = (self._total, self._lost, self._errors)
+            last_error, last_sent_at, target = self._last_error, self._last_sent_at, self._target
+
+        answered = sorted(s for s in samples if s is not None)
+        return {
+            "target": target,
+            "reachable": bool(samples) and samples[-1] is not None,
+            "window": len(samples),
+            "p50_ms": _percentile(answered, 0.50),
+            "p95_ms": _percentile(answered, 0.95),
+            "p99_ms": _percentile(answered, 0.99),
+            "min_ms": answered[0] if answered else None,
+            "max_ms": answered[-1] if answered else None,
+            "loss_rate": round(1 - len(answered) / len(samples), 4) if samples else None,
+            "last_rtt_ms": samples[-1] if samples else None,
+            "last_sent_at": last_sent_at,
+            "last_error": last_error,
+            "probes_total": totals[0],
+            "lost_total": totals[1],
+            "errors_total": totals[2],
+        }
+
+
+def probe_once(public_url: str, timeout: float = PROBE_TIMEOUT) -> float:
+    """Send ``getinfo`` to the public endpoint; return the RTT in milliseconds.
+
+    Any connectionless (``\\xff\\xff\\xff\\xff``-prefixed) reply counts, so a
+    plain UDP echo can stand in for the game server. Raises
+    ``socket.timeout`` when nothing comes back and ``OSError`` for
+    resolution or ICMP errors.
+    """
+    host, port = _probe_target(public_url)
+    family, _, _, _, sockaddr = socket.getaddrinfo(host, port, type=socket.SOCK_DGRAM)[0]
+    with socket.socket(family, socket.SOCK_DGRAM) as sock:
+        # A fresh connected socket per probe: late replies to an earlier
+        # probe can't be mistaken for this one, and only the target can answer.
+        sock.connect(sockaddr)
+        started = time.perf_counter()
+        deadline = started + timeout
+        sock.send(PROBE_PACKET)
+        while True:
+            remaining = deadline - time.perf_counter()
+            # settimeout(0) would make recv() non-blocking (BlockingIOError).
+            if remaining <= 0:
+                raise socket.timeout("timed out")
+            sock.settimeout(remaining)
+            data = sock.recv(4096)
+            if data.startswith(OOB_PREFIX):
+                return (time.perf_counter() - started) * 1000.0
+
+
+class _ProbeProtocol(asyncio.DatagramProtocol):
+    def __init__(self, answered: asyncio.Future) -> None:
+        self._answered = answered
+
+    def datagram_received(self, data: bytes, addr: object) -> None:
+        if data.startswith(OOB_PREFIX) and not self._answered.done():
+            self._answered.set_result(time.perf_counter())
+
+    def error_received(self, exc: Exception) -> None:
+        if not self._answered.done():
+            self._answered.set_exception(exc)
+
+
+async def probe_once_async(public_url: str, timeout: float = PROBE_TIMEOUT) -> float:
+    """``probe_once`` on the event loop; raises ``asyncio.TimeoutError`` on loss."""
+    host, port = _probe_target(public_url)
+    loop = asyncio.get_running_loop()
+    infos = await loop.getaddrinfo(host, port, type=socket.SOCK_DGRAM)
+    answered: asyncio.Future = loop.create_future()
+    transport, _ = await loop.create_datagram_endpoint(
+        lambda: _ProbeProtocol(answered), remote_addr=infos[0][4], family=infos[0][0]
+    )
     try:
-        _proc = subprocess.Popen(
-            cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-            text=True,
-            bufsize=1,
-            env=env,
-        )
-    except Exception as exc:
-        status["error"] = f"Failed to start localxpose: {exc}"
-        status["process_exited"] = True
-        return
+        started = time.perf_counter()
+        transport.sendto(PROBE_PACKET)
+        received = await asyncio.wait_for(answered, timeout)
+        return (received - started) * 1000.0
+    finally:
+        transport.close()
+
+
+class Tunnel:
+    """One supervised loclx process with its own status and log buffer.
+
+    The status bookkeeping is shared by both runner modes: ``run`` drives
+    it from a thread with ``subprocess``, ``run_async`` from the event loop
+    with ``asyncio.create_subprocess_exec``. Every state change bumps
+    ``version`` and calls the registered listeners, which is what long-poll
+    and streaming clients wait on.
+    """
+
+    def __init__(self, spec: Dict[str, str]) -> None:
+        self.name = spec["name"]
+        self.spec = spec
+        self.logs: LogBuffer[str] = LogBuffer()
+        self.events: LogBuffer[Dict[str, object]] = LogBuffer(EVENT_CAPACITY)
+        self.event_counts: Dict[str, int] = {}
+        self.status: Dict[str, object] = {
+            "name": self.name,
+            "to": spec["to"],
+            "online": False,
+            "public_url": None,
+            "error": "",
+            "process_exited": False,
+            "pid": None,
+            "restarts": 0,
+            "last_exit_code": None,
+            # A tunnel is down until loclx prints its URL.
+            "down_since": time.time(),
+            "downtime_seconds": 0.0,
+            "next_restart_in": None,
+            "last_public_url": None,
+            "endpoint_changes": 0,
+            # True while online/public_url are restored from the state file
+            # and not yet confirmed by this run of loclx.
+            "stale": False,
+            "state_saved_at": None,
+        }
+        self.probe = ProbeStats()
+        self.version = 0
+        self._listeners: List[Callable[[], None]] = []
+        self._proc: subprocess.Popen | None = None
+        self._aproc: asyncio.subprocess.Process | None = None
+        self._thread: threading.Thread | None = None
+        self._prober: threading.Thread | None = None
+        # Set by stop()/stop_async(): loclx exiting then is not an outage.
+        self._stopping = False
+
+    def add_listener(self, listener: Callable[[], None]) -> None:
+        self._listeners.append(listener)
 
-    status["pid"] = _proc.pid
+    def _notify(self) -> None:
+        for listener in self._listeners:
+            listener()
 
-    assert _proc.stdout is not None
-    for raw in _proc.stdout:
-        line = raw.rstrip("\n")
+    def _changed(self) -> None:
+        self.version += 1
+        self._notify()
+
+    def _emit(self, kind: str, source: str = "runner", **data: object) -> None:
+        """Record a typed event; ``source`` is "loclx" for classified output."""
+        event: Dict[str, object] = {"ts": round(time.time(), 3), "type": kind, "source": source}
+        event.update(data)
+        self.events.append(event)
+        self.event_counts[kind] = self.event_counts.get(kind, 0) + 1
+        self._notify()
+
+    def _log(self, line: str) -> None:
+        self.logs.append(line)
+
+    def build_command(self) -> Tuple[List[str], Dict[str, str]] | None:
+        token = os.environ.get("LOCALXPOSE_ACCESS_TOKEN")
+        if not token:
+            self.status["error"] = "LOCALXPOSE_ACCESS_TOKEN is not set"
+            self._changed()
+            return None
+
+        cmd = [
+            "loclx",
+            "tunnel",
+            "--raw-mode",
+            "udp",
+            "--to",
+            self.spec["to"],
+        ]
+
+        if self.spec["region"]:
+            cmd.extend(["--region", self.spec["region"]])
+        if self.spec["port"]:
+            cmd.extend(["--port", self.spec["port"]])
+        if self.spec["reserved_endpoint"]:
+            cmd.extend(["--reserved-endpoint", self.spec["reserved_endpoint"]])
+
+        env = os.environ.copy()
+        env["LOCALXPOSE_ACCESS_TOKEN"] = token
+        # Newer LocalXpose builds expect ACCESS_TOKEN instead of LOCALXPOSE_ACCESS_TOKEN
+        # so populate both to keep backward compatibility.
+        env["ACCESS_TOKEN"] = token
+        return cmd, env
+
+    def _mark_down(self) -> None:
+        was_online = self.status["online"] or self.status["stale"]
+        self.status["online"] = False
+        self.status["public_url"] = None
+        self.status["stale"] = False
+        if self.status["down_since"] is None:
+            self.status["down_since"] = time.time()
+        if was_online:
+            self._changed()
+
+    def _mark_up(self, url: str) -> None:
+        status = self.status
+        last = status["last_public_url"]
+        if last is not None and last != url:
+            status["endpoint_changes"] = int(status["endpoint_changes"]) + 1
+            self._log(f"[runner] public endpoint changed: {last} -> {url}")
+            self._emit("endpoint_changed", previous=last, url=url)
+        status["public_url"] = url
+        status["last_public_url"] = url
+        status["online"] = True
+        status["stale"] = False
+        status["error"] = ""
+        down_since = status["down_since"]
+        if down_since is not None:
+            status["downtime_seconds"] = round(
+                float(status["downtime_seconds"]) + time.time() - float(down_since), 3
+            )
+            status["down_since"] = None
+        self._changed()
+
+    def _handle_line(self, line: str) -> None:
         if line:
-            _append_log(line)
+            self._log(line)
 
-        match = re.search(r"udp://\S+", line)
-        if match:
-            status["public_url"] = match.group(0)
+        event = classify_line(line)
+        if event is not None:
+            kind, matched = event
+            if kind == "endpoint_assigned":
+                self._emit(kind, "loclx", line=line, url=matched)
+                self._mark_up(matched)
+            else:
+                self._emit(kind, "loclx", line=line)
+
+        if not self.status["error"] and line.startswith("Error:"):
+            self.status["error"] = line
+            self._changed()
+
+    def _started(self, pid: int) -> None:
+        self.status["pid"] = pid
+        self.status["process_exited"] = False
+        self._emit("process_started", pid=pid)
+        self._changed()
+
+    def _start_failed(self, exc: Exception) -> None:
+        self.status["error"] = f"Failed to start localxpose: {exc}"
+        self.status["process_exited"] = True
+        self._emit("start_failed", error=str(exc))
+        self._changed()
+
+    def _exited(self, returncode: int | None) -> None:
+        if self._stopping:
+            # The runner is shutting down and killed loclx itself. Keep the
+            # endpoint as it was so the final save_state() has it for the
+            # next run, and keep the signal out of the exit/outage history.
+            return
+        status = self.status
+        status["process_exited"] = True
+        status["last_exit_code"] = returncode
+        if returncode not in (0, None) and not status["error"]:
+            status["error"] = f"localxpose exited with code {returncode}"
+        self._mark_down()
+        self._emit("process_exited", code=returncode)
+        self._changed()
+
+    def _schedule_restart(self, started: float, attempt: int) -> Tuple[float, int]:
+        """Return ``(delay, next_attempt)`` for a run that began at ``started``."""
+        if time.monotonic() - started >= STABLE_AFTER:
+            attempt = 0
+        delay = _backoff_delay(attempt)
+        self.status["next_restart_in"] = round(delay, 2)
+        self._log(
+            f"[runner] localxpose exited (code {self.status['last_exit_code']}); "
+            f"restarting in {delay:.1f}s"
+        )
+        self._emit("restart_scheduled", delay=round(delay, 2), attempt=attempt + 1)
+        self._changed()
+        return delay, attempt + 1
+
+    def _record_probe(
+        self, url: str, sent_at: float, rtt_ms: Optional[float], error: str = ""
+    ) -> None:
+        # Only a reachability flip is a state change; RTT moves every probe.
+        if self.probe.record(url, sent_at, rtt_ms, error):
+            if rtt_ms is None:
+                self._emit("probe_unreachable", url=url, error=error)
+            else:
+                self._emit("probe_reachable", url=url, rtt_ms=round(rtt_ms, 2))
+            self._changed()
+
+    def _restarting(self) -> None:
+        self.status["next_restart_in"] = None
+        self.status["restarts"] = int(self.status["restarts"]) + 1
+
+    # -- thread mode ---------------------------------------------------
+
+    def _run_once(self, cmd: List[str], env: Dict[str, str]) -> None:
+        try:
+            proc = self._proc = subprocess.Popen(
+                cmd,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                text=True,
+                bufsize=1,
+                env=env,
+            )
+        except Exception as exc:
+            self._start_failed(exc)
+            return
+
+        self._started(proc.pid)
+        assert proc.stdout is not None
+        for raw in proc.stdout:
+            self._handle_line(raw.rstrip("\n"))
+
+        proc.wait()
+        self._exited(proc.returncode)
+
+    def run(self) -> None:
+        """Keep loclx running, restarting it with backoff whenever it exits."""
+        command = self.build_command()
+        if command is None:
+            return
+
+        attempt = 0
+        while not _stopping.is_set():
+            started = time.monotonic()
+            self._run_once(*command)
+            if _stopping.is_set():
+                break
+            delay, attempt = self._schedule_restart(started, attempt)
+            if _stopping.wait(delay):
+                break
+            self._restarting()
+
+    def probe_loop(self) -> None:
+        """Probe the public endpoint every PROBE_INTERVAL while it is up."""
+        while not _stopping.wait(PROBE_INTERVAL):
+            url = self.status["public_url"]
+            if not url:
+                continue
+            sent_at = time.time()
+            try:
+                self._record_probe(str(url), sent_at, probe_once(str(url)))
+            except socket.timeout:
+                self._record_probe(str(url), sent_at, None)
+            except (OSError, ValueError) as exc:
+                self._record_probe(str(url), sent_at, None, str(exc))
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self.run, name=f"tunnel-{self.name}", daemon=True)
+        self._thread.start()
+        if PROBE_INTERVAL > 0:
+            self._prober = threading.Thread(
+                target=self.probe_loop, name=f"probe-{self.name}", daemon=True
+            )
+            self._prober.start()
+
+    def stop(self) -> None:
+        self._stopping = True
+        proc = self._proc
+        if proc and proc.poll() is None:
+            try:
+                proc.terminate()
+                proc.wait(timeout=5)
+            except Exception:
+                try:
+                    proc.kill()
+                except Exception:
+                    pass
+
+    def join(self, timeout: float) -> None:
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    # -- asyncio mode --------------------------------------------------
+
+    async def _run_once_async(self, cmd: List[str], env: Dict[str, str]) -> None:
+        try:
+            proc = self._aproc = await asyncio.create_subprocess_exec(
+                *cmd,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.STDOUT,
+                env=env,
+                limit=READ_LIMIT,
+            )
+        except Exception as exc:
+            self._start_failed(exc)
+            return
+
+        self._started(proc.pid)
+        assert proc.stdout is not None
+        while True:
+            try:
+                raw = await proc.stdout.readline()
+            except ValueError:
+                # Line longer than READ_LIMIT; the reader already dropped it.
+                continue
+            if not raw:
+                break
+            self._handle_line(raw.decode("utf-8", "replace").rstrip("\r\n"))
+
+        await proc.wait()
+        self._exited(proc.returncode)
+
+    async def run_async(self, stop: asyncio.Event) -> None:
+        """``run`` for the event loop; returns once ``stop`` is set."""
+        command = self.build_command()
+        if command is None:
+            return
+
+        attempt = 0
+        while not stop.is_set():
+            started = time.monotonic()
+            await self._run_once_async(*command)
+            if stop.is_set():
+                break
+            delay, attempt = self._schedule_restart(started, attempt)
+            try:
+                await asyncio.wait_for(stop.wait(), delay)
+                break
+            except asyncio.TimeoutError:
+                pass
+            self._restarting()
+
+    async def probe_loop_async(self, stop: asyncio.Event) -> None:
+        """``probe_loop`` for the event loop; returns once ``stop`` is set."""
+        while True:
+            try:
+                await asyncio.wait_for(stop.wait(), PROBE_INTERVAL)
+                return
+            except asyncio.TimeoutError:
+                pass
+            url = self.status["public_url"]
+            if not url:
+                continue
+            sent_at = time.time()
+            try:
+                self._record_probe(str(url), sent_at, await probe_once_async(str(url)))
+            except asyncio.TimeoutError:
+                self._record_probe(str(url), sent_at, None)
+            except (OSError, ValueError) as exc:
+                self._record_probe(str(url), sent_at, None, str(exc))
+
+    async def stop_async(self) -> None:
+        self._stopping = True
+        proc = self._aproc
+        if proc and proc.returncode is None:
+            try:
+                proc.terminate()
+                await asyncio.wait_for(proc.wait(), 5)
+            except Exception:
+                try:
+                    proc.kill()
+                except Exception:
+                    pass
+
+    def persisted(self) -> Dict[str, object]:
+        """State worth keeping across runner restarts (see ``restore``)."""
+        status = self.status
+        downtime = float(status["downtime_seconds"])
+        if status["down_since"] is not None:
+            # Bank the outage so far; restore() starts a new one.
+            downtime += time.time() - float(status["down_since"])  # type: ignore[arg-type]
+        return {
+            "to": self.spec["to"],
+            "reserved_endpoint": self.spec["reserved_endpoint"],
+            "online": bool(status["online"]),
+            "public_url": status["public_url"],
+            "last_public_url": status["last_public_url"],
+            "restarts": status["restarts"],
+            "last_exit_code": status["last_exit_code"],
+            "downtime_seconds": round(downtime, 3),
+            "endpoint_changes": status["endpoint_changes"],
+            "event_counts": dict(self.event_counts),
+            "probe": self.probe.export(),
+        }
+
+    def restore(self, saved: Dict[str, object]) -> None:
+        """Adopt a previous run's state; the endpoint stays stale until confirmed."""
+        if saved.get("to") != self.spec["to"] or (
+            saved.get("reserved_endpoint") or ""
+        ) != self.spec["reserved_endpoint"]:
+            # Configured for a different target now; the old state would mislead.
+            return
+        status = self.status
+        for key in ("last_public_url", "restarts", "last_exit_code", "downtime_seconds", "endpoint_changes"):
+            if saved.get(key) is not None:
+                status[key] = saved[key]
+        if saved.get("online") and saved.get("public_url"):
             status["online"] = True
+            status["public_url"] = saved["public_url"]
+            status["stale"] = True
+        status["state_saved_at"] = saved.get("saved_at")
+        counts = saved.get("event_counts")
+        if isinstance(counts, dict):
+            self.event_counts.update({str(k): int(v) for k, v in counts.items()})
+        probe = saved.get("probe")
+        if isinstance(probe, dict):
+            self.probe.restore(probe)
+        self._log(f"[runner] restored state (last endpoint {status['last_public_url']})")
+        self._emit("state_restored", url=status["public_url"], stale=bool(status["stale"]))
+        self._changed()
+
+    def snapshot(self, tail: Optional[int] = None) -> Dict[str, object]:
+        payload = dict(self.status)
+        payload["version"] = self.version
+        payload["probe"] = self.probe.summary()
+        payload["event_counts"] = dict(self.event_counts)
+        payload["event_seq"] = self.events.last_seq
+        payload["log_seq"] = self.logs.last_seq
+        payload["log_tail"] = self.logs.tail(tail)
+        return payload
+
+
+# ----------------------------------------------------------------------
+# Persisted state
+# ----------------------------------------------------------------------
+def load_state(path: str) -> Dict[str, Dict[str, object]]:
+    """Return the per-tunnel entries of a state file ({} if unusable)."""
+    if not path:
+        return {}
+    try:
+        with open(path, encoding="utf-8") as fh:
+            data = json.load(fh)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(data, dict) or data.get("format") != STATE_FORMAT:
+        return {}
+    entries = data.get("tunnels")
+    if not isinstance(entries, dict):
+        return {}
+    for entry in entries.values():
+        if isinstance(entry, dict):
+            entry["saved_at"] = data.get("saved_at")
+    return entries
+
+
+def write_state(path: str, payload: Dict[str, object]) -> bool:
+    """Write ``payload`` to ``path`` atomically: temp file, fsync, rename."""
+    tmp = f"{path}.tmp"
+    try:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump(payload, fh)
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp, path)
+    except OSError:
+        # No writable volume: keep running, just without warm restarts.
+        return False
+    return True
+
+
+def _backoff_delay(attempt: int) -> float:
+    """Exponential backoff with jitter: a random delay in [d/2, d]."""
+    delay = min(BACKOFF_MAX, BACKOFF_MIN * (2 ** attempt))
+    return delay * random.uniform(0.5, 1.0)
+
+
+# Populated by main(); the first tunnel also answers the legacy /status
+# and /logs routes.
+tunnels: Dict[str, Tunnel] = {}
+
+
+# Last tunnel signatures written, so unchanged state is not rewritten.
+_saved_state: Dict[str, object] = {"signature": None}
+# The periodic saver and the final save at shutdown share one temp file.
+_save_lock = threading.Lock()
+
+
+def state_payload() -> Tuple[object, Dict[str, object]]:
+    """Return ``(signature, payload)`` describing every tunnel."""
+    # Events are persisted too (event_counts) but do not bump the version.
+    signature = tuple(
+        (t.name, t.version, t.events.last_seq, t.probe.total) for t in tunnels.values()
+    )
+    payload = {
+        "format": STATE_FORMAT,
+        "saved_at": round(time.time(), 3),
+        "tunnels": {t.name: t.persisted() for t in tunnels.values()},
+    }
+    return signature, payload
+
+
+def save_state(force: bool = False) -> None:
+    if not STATE_FILE or not tunnels:
+        return
+    with _save_lock:
+        signature, payload = state_payload()
+        if not force and signature == _saved_state["signature"]:
+            return
+        if write_state(STATE_FILE, payload):
+            _saved_state["signature"] = signature
+
+
+def restore_state() -> None:
+    entries = load_state(STATE_FILE)
+    for tunnel in tunnels.values():
+        saved = entries.get(tunnel.name)
+        if isinstance(saved, dict):
+            tunnel.restore(saved)
+
+
+def _state_saver() -> None:
+    while not _stopping.wait(STATE_SAVE_INTERVAL):
+        save_state()
+
+
+def _int_param(query: Dict[str, List[str]], name: str, default: Optional[int]) -> Optional[int]:
+    try:
+        return int(query[name][0])
+    except (KeyError, IndexError, ValueError):
+        return default
+
+
+def resolve(path: str) -> Tuple[Tunnel | None, str]:
+    """Split ``/tunnels/<name>/rest`` into the tunnel and ``/rest``.
+
+    Other paths address the first tunnel. The tunnel is None when the
+    name is unknown (or no tunnels are configured).
+    """
+    if path.startswith("/tunnels/"):
+        name, _, rest = path[len("/tunnels/"):].partition("/")
+        return tunnels.get(name), "/" + rest
+    return next(iter(tunnels.values()), None), path
+
+
+def long_poll(
+    tunnel: Tunnel, rest: str, query: Dict[str, List[str]]
+) -> Tuple[Callable[[], bool], float] | None:
+    """Return ``(ready, timeout)`` if a request asks to wait for news.
+
+    ``/status?since=<version>`` holds the response until the tunnel's
+    version differs from it; ``/events?after=<seq>&wait=<seconds>`` until an
+    event newer than ``seq`` arrives. Either waits at most ``?wait=`` seconds
+    (capped).
+    """
+    if rest == "/status":
+        since = _int_param(query, "since", None)
+        if since is None:
+            return None
+        ready: Callable[[], bool] = lambda: tunnel.version != since
+    elif rest == "/events" and "wait" in query:
+        after = _int_param(query, "after", 0) or 0
+        ready = lambda: tunnel.events.last_seq > after
+    else:
+        return None
+    wait = _int_param(query, "wait", LONG_POLL_DEFAULT) or 0
+    return ready, float(min(max(wait, 0), LONG_POLL_MAX))
+
+
+def route(path: str, query: Dict[str, List[str]]) -> Tuple[int, object]:
+    """Answer a GET with ``(status code, JSON payload)``; None means no body."""
+    if path == "/tunnels":
+        # Log tails are off by default here; ?tail=N turns them on.
+        tail = _int_param(query, "tail", 0)
+        return 200, {"tunnels": [t.snapshot(tail) for t in tunnels.values()]}
+
+    tunnel, rest = resolve(path)
+    if tunnel is None:
+        if path.startswith("/tunnels/"):
+            return 404, {"error": f"unknown tunnel {path.split('/')[2]!r}"}
+        return 404, None
+
+    if rest == "/status":
+        # ?tail=N limits the embedded log tail; ?tail=0 drops it for
+        # clients that follow /logs instead.
+        return 200, tunnel.snapshot(_int_param(query, "tail", None))
+
+    if rest == "/logs":
+        after = _int_param(query, "after", 0) or 0
+        lines, truncated = tunnel.logs.after(after, _int_param(query, "limit", None))
+        return 200, {
+            "lines": [{"seq": seq, "line": line} for seq, line in lines],
+            "last_seq": tunnel.logs.last_seq,
+            "truncated": truncated,
+        }
+
+    if rest == "/events":
+        # ?type=error,rate_limited keeps only those types; the filter runs
+        # after ?limit, so last_seq is always the cursor for the next call.
+        after = _int_param(query, "after", 0) or 0
+        kinds = {k for value in query.get("type", []) for k in value.split(",") if k}
+        events, truncated = tunnel.events.after(after, _int_param(query, "limit", None))
+        return 200, {
+            "events": [
+                dict(event, seq=seq)
+                for seq, event in events
+                if not kinds or event["type"] in kinds
+            ],
+            "last_seq": tunnel.events.last_seq,
+            "truncated": truncated,
+            "counts": dict(tunnel.event_counts),
+        }
+
+    return 404, None
+
 
-        if not status["error"] and line.startswith("Error:"):
-            status["error"] = line
+def sse_event(tunnel: Tunnel) -> bytes:
+    payload = json.dumps(tunnel.snapshot(0))
+    return f"id: {tunnel.version}\nevent: status\ndata: {payload}\n\n".encode("utf-8")
 
-    _proc.wait()
-    status["process_exited"] = True
-    if _proc.returncode not in (0, None) and not status["error"]:
-        status["error"] = f"localxpose exited with code {_proc.returncode}"
+
+# ----------------------------------------------------------------------
+# Thread mode: ThreadingHTTPServer, one reader thread per tunnel
+# ----------------------------------------------------------------------
+_status_changed = threading.Condition()
+
+
+def _notify_threads() -> None:
+    with _status_changed:
+        _status_changed.notify_all()
 
 
 class Handler(http.server.BaseHTTPRequestHandler):
-    def do_GET(self) -> None:  # noqa: N802
-        if self.path.rstrip("/") == "/status":
-            payload = dict(status)
-            payload["log_tail"] = list(_logs)
-            self.send_response(200)
+    def _send_json(self, payload: object, code: int = 200) -> None:
+        body = b"" if payload is None else json.dumps(payload).encode("utf-8")
+        self.send_response(code)
+        if payload is not None:
             self.send_header("Content-Type", "application/json")
-            self.end_headers()
-            self.wfile.write(json.dumps(payload).encode("utf-8"))
-            return
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
 
-        self.send_response(404)
+    def _stream(self, tunnel: Tunnel) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
         self.end_headers()
+        sent = -1
+        try:
+            while not _stopping.is_set():
+                if tunnel.version != sent:
+                    sent = tunnel.version
+                    self.wfile.write(sse_event(tunnel))
+                    self.wfile.flush()
+                with _status_changed:
+                    changed = _status_changed.wait_for(
+                        lambda: tunnel.version != sent or _stopping.is_set(), STREAM_KEEPALIVE
+                    )
+                if not changed:
+                    self.wfile.write(b": keepalive\n\n")
+                    self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def do_GET(self) -> None:  # noqa: N802
+        url = urlsplit(self.path)
+        path = url.path.rstrip("/")
+        query = parse_qs(url.query)
+
+        tunnel, rest = resolve(path)
+        if tunnel is not None and rest == "/status/stream":
+            self._stream(tunnel)
+            return
+
+        poll = long_poll(tunnel, rest, query) if tunnel is not None else None
+        if poll is not None:
+            ready, timeout = poll
+            # Answer held requests at once on shutdown; server.shutdown()
+            # waits for them.
+            with _status_changed:
+                _status_changed.wait_for(lambda: ready() or _stopping.is_set(), timeout)
+
+        code, payload = route(path, query)
+        self._send_json(payload, code)
 
     def log_message(self, *_: object) -> None:  # pragma: no cover
         return
 
 
 def _shutdown() -> None:
-    if _proc and _proc.poll() is None:
-        try:
-            _proc.terminate()
-            _proc.wait(timeout=5)
-        except Exception:
-            try:
-                _proc.kill()
-            except Exception:
-                pass
+    _stopping.set()
+    _notify_threads()
+    for tunnel in tunnels.values():
+        tunnel.stop()
 
 
-def main() -> None:
-    worker = threading.Thread(target=_run_loclx, daemon=True)
-    worker.start()
+def serve_threads(port: int) -> None:
+    for tunnel in tunnels.values():
+        tunnel.add_listener(_notify_threads)
+        tunnel.start()
+    saver = threading.Thread(target=_state_saver, name="state-saver", daemon=True)
+    saver.start()
 
-    port = int(os.environ.get("STATUS_PORT", "4040"))
     server = http.server.ThreadingHTTPServer(("0.0.0.0", port), Handler)
 
-    signal.signal(signal.SIGTERM, lambda *_: (_shutdown(), server.shutdown()))
-    signal.signal(signal.SIGINT, lambda *_: (_shutdown(), server.shutdown()))
+    def _on_signal(*_: object) -> None:
+        _shutdown()
+        # shutdown() blocks until serve_forever() returns, and serve_forever()
+        # runs on this (the signal handling) thread, so call it from another.
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, _on_signal)
+    signal.signal(signal.SIGINT, _on_signal)
 
     try:
         server.serve_forever(poll_interval=0.5)
     finally:
         _shutdown()
-        worker.join(timeout=5)
+        for tunnel in tunnels.values():
+            tunnel.join(timeout=5)
+        # _shutdown() set _stopping; let a save in progress finish first.
+        saver.join(timeout=5)
+        save_state(force=True)
+
+
+# ----------------------------------------------------------------------
+# asyncio mode: one event loop for the processes and the status server
+# ----------------------------------------------------------------------
+class AsyncRunner:
+    """Runs every tunnel and a minimal HTTP/1.1 status server on one loop.
+
+    There are no reader threads and no polling: process output, requests
+    and change notifications are all event-driven, so a new public URL
+    reaches long-poll and stream clients as soon as the line is read.
+    """
+
+    def __init__(self, port: int) -> None:
+        self.port = port
+        self.stop = asyncio.Event()
+        self._change = asyncio.Event()
+
+    def _notify(self) -> None:
+        # Wake everyone waiting on the current event, then start a new one.
+        self._change.set()
+        self._change = asyncio.Event()
+
+    async def _wait_change(self, done: Callable[[], bool], timeout: float) -> bool:
+        deadline = time.monotonic() + timeout
+        while not done():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or self.stop.is_set():
+                return False
+            try:
+                await asyncio.wait_for(self._change.wait(), remaining)
+            except asyncio.TimeoutError:
+                return False
+        return True
+
+    @staticmethod
+    async def _write_head(
+        writer: asyncio.StreamWriter, code: int, headers: List[Tuple[str, str]]
+    ) -> None:
+        head = [f"HTTP/1.1 {code} {HTTPStatus(code).phrase}"]
+        head.extend(f"{name}: {value}" for name, value in headers)
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1"))
+        await writer.drain()
+
+    async def _send_json(self, writer: asyncio.StreamWriter, code: int, payload: object) -> None:
+        body = b"" if payload is None else json.dumps(payload).encode("utf-8")
+        headers = [("Content-Length", str(len(body))), ("Connection", "close")]
+        if payload is not None:
+            headers.insert(0, ("Content-Type", "application/json"))
+        await self._write_head(writer, code, headers)
+        writer.write(body)
+        await writer.drain()
+
+    async def _stream(self, writer: asyncio.StreamWriter, tunnel: Tunnel) -> None:
+        await self._write_head(writer, 200, [
+            ("Content-Type", "text/event-stream"),
+            ("Cache-Control", "no-cache"),
+            ("Connection", "close"),
+        ])
+        sent = -1
+        while not self.stop.is_set():
+            if tunnel.version != sent:
+                sent = tunnel.version
+                writer.write(sse_event(tunnel))
+            elif not await self._wait_change(lambda: tunnel.version != sent, STREAM_KEEPALIVE):
+                writer.write(b": keepalive\n\n")
+            await writer.drain()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), REQUEST_TIMEOUT)
+            while True:
+                header = await asyncio.wait_for(reader.readline(), REQUEST_TIMEOUT)
+                if header in (b"\r\n", b"\n", b""):
+                    break
+
+            parts = request_line.decode("latin-1").split()
+            if len(parts) < 2:
+                return
+            if parts[0] != "GET":
+                await self._send_json(writer, 501, None)
+                return
+
+            url = urlsplit(parts[1])
+            path = url.path.rstrip("/")
+            query = parse_qs(url.query)
+
+            tunnel, rest = resolve(path)
+            if tunnel is not None and rest == "/status/stream":
+                await self._stream(writer, tunnel)
+                return
+
+            poll = long_poll(tunnel, rest, query) if tunnel is not None else None
+            if poll is not None:
+                await self._wait_change(*poll)
+
+            await self._send_json(writer, *route(path, query))
+        except (asyncio.TimeoutError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def _save_state_loop(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self.stop.wait(), STATE_SAVE_INTERVAL)
+                return
+            except asyncio.TimeoutError:
+                pass
+            signature, payload = state_payload()
+            if signature != _saved_state["signature"] and STATE_FILE:
+                # The payload is built on the loop; only the disk I/O moves off it.
+                if await asyncio.to_thread(write_state, STATE_FILE, payload):
+                    _saved_state["signature"] = signature
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(sig, self.stop.set)
+
+        for tunnel in tunnels.values():
+            tunnel.add_listener(self._notify)
+        server = await asyncio.start_server(self._handle, "0.0.0.0", self.port)
+        workers = [
+            asyncio.create_task(tunnel.run_async(self.stop), name=f"tunnel-{tunnel.name}")
+            for tunnel in tunnels.values()
+        ]
+        if PROBE_INTERVAL > 0:
+            workers.extend(
+                asyncio.create_task(tunnel.probe_loop_async(self.stop), name=f"probe-{tunnel.name}")
+                for tunnel in tunnels.values()
+            )
+        workers.append(asyncio.create_task(self._save_state_loop(), name="state-saver"))
+
+        await self.stop.wait()
+        self._notify()
+        server.close()
+        await asyncio.gather(*(tunnel.stop_async() for tunnel in tunnels.values()))
+        await asyncio.wait(workers, timeout=5)
+        save_state(force=True)
+
+
+def main() -> None:
+    for spec in parse_tunnel_specs(os.environ.get("LOCALXPOSE_TUNNELS", "")):
+        tunnels[spec["name"]] = Tunnel(spec)
+    restore_state()
+
+    port = int(os.environ.get("STATUS_PORT", "4040"))
+    if RUNNER_MODE == "asyncio":
+        asyncio.run(AsyncRunner(port).run())
+    else:
+        serve_threads(port)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# runner.py is a standalone script, not a package.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Module settings are read at import time; no background probing in tests.
+os.environ.setdefault("LOCALXPOSE_PROBE_INTERVAL", "0")
@@ -0,0 +1,17 @@
+import runner
+
+
+def test_backoff_delay_doubles_up_to_the_cap(monkeypatch):
+    monkeypatch.setattr(runner, "BACKOFF_MIN", 1.0)
+    monkeypatch.setattr(runner, "BACKOFF_MAX", 8.0)
+    monkeypatch.setattr(runner.random, "uniform", lambda low, high: high)
+    assert [runner._backoff_delay(n) for n in range(6)] == [1, 2, 4, 8, 8, 8]
+
+
+def test_backoff_delay_jitter_stays_in_half_range(monkeypatch):
+    monkeypatch.setattr(runner, "BACKOFF_MIN", 1.0)
+    monkeypatch.setattr(runner, "BACKOFF_MAX", 8.0)
+    for attempt in range(6):
+        delay = runner._backoff_delay(attempt)
+        full = min(8.0, 2.0 ** attempt)
+        assert full / 2 <= delay <= full
@@ -0,0 +1,55 @@
+import pytest
+
+import runner
+
+
+def make_tunnel(name="default"):
+    return runner.Tunnel(
+        {"name": name, "to": "unvanq-server:27960", "region": "", "port": "", "reserved_endpoint": ""}
+    )
+
+
+@pytest.mark.parametrize(
+    "line, kind",
+    [
+        ("Tunnel udp://eu.loclx.io:4321 -> unvanq-server:27960", "endpoint_assigned"),
+        ("error: rate limit exceeded, try later", "rate_limited"),
+        ("HTTP 429 from api", "rate_limited"),
+        # Reconnects win over the generic error rule.
+        ("Error: connection lost", "reconnecting"),
+        ("disconnected from relay", "reconnecting"),
+        ("Error: invalid access token", "error"),
+        ("dial failed", "error"),
+        ("tunnel is up", "connected"),
+        ("Connected to eu region", "connected"),
+    ],
+)
+def test_classify_line(line, kind):
+    assert runner.classify_line(line)[0] == kind
+
+
+def test_classify_line_ignores_noise():
+    assert runner.classify_line("") is None
+    assert runner.classify_line("loclx v2.3.1 starting") is None
+
+
+def test_classify_line_returns_endpoint():
+    assert runner.classify_line("url: udp://eu.loclx.io:4321") == (
+        "endpoint_assigned", "udp://eu.loclx.io:4321",
+    )
+
+
+def test_events_route_filters_by_type(monkeypatch):
+    tunnel = make_tunnel()
+    monkeypatch.setattr(runner, "tunnels", {"default": tunnel})
+    tunnel._handle_line("Error: connection lost")
+    tunnel._handle_line("url: udp://eu.loclx.io:4321")
+
+    code, payload = runner.route("/events", {"type": ["reconnecting,error"]})
+    assert code == 200
+    assert [e["type"] for e in payload["events"]] == ["reconnecting"]
+    assert payload["last_seq"] == 2
+
+    code, payload = runner.route("/tunnels/default/events", {"after": ["1"]})
+    assert [e["seq"] for e in payload["events"]] == [2]
+    assert runner.route("/tunnels/nope/events", {})[0] == 404
@@ -0,0 +1,30 @@
+import runner
+
+
+def test_log_buffer_sequences_and_overwrites():
+    buf = runner.LogBuffer(3)
+    assert buf.after(0) == ([], False)
+    for n in range(1, 6):
+        assert buf.append(f"line {n}") == n
+    assert buf.last_seq == 5
+    # Lines 1 and 2 were overwritten.
+    assert buf.after(0) == ([(3, "line 3"), (4, "line 4"), (5, "line 5")], True)
+    assert buf.after(3) == ([(4, "line 4"), (5, "line 5")], False)
+    assert buf.after(5) == ([], False)
+    assert buf.tail(2) == ["line 4", "line 5"]
+
+
+def test_log_buffer_limit_keeps_newest():
+    buf = runner.LogBuffer(10)
+    for n in range(1, 5):
+        buf.append(f"line {n}")
+    assert buf.after(0, limit=2) == ([(3, "line 3"), (4, "line 4")], True)
+    assert buf.after(2, limit=2) == ([(3, "line 3"), (4, "line 4")], False)
+    assert buf.after(0, limit=0) == ([], True)
+    assert buf.tail() == ["line 1", "line 2", "line 3", "line 4"]
+
+
+def test_int_param_falls_back_on_missing_or_bad_values():
+    assert runner._int_param({"after": ["7"]}, "after", 0) == 7
+    assert runner._int_param({"after": ["x"]}, "after", 0) == 0
+    assert runner._int_param({}, "limit", None) is None
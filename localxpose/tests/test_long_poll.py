@@ -0,0 +1,88 @@
+import asyncio
+import json
+
+import runner
+
+
+def make_tunnel(name="default"):
+    return runner.Tunnel(
+        {"name": name, "to": "unvanq-server:27960", "region": "", "port": "", "reserved_endpoint": ""}
+    )
+
+
+def test_long_poll_waits_for_a_newer_version():
+    tunnel = make_tunnel()
+    ready, timeout = runner.long_poll(tunnel, "/status", {"since": ["0"], "wait": ["500"]})
+    assert timeout == runner.LONG_POLL_MAX
+    assert not ready()
+    tunnel._mark_up("udp://eu.loclx.io:4321")
+    assert ready()
+
+
+def test_long_poll_only_when_asked():
+    tunnel = make_tunnel()
+    assert runner.long_poll(tunnel, "/status", {}) is None
+    assert runner.long_poll(tunnel, "/events", {"after": ["0"]}) is None
+    assert runner.long_poll(tunnel, "/logs", {"since": ["0"]}) is None
+    _, timeout = runner.long_poll(tunnel, "/status", {"since": ["0"], "wait": ["-1"]})
+    assert timeout == 0
+
+
+def test_events_long_poll_waits_for_a_newer_event():
+    tunnel = make_tunnel()
+    ready, timeout = runner.long_poll(tunnel, "/events", {"after": ["0"], "wait": ["5"]})
+    assert timeout == 5
+    assert not ready()
+    tunnel._handle_line("disconnected from relay")
+    assert ready()
+
+
+def test_status_changes_bump_the_version():
+    tunnel = make_tunnel()
+    seen = []
+    tunnel.add_listener(lambda: seen.append(tunnel.version))
+    tunnel._mark_up("udp://eu.loclx.io:4321")
+    assert tunnel.version == 1 and seen == [1]
+    assert tunnel.snapshot(0)["version"] == 1
+
+
+def test_sse_event_carries_the_version():
+    tunnel = make_tunnel()
+    tunnel._mark_up("udp://eu.loclx.io:4321")
+    event = runner.sse_event(tunnel).decode()
+    head, data = event.rstrip("\n").split("\ndata: ")
+    assert head == "id: 1\nevent: status"
+    assert json.loads(data)["public_url"] == "udp://eu.loclx.io:4321"
+
+
+def test_async_long_poll_answers_on_the_next_change(monkeypatch):
+    tunnel = make_tunnel()
+    monkeypatch.setattr(runner, "tunnels", {"default": tunnel})
+
+    async def scenario():
+        server_runner = runner.AsyncRunner(0)
+        tunnel.add_listener(server_runner._notify)
+        server = await asyncio.start_server(server_runner._handle, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(b"GET /status?since=0&wait=10 HTTP/1.1\r\nHost: x\r\n\r\n")
+        await writer.drain()
+        # Nothing comes back while the tunnel is unchanged.
+        pending = asyncio.ensure_future(reader.read())
+        await asyncio.sleep(0.2)
+        assert not pending.done()
+
+        tunnel._mark_up("udp://eu.loclx.io:4321")
+        response = await asyncio.wait_for(pending, 5)
+        writer.close()
+        server.close()
+        await server.wait_closed()
+        return response
+
+    response = asyncio.run(scenario())
+    head, _, body = response.partition(b"\r\n\r\n")
+    assert head.startswith(b"HTTP/1.1 200 OK")
+    payload = json.loads(body)
+    assert payload["version"] == 1
+    assert payload["online"] is True
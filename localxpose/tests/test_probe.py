@@ -0,0 +1,97 @@
+import asyncio
+import socket
+import threading
+
+import pytest
+
+import runner
+
+
+@pytest.fixture
+def echo():
+    """A UDP endpoint that answers every datagram with an OOB reply."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(("127.0.0.1", 0))
+    sock.settimeout(0.1)
+    stop = threading.Event()
+
+    def serve():
+        while not stop.is_set():
+            try:
+                data, addr = sock.recvfrom(2048)
+            except socket.timeout:
+                continue
+            # Something unrelated first: only an OOB reply counts.
+            sock.sendto(b"noise", addr)
+            sock.sendto(runner.OOB_PREFIX + b"infoResponse\n", addr)
+
+    thread = threading.Thread(target=serve, daemon=True)
+    thread.start()
+    host, port = sock.getsockname()
+    yield f"udp://{host}:{port}"
+    stop.set()
+    thread.join()
+    sock.close()
+
+
+@pytest.fixture
+def silent():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(("127.0.0.1", 0))
+    host, port = sock.getsockname()
+    yield f"udp://{host}:{port}"
+    sock.close()
+
+
+def test_probe_once_measures_the_round_trip(echo):
+    rtt = runner.probe_once(echo, timeout=2)
+    assert 0 <= rtt < 2000
+
+
+def test_probe_once_times_out(silent):
+    with pytest.raises(socket.timeout):
+        runner.probe_once(silent, timeout=0.2)
+
+
+def test_probe_once_times_out_without_a_budget(silent):
+    # Noise can use up the budget; a zero timeout must not turn into a
+    # non-blocking recv().
+    with pytest.raises(socket.timeout):
+        runner.probe_once(silent, timeout=0)
+
+
+def test_probe_once_async(echo, silent):
+    assert asyncio.run(runner.probe_once_async(echo, timeout=2)) >= 0
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(runner.probe_once_async(silent, timeout=0.2))
+
+
+def test_probe_target_needs_host_and_port():
+    assert runner._probe_target("udp://eu.loclx.io:4321") == ("eu.loclx.io", 4321)
+    with pytest.raises(ValueError):
+        runner._probe_target("udp://eu.loclx.io")
+
+
+def test_probe_stats_summary_and_reachability_flips():
+    stats = runner.ProbeStats(window=4)
+    assert stats.summary()["reachable"] is False
+    assert stats.record("t", 1.0, 10.0) is True
+    assert stats.record("t", 2.0, 30.0) is False
+    assert stats.record("t", 3.0, None) is True
+    assert stats.record("t", 4.0, None, error="unreachable") is False
+
+    summary = stats.summary()
+    assert summary["target"] == "t"
+    assert summary["reachable"] is False
+    assert (summary["min_ms"], summary["max_ms"]) == (10.0, 30.0)
+    assert summary["loss_rate"] == 0.5
+    assert summary["last_error"] == "unreachable"
+    assert (summary["probes_total"], summary["lost_total"], summary["errors_total"]) == (4, 2, 1)
+
+    # Older probes leave the window; the totals keep counting.
+    for n in range(4):
+        stats.record("t", 5.0 + n, 20.0)
+    summary = stats.summary()
+    assert summary["loss_rate"] == 0
+    assert summary["p50_ms"] == 20.0
+    assert summary["probes_total"] == 8
@@ -0,0 +1,162 @@
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+import pytest
+
+import runner
+
+
+def make_tunnel(name="default", to="unvanq-server:27960"):
+    return runner.Tunnel(
+        {"name": name, "to": to, "region": "", "port": "", "reserved_endpoint": ""}
+    )
+
+
+def test_persisted_state_round_trips_as_stale(tmp_path):
+    tunnel = make_tunnel()
+    tunnel._mark_up("udp://eu.loclx.io:4321")
+    tunnel.status["restarts"] = 3
+    tunnel.probe.record("udp://eu.loclx.io:4321", 1.0, 12.5)
+    path = str(tmp_path / "state.json")
+    assert runner.write_state(path, {
+        "format": runner.STATE_FORMAT, "saved_at": 100.0, "tunnels": {"default": tunnel.persisted()},
+    })
+
+    restored = make_tunnel()
+    restored.restore(runner.load_state(path)["default"])
+    status = restored.status
+    assert status["online"] is True
+    assert status["stale"] is True
+    assert status["public_url"] == "udp://eu.loclx.io:4321"
+    assert status["last_public_url"] == "udp://eu.loclx.io:4321"
+    assert status["restarts"] == 3
+    assert status["state_saved_at"] == 100.0
+    assert restored.event_counts["state_restored"] == 1
+    assert restored.probe.summary()["last_rtt_ms"] == 12.5
+
+    # loclx printing the same URL confirms it.
+    restored._mark_up("udp://eu.loclx.io:4321")
+    assert restored.status["stale"] is False
+    assert restored.status["endpoint_changes"] == 0
+
+
+def test_restore_ignores_state_of_another_target():
+    tunnel = make_tunnel()
+    tunnel._mark_up("udp://eu.loclx.io:4321")
+    saved = tunnel.persisted()
+
+    moved = make_tunnel(to="other-host:27960")
+    moved.restore(saved)
+    assert moved.status["online"] is False
+    assert moved.status["public_url"] is None
+    assert moved.events.last_seq == 0
+
+
+def test_load_state_rejects_unknown_formats(tmp_path):
+    path = tmp_path / "state.json"
+    assert runner.load_state(str(path)) == {}
+    path.write_text('{"format": 999, "tunnels": {"default": {}}}')
+    assert runner.load_state(str(path)) == {}
+    path.write_text("not json")
+    assert runner.load_state(str(path)) == {}
+
+
+def test_write_state_reports_unwritable_paths(tmp_path):
+    blocker = tmp_path / "file"
+    blocker.write_text("")
+    assert runner.write_state(str(blocker / "state.json"), {}) is False
+
+
+def test_save_state_skips_unchanged_tunnels(tmp_path, monkeypatch):
+    tunnel = make_tunnel()
+    state_file = tmp_path / "state.json"
+    monkeypatch.setattr(runner, "tunnels", {"default": tunnel})
+    monkeypatch.setattr(runner, "STATE_FILE", str(state_file))
+    monkeypatch.setattr(runner, "_saved_state", {"signature": None})
+
+    runner.save_state()
+    assert runner.load_state(str(state_file))["default"]["online"] is False
+    state_file.unlink()
+    runner.save_state()
+    assert not state_file.exists()
+    runner.save_state(force=True)
+    assert state_file.exists()
+
+    tunnel._mark_up("udp://eu.loclx.io:4321")
+    runner.save_state()
+    assert runner.load_state(str(state_file))["default"]["online"] is True
+
+
+def test_save_state_writes_event_only_changes(tmp_path, monkeypatch):
+    tunnel = make_tunnel()
+    state_file = tmp_path / "state.json"
+    monkeypatch.setattr(runner, "tunnels", {"default": tunnel})
+    monkeypatch.setattr(runner, "STATE_FILE", str(state_file))
+    monkeypatch.setattr(runner, "_saved_state", {"signature": None})
+    runner.save_state()
+
+    version = tunnel.version
+    tunnel._handle_line("rate limit exceeded")
+    assert tunnel.version == version
+    runner.save_state()
+    assert runner.load_state(str(state_file))["default"]["event_counts"] == {"rate_limited": 1}
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.mark.parametrize("mode", ["threads", "asyncio"])
+def test_sigterm_keeps_the_endpoint_for_the_next_run(tmp_path, mode):
+    # A stand-in loclx that prints its URL and waits to be killed.
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    loclx = bin_dir / "loclx"
+    loclx.write_text('#!/bin/sh\necho "url: udp://eu.loclx.io:4321"\nexec sleep 60\n')
+    loclx.chmod(0o755)
+    state_file = tmp_path / "state.json"
+    port = _free_port()
+    env = dict(
+        os.environ,
+        PATH=f"{bin_dir}{os.pathsep}{os.environ['PATH']}",
+        RUNNER_MODE=mode,
+        STATUS_PORT=str(port),
+        LOCALXPOSE_ACCESS_TOKEN="test",
+        LOCALXPOSE_STATE_FILE=str(state_file),
+        LOCALXPOSE_PROBE_INTERVAL="0",
+    )
+    proc = subprocess.Popen([sys.executable, runner.__file__], env=env)
+    try:
+        deadline = time.monotonic() + 10
+        while True:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/status", timeout=1) as resp:
+                    if json.load(resp)["online"]:
+                        break
+            except OSError:
+                pass
+            assert time.monotonic() < deadline, "runner never came online"
+            time.sleep(0.05)
+        proc.send_signal(signal.SIGTERM)
+        assert proc.wait(10) == 0
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+
+    saved = runner.load_state(str(state_file))["default"]
+    assert saved["online"] is True
+    assert saved["last_exit_code"] is None
+    assert "process_exited" not in saved["event_counts"]
+
+    restored = make_tunnel()
+    restored.restore(saved)
+    assert restored.status["public_url"] == "udp://eu.loclx.io:4321"
+    assert restored.status["stale"] is True
@@ -0,0 +1,60 @@
+import pytest
+
+import runner
+
+
+def test_empty_spec_means_the_single_default_tunnel(monkeypatch):
+    monkeypatch.setenv("LOCALXPOSE_TO", "game:27960")
+    monkeypatch.setenv("LOCALXPOSE_RESERVED_ENDPOINT", "eu.loclx.io:4321")
+    (spec,) = runner.parse_tunnel_specs("  ")
+    assert spec["name"] == "default"
+    assert spec["to"] == "game:27960"
+    assert spec["reserved_endpoint"] == "eu.loclx.io:4321"
+
+
+def test_comma_list_shares_only_the_region(monkeypatch):
+    monkeypatch.setenv("LOCALXPOSE_REGION", "eu")
+    monkeypatch.setenv("LOCALXPOSE_PORT", "4321")
+    specs = runner.parse_tunnel_specs("main=game:27960, game2:27961")
+    assert [(s["name"], s["to"]) for s in specs] == [
+        ("main", "game:27960"), ("tunnel2", "game2:27961"),
+    ]
+    assert {s["region"] for s in specs} == {"eu"}
+    assert {s["port"] for s in specs} == {""}
+
+
+def test_json_list_keeps_per_tunnel_settings(monkeypatch):
+    monkeypatch.setenv("LOCALXPOSE_REGION", "eu")
+    (spec,) = runner.parse_tunnel_specs(
+        '[{"name": "us", "to": "game:27960", "region": "us", "port": 5000}]'
+    )
+    assert (spec["region"], spec["port"]) == ("us", "5000")
+
+
+@pytest.mark.parametrize("raw", [
+    '["game:27960"]',
+    '[{"name": "a"}]',
+    "a=game:1,a=game:2",
+])
+def test_invalid_specs_are_rejected(raw):
+    with pytest.raises(ValueError):
+        runner.parse_tunnel_specs(raw)
+
+
+def test_build_command_adds_only_the_set_options(monkeypatch):
+    monkeypatch.setenv("LOCALXPOSE_ACCESS_TOKEN", "secret")
+    tunnel = runner.Tunnel(
+        {"name": "a", "to": "game:27960", "region": "eu", "port": "", "reserved_endpoint": ""}
+    )
+    cmd, env = tunnel.build_command()
+    assert cmd == ["loclx", "tunnel", "--raw-mode", "udp", "--to", "game:27960", "--region", "eu"]
+    assert env["ACCESS_TOKEN"] == env["LOCALXPOSE_ACCESS_TOKEN"] == "secret"
+
+
+def test_build_command_needs_a_token(monkeypatch):
+    monkeypatch.delenv("LOCALXPOSE_ACCESS_TOKEN", raising=False)
+    tunnel = runner.Tunnel(
+        {"name": "a", "to": "game:27960", "region": "", "port": "", "reserved_endpoint": ""}
+    )
+    assert tunnel.build_command() is None
+    assert tunnel.status["error"] == "LOCALXPOSE_ACCESS_TOKEN is not set"
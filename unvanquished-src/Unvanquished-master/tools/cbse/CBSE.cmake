@@ -32,6 +32,10 @@ if (NOT CBSE_PYTHON_PATH OR NOT EXISTS ${CBSE_PYTHON_PATH})
 endif()
 message(STATUS "Using CBSE Python executable: ${CBSE_PYTHON_PATH}")
 
+# Message dispatch of the generated entities, see CBSE.py --dispatch.
+set(CBSE_DISPATCH "functions" CACHE STRING "CBSE message dispatch: functions or table")
+set_property(CACHE CBSE_DISPATCH PROPERTY STRINGS functions table)
+
 macro(CBSEFileList outputDir variable)
     set(${variable} ${outputDir}/backend/CBSEBackend.cpp
                     ${outputDir}/backend/CBSEBackend.h
@@ -65,7 +69,7 @@ function(CBSE target definition output)
         COMMAND
                 ${CBSE_PYTHON_PATH}
                 ${CMAKE_SOURCE_DIR}/tools/cbse/CBSE.py
-                -s -o
+                -s --dispatch ${CBSE_DISPATCH} -o
                 "${output}"
                 "${definition}"
     )
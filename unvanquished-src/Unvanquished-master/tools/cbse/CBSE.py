@@ -34,6 +34,9 @@ import jinja2
 import yaml
 from collections import namedtuple, OrderedDict
 import argparse, sys
+import hashlib
+import json
+import multiprocessing
 import os.path
 import re
 
@@ -209,6 +212,9 @@ class Component:
     def get_own_further_dependencies(self):
         return self.furtherDependencies
 
+    def get_message_handler_name(self, message):
+        return "t_" + self.name + "_" + message.name
+
 
     def __repr__(self):
         return "Component({}, ...)".format(self.name)
@@ -219,26 +225,27 @@ class Entity:
         self.params = params
 
     def gather_components(self, components, mandatory):
-        self.components = [components[c] for c in mandatory] + \
-                          [components[c] for c in self.params.keys() if c not in mandatory]
-
-        # Add dependency components.
-        # TODO more efficient algorithm? (this is worst case O(nComponents)^3)
-        gathering_dependencies = True
-        while gathering_dependencies:
-            gathering_dependencies = False
-            for component in self.components:
-                for dependency in component.get_required_components():
-                    if dependency not in self.components:
-                        self.components.append(dependency)
-                        gathering_dependencies = True
+        # Requested components, then everything they transitively require;
+        # get_full_dependencies() already holds each component's closure.
+        mandatory_set = set(mandatory)
+        requested = [components[c] for c in mandatory] + \
+                    [components[c] for c in self.params.keys() if c not in mandatory_set]
+        gathered = set()
+        self.components = []
+        for component in requested:
+            for c in [component] + component.get_full_dependencies():
+                if c not in gathered:
+                    gathered.add(c)
+                    self.components.append(c)
 
         self.components = sorted(self.components, key = lambda component: component.priority)
 
-        # Gather the list of all messages this entity can receive
-        self.messages = set()
+        # Gather the list of all messages this entity can receive, in a stable
+        # order (first handler by priority) so that the output is reproducible
+        self.messages = OrderedDict()
         for component in self.components:
-            self.messages |= set(component.get_messages_to_handle())
+            for message in component.get_messages_to_handle():
+                self.messages[message] = True
         self.messages = list(self.messages)
 
         # Initialize the parameter state
@@ -249,36 +256,33 @@ class Entity:
             if not component.name in self.params:
                 self.params[component.name] = OrderedDict()
 
+        # Index the values that components of this entity give to the parameters
+        # of the components they require: (component, parameter) => value
+        conflict = object()
+        required_values = {}
+        for dependent in self.components:
+            for (required, required_parameters) in dependent.get_required_parameters().items():
+                if required_parameters is None:
+                    continue
+                for (required_param, required_value) in required_parameters.items():
+                    key = (required, required_param)
+                    required_values[key] = conflict if key in required_values else required_value
+
         # Choose the value for each component parameter (unless it is a user defined param)
         for component in self.components:
+            params = self.params[component.name]
             for param in component.param_list:
-                if not param.name in self.params[component.name]:
-                    # Use the parameters own default value, if it has one, as fallback
-                    self.params[component.name][param.name] = param.default
-
-                    # Look for a value given by another component that depends on the current one
-                    dependency_sets_parameter = False
-                    for dependent in self.components:
-                        required_parameters = dependent.get_required_parameters()
-                        if component.name not in required_parameters:
-                            continue
-                        if required_parameters[component.name] is None:
-                            continue
-                        for required_param, required_value in required_parameters[component.name].items():
-                            if param.name != required_param:
-                                continue
-                            if dependency_sets_parameter:
-                                raise Exception("Multiple components set a default value for the same parameter of a required component.")
-                            self.params[component.name][param.name] = required_value
-                            dependency_sets_parameter = True
-
-                # If we still have not found a value, let the user decide
-                if not param.name in self.params[component.name]:
-                    self.params[component.name][param.name] = None
+                if not param.name in params:
+                    # A value given by another component that depends on the current one,
+                    # otherwise the parameter's own default value, if it has one
+                    value = required_values.get((component.name, param.name), param.default)
+                    if value is conflict:
+                        raise Exception("Multiple components set a default value for the same parameter of a required component.")
+                    params[param.name] = value
 
                 # Let the user decide on the value
-                if self.params[component.name][param.name] == None:
-                    self.params[component.name].pop(param.name)
+                if params[param.name] == None:
+                    params.pop(param.name)
                     self.user_params[component.name][param.name] = param
                     self.has_user_params = True
 
@@ -468,6 +472,154 @@ def parse_definitions(definitions):
 
 ############################################################################
 
+DispatchTable = namedtuple('DispatchTable', ['entries', 'rows', 'handlers'])
+
+def build_dispatch_table(definitions):
+    """Precompute the message dispatch of every entity type for --dispatch table.
+
+    entries lists (entity, message, component) for each handler call, grouped
+    by entity type then message and sorted by component priority; rows maps
+    each entity name to the (begin, end) range of entries of every message;
+    handlers lists the (component, message) pairs that are used.
+    """
+    handled = dict((component, set(component.get_messages_to_handle())) for component in definitions['components'])
+    entries = []
+    rows = OrderedDict()
+    handlers = OrderedDict()
+    for entity in definitions['entities']:
+        row = []
+        for message in definitions['messages']:
+            begin = len(entries)
+            for component in entity.get_components():
+                if message in handled[component]:
+                    entries.append((entity, message, component))
+                    handlers[(component, message)] = True
+            row.append((begin, len(entries)))
+        rows[entity.name] = row
+
+    # Ranges are stored as 16 bit integers
+    if len(entries) > 0xffff:
+        raise Exception("Too many message handlers for a table driven dispatch.")
+    return DispatchTable(entries, rows, list(handlers))
+
+# Sizes in bytes of the types the analysis knows, alignment being the same;
+# pointers, references and pointer sized integers use --pointer-size and
+# other types can be given with --type-size.
+TYPE_SIZES = {
+    'bool': 1, 'char': 1, 'signed char': 1, 'unsigned char': 1,
+    'short': 2, 'unsigned short': 2,
+    'int': 4, 'unsigned': 4, 'unsigned int': 4, 'float': 4,
+    'long long': 8, 'unsigned long long': 8, 'double': 8,
+    'int8_t': 1, 'uint8_t': 1, 'int16_t': 2, 'uint16_t': 2,
+    'int32_t': 4, 'uint32_t': 4, 'int64_t': 8, 'uint64_t': 8,
+}
+POINTER_SIZED_TYPES = {'long', 'unsigned long', 'size_t', 'ssize_t', 'intptr_t', 'uintptr_t', 'ptrdiff_t'}
+
+def type_size(typ, pointer_size, type_sizes):
+    typ = ' '.join(typ.replace('const ', ' ').split())
+    if typ.endswith('*') or typ.endswith('&') or typ in POINTER_SIZED_TYPES:
+        return pointer_size
+    if typ in type_sizes:
+        return type_sizes[typ]
+    return TYPE_SIZES.get(typ)
+
+def struct_layout(members):
+    # Size and alignment of a struct with the given (size, alignment) members, in order
+    offset = 0
+    alignment = 1
+    for (size, align) in members:
+        offset = (offset + align - 1) // align * align + size
+        alignment = max(alignment, align)
+    return ((offset + alignment - 1) // alignment * alignment, alignment)
+
+def analyze(definitions, pointer_size=8, type_sizes=None):
+    """Report message fan-out, estimated memory layout and unused definitions.
+
+    Component sizes only count what the generated base class holds (the
+    owning entity, the parameters and the required components), so they
+    are lower bounds of the real components. Parameters of unknown types
+    are listed and left out.
+    """
+    type_sizes = type_sizes or {}
+    pointer = (pointer_size, pointer_size)
+    unsized_types = OrderedDict()
+
+    components = OrderedDict()
+    layouts = {}
+    for component in definitions['components']:
+        members = [pointer]
+        unsized = []
+        for param in component.param_list:
+            size = type_size(param.typ, pointer_size, type_sizes)
+            if size is None:
+                unsized.append(param.name)
+                unsized_types.setdefault(param.typ, []).append(component.name + '.' + param.name)
+            else:
+                members.append((size, size))
+        members += [pointer] * len(component.get_required_components())
+        layouts[component] = struct_layout(members)
+        components[component.name] = OrderedDict([
+            ('priority', component.priority),
+            ('base_size', layouts[component][0]),
+            ('unsized_parameters', unsized),
+            ('messages', [m.name for m in component.get_messages_to_handle()]),
+            ('entities', []),
+        ])
+
+    # vtable pointer, message handler table, component offset table
+    base_members = [pointer] * 3
+    for attrib in definitions['general'].common_entity_attributes:
+        size = type_size(attrib.typ, pointer_size, type_sizes)
+        if size is None:
+            unsized_types.setdefault(attrib.typ, []).append('Entity.' + attrib.name)
+        else:
+            base_members.append((size, size))
+
+    messages = OrderedDict()
+    for message in definitions['messages']:
+        messages[message.name] = OrderedDict([
+            ('handled_by', []), ('entities', 0), ('handler_calls', 0), ('max_fanout', 0),
+        ])
+    for component in definitions['components']:
+        for message in component.get_messages_to_handle():
+            messages[message.name]['handled_by'].append(component.name)
+
+    entities = OrderedDict()
+    for entity in definitions['entities']:
+        fanout = OrderedDict()
+        for message in entity.get_messages_to_handle():
+            fanout[message.name] = [c.name for c in entity.get_components() if message in c.get_messages_to_handle()]
+            stats = messages[message.name]
+            stats['entities'] += 1
+            stats['handler_calls'] += len(fanout[message.name])
+            stats['max_fanout'] = max(stats['max_fanout'], len(fanout[message.name]))
+        for component in entity.get_components():
+            components[component.name]['entities'].append(entity.name)
+
+        size = struct_layout(base_members + [layouts[c] for c in entity.get_components()])[0]
+        entities[entity.name] = OrderedDict([
+            ('components', [c.name for c in entity.get_components()]),
+            ('estimated_size', size),
+            # Per entity type, not per instance
+            ('table_size', len(definitions['messages']) * pointer_size + len(definitions['components']) * 4),
+            ('handler_calls', sum(len(handlers) for handlers in fanout.values())),
+            ('max_fanout', max([len(handlers) for handlers in fanout.values()] or [0])),
+            ('fanout', fanout),
+        ])
+
+    return OrderedDict([
+        ('pointer_size', pointer_size),
+        ('entities', entities),
+        ('messages', messages),
+        ('components', components),
+        ('unhandled_messages', [name for (name, stats) in messages.items() if not stats['handled_by']]),
+        ('undelivered_messages', [name for (name, stats) in messages.items() if stats['handled_by'] and not stats['entities']]),
+        ('unused_components', [name for (name, stats) in components.items() if not stats['entities']]),
+        ('unsized_types', unsized_types),
+    ])
+
+############################################################################
+
 # A custom Jinja2 template loader that removes the extra indentation
 # of the template blocks so that the output is correctly indented
 class PreprocessingLoader(jinja2.BaseLoader):
@@ -522,6 +674,127 @@ class PreprocessingLoader(jinja2.BaseLoader):
         return '\n'.join(lines)
 
 
+# Remembers, for every generated file, a hash of everything its rendering
+# depends on (generator, template, header and the definitions it reads) and
+# of the content written. A file whose inputs did not change is neither
+# rendered nor rewritten, and a rendered file identical to the one on disk
+# is not rewritten either, so unchanged outputs keep their mtime and the
+# build only recompiles what an edit actually touched.
+class RenderCache:
+    def __init__(self, path, enabled=True):
+        self.path = path
+        self.enabled = enabled
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+        self.unchanged = 0
+        if enabled and os.path.exists(path):
+            try:
+                with open(path) as f:
+                    self.entries = json.load(f)
+            except ValueError:
+                pass
+
+    @staticmethod
+    def key(*parts):
+        h = hashlib.sha256()
+        for part in parts:
+            h.update(part.encode('utf-8'))
+            h.update(b'\0')
+        return h.hexdigest()
+
+    @staticmethod
+    def stamp(output):
+        st = os.stat(output)
+        return [st.st_size, st.st_mtime_ns]
+
+    def is_fresh(self, output, key):
+        entry = self.entries.get(output)
+        if not self.enabled or entry is None or entry['key'] != key:
+            return False
+        # Also check the file itself, in case it was edited or removed.
+        try:
+            return entry['stamp'] == self.stamp(output)
+        except OSError:
+            return False
+
+    def write(self, output, key, content):
+        """Write content unless the file already holds it; return whether it was written."""
+        written = True
+        if os.path.exists(output):
+            with open(output) as f:
+                written = f.read() != content
+        if written:
+            directory = os.path.dirname(output)
+            if not os.path.exists(directory):
+                os.makedirs(directory)
+            # Never leave a half written file behind for the build to pick up
+            with open(output + '.tmp', 'w') as outfile:
+                outfile.write(content)
+            os.replace(output + '.tmp', output)
+        else:
+            self.unchanged += 1
+        self.entries[output] = {'key': key, 'stamp': self.stamp(output)}
+        return written
+
+    def save(self):
+        if not self.enabled:
+            return
+        with open(self.path + '.tmp', 'w') as f:
+            json.dump(self.entries, f, indent=0, sort_keys=True)
+        os.replace(self.path + '.tmp', self.path)
+
+    def report(self):
+        return 'CBSE cache: {} hits, {} misses ({} rendered unchanged)'.format(
+            self.hits, self.misses, self.unchanged)
+
+
+# Compiled templates and components for render_job; worker processes get
+# them by inheriting this global when forked, only job ids are pickled.
+render_state = None
+
+def render_job(job):
+    (template_name, component_index) = job
+    (templates, components) = render_state
+    template = templates[template_name]
+    if component_index is None:
+        return template.render() + "\n"
+    return template.render(component=components[component_index]) + "\n"
+
+def render_all(jobs, templates, components, processes):
+    global render_state
+    render_state = (templates, components)
+
+    # Without fork the state would have to be pickled, which the definitions
+    # do not support, so render in this process instead.
+    if processes > 1 and len(jobs) > 1 and 'fork' in multiprocessing.get_all_start_methods():
+        processes = min(processes, len(jobs))
+        with multiprocessing.get_context('fork').Pool(processes) as pool:
+            return pool.map(render_job, jobs, chunksize=max(1, len(jobs) // (4 * processes)))
+    return [render_job(job) for job in jobs]
+
+
+def snapshot_definitions(definitions):
+    # Serialize every top level entry of the raw definitions before parsing
+    # them, as the loaders fill in and convert the dictionaries in place.
+    snapshot = OrderedDict()
+    for section in ('general', 'messages', 'components', 'entities'):
+        entries = definitions.get(section) or {}
+        snapshot[section] = OrderedDict(
+            (name, json.dumps(value, default=str)) for (name, value) in entries.items())
+    return snapshot
+
+def component_inputs(component, snapshot):
+    # What a component's own files are rendered from: its definition, those
+    # of the components it (transitively) requires and the messages it handles.
+    parts = [snapshot['components'][component.name]]
+    for dependency in component.get_full_dependencies():
+        parts.append(snapshot['components'][dependency.name])
+    for message in component.get_messages_to_handle():
+        parts.append(snapshot['messages'][message.name])
+    return parts
+
+
 # A yaml loader that uses OrderedDict instead of dict internally.
 class OrderedLoader(yaml.Loader):
     @staticmethod
@@ -545,13 +818,32 @@ if __name__ == '__main__':
     parser.add_argument('-o', '--output-dir', default=None, type=str, help="Output directory for the generated source files.")
     parser.add_argument('-s', '--skeletons', action="store_true", help="Put latest skeleton files in a subfolder.")
     parser.add_argument('-p', '--header', default=None, type=argparse.FileType('r'), help="Prepend file contents as a header to all source files.")
+    parser.add_argument('--no-cache', action="store_true", help="Render every file, ignoring the render cache in the output directory.")
+    parser.add_argument('-a', '--analyze', default=None, type=argparse.FileType('w'), help="Write a JSON report of message fan-out and estimated entity sizes, - for stdout.")
+    parser.add_argument('--pointer-size', default=8, type=int, help="Pointer size of the target for --analyze (4 for 32-bit NaCl).")
+    parser.add_argument('--type-size', default=[], action='append', metavar='TYPE=BYTES', help="Size of a type unknown to --analyze, can be repeated.")
+    parser.add_argument('-d', '--dispatch', default='functions', choices=['functions', 'table'], help="Generate a dispatch function per entity and message, or one dispatch table for all.")
+    parser.add_argument('-b', '--benchmark', action="store_true", help="Also generate a message dispatch micro-benchmark, see bench_dispatch.sh.")
+    parser.add_argument('-j', '--jobs', default=1, type=int, help="Number of processes rendering templates.")
 
     args = parser.parse_args()
 
     # Load everything from the definition file
-    definitions = parse_definitions(yaml.load(args.definitions, OrderedLoader))
+    raw_definitions = yaml.load(args.definitions, OrderedLoader)
+    snapshot = snapshot_definitions(raw_definitions)
+    definitions = parse_definitions(raw_definitions)
     args.definitions.close()
 
+    if args.analyze != None:
+        type_sizes = dict((typ.strip(), int(size)) for (typ, size) in (t.rsplit('=', 1) for t in args.type_size))
+        json.dump(analyze(definitions, args.pointer_size, type_sizes), args.analyze, indent=4)
+        args.analyze.write('\n')
+        if args.analyze is not sys.stdout:
+            args.analyze.close()
+
+    # Keep progress messages out of a report written to stdout
+    log = sys.stderr if args.analyze is sys.stdout else sys.stdout
+
     # Manage output directories and files
     Output = namedtuple('Output', ['template', 'subdir', 'outname', 'overwrite'])
 
@@ -568,61 +860,90 @@ if __name__ == '__main__':
         'entities':     Output('Entities.h',   subdir_names['backend'], 'CBSEEntities.h',   True),
         'helper':       Output('Helper.h',     '',                      'CBSE.h',           False)
     }
-
-    template_params = [definitions, {
-        'files': dict([(key, val.outname) for (key, val) in unique_files.items()]),
-        'dirs': subdir_names
-    }]
-
+    if args.benchmark:
+        unique_files['benchmark'] = Output('Benchmark.cpp', subdir_names['backend'], 'CBSEBenchmark.cpp', True)
+
+    # Parameters shared by all the templates, the component templates also get 'component'
+    template_params = dict(definitions)
+    template_params['files'] = dict([(key, val.outname) for (key, val) in unique_files.items()])
+    template_params['dirs'] = subdir_names
+    template_params['dispatch'] = args.dispatch
+    if args.dispatch == 'table':
+        template_params['dispatch_table'] = build_dispatch_table(definitions)
+
+    header = ''
     if args.header != None:
-        template_params += [{'header': args.header.read().strip().splitlines()}]
+        header = args.header.read()
+        template_params['header'] = header.strip().splitlines()
 
     if args.output_dir != None:
         base_dir       = args.output_dir + os.path.sep
         components_dir = base_dir + subdir_names['components'] + os.path.sep
         skeletons_dir  = components_dir + subdir_names['skeletons'] + os.path.sep
 
-        # Generate a list of files to create, params_dicts will get squashed to create the template parameters
-        FileToRender = namedtuple('FileToRender', ['template', 'output', 'params_dicts', 'overwrite'])
+        # Generate a list of files to create, component is the index of the component a file is
+        # rendered for (None for unique files), inputs lists the serialized definitions it depends on
+        FileToRender = namedtuple('FileToRender', ['template', 'output', 'component', 'overwrite', 'inputs'])
         to_render = []
 
         # Add unique files
+        all_inputs = [json.dumps(snapshot), args.dispatch]
         for (key, val) in unique_files.items():
             to_render.append(FileToRender(val.template, base_dir + val.subdir + os.path.sep + val.outname, \
-                                          template_params, val.overwrite))
+                                          None, val.overwrite, all_inputs))
 
         # Add skeleton files
-        for component in definitions['components']:
-            params = template_params + [{'component': component}]
+        for (i, component) in enumerate(definitions['components']):
+            inputs = component_inputs(component, snapshot)
 
             if args.skeletons:
-                to_render.append(FileToRender('Component.h', skeletons_dir + component.get_type_name() + '.h', params, True))
-                to_render.append(FileToRender('Component.cpp', skeletons_dir + component.get_type_name() + '.cpp', params, True))
+                to_render.append(FileToRender('Component.h', skeletons_dir + component.get_type_name() + '.h', i, True, inputs))
+                to_render.append(FileToRender('Component.cpp', skeletons_dir + component.get_type_name() + '.cpp', i, True, inputs))
 
-            to_render.append(FileToRender('Component.h', components_dir + component.get_type_name() + '.h', params, False))
-            to_render.append(FileToRender('Component.cpp', components_dir + component.get_type_name() + '.cpp', params, False))
+            to_render.append(FileToRender('Component.h', components_dir + component.get_type_name() + '.h', i, False, inputs))
+            to_render.append(FileToRender('Component.cpp', components_dir + component.get_type_name() + '.cpp', i, False, inputs))
 
         # Now render the files
-        env = jinja2.Environment(loader=PreprocessingLoader(args.template_dir), trim_blocks=True, lstrip_blocks=True)
-        env.globals["enumerate"] = enumerate
+        cache = RenderCache(base_dir + '.cbse-cache.json', enabled=not args.no_cache)
+        with open(__file__, 'rb') as f:
+            generator_hash = hashlib.sha256(f.read()).hexdigest()
+        template_hashes = {}
 
+        # Find the files whose inputs changed
+        stale = []
         for render in to_render:
             if not render.overwrite and os.path.exists(render.output):
                 continue
 
-            params = OrderedDict()
-            for param_dict in render.params_dicts:
-                params.update(param_dict)
-            content = env.get_template(render.template).render(**params) + "\n"
+            if render.template not in template_hashes:
+                with open(os.path.join(args.template_dir, render.template), 'rb') as f:
+                    template_hashes[render.template] = hashlib.sha256(f.read()).hexdigest()
+            key = cache.key(generator_hash, template_hashes[render.template], header, *render.inputs)
+            if cache.is_fresh(render.output, key):
+                cache.hits += 1
+                continue
+            cache.misses += 1
+            stale.append((render, key))
 
-            directory = os.path.dirname(render.output)
-            if not os.path.exists(directory):
-                os.makedirs(directory)
+        # Compile each template needed once, with the shared parameters as its globals
+        env = jinja2.Environment(loader=PreprocessingLoader(args.template_dir), trim_blocks=True, lstrip_blocks=True)
+        env.globals["enumerate"] = enumerate
+        templates = {}
+        for (render, key) in stale:
+            if render.template not in templates:
+                templates[render.template] = env.get_template(render.template, globals=template_params)
 
-            with open(render.output, 'w') as outfile:
-                outfile.write(content)
+        # Render them across processes, then write the results from here
+        contents = render_all([(render.template, render.component) for (render, key) in stale],
+                              templates, definitions['components'], args.jobs)
+
+        for ((render, key), content) in zip(stale, contents):
+            cache.write(render.output, key, content)
 
             if not render.overwrite:
-                print('Added file, ' + render.output)
+                print('Added file, ' + render.output, file=log)
+
+        cache.save()
+        print(cache.report(), file=log)
 
 # vi:ts=4:et:ai
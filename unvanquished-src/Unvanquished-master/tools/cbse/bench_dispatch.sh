@@ -0,0 +1,16 @@
+# Builds the dispatch micro-benchmark of def.yaml for both dispatch modes and
+# runs it; extra arguments are passed on (the iteration count). The builds go
+# to a temporary directory, or to $BENCH_DIR (kept) when it is set.
+if [ -n "$BENCH_DIR" ]; then
+	out=$BENCH_DIR
+else
+	out=$(mktemp -d "${TMPDIR:-/tmp}/cbse-bench.XXXXXX") || exit
+	trap 'rm -rf "$out"' EXIT
+fi
+for mode in functions table; do
+	mkdir -p "$out/$mode"
+	${PYTHON:-python3} CBSE.py -s --benchmark --dispatch $mode def.yaml -o "$out/$mode" > /dev/null || exit
+	cp "$out/$mode"/components/skeletons/* "$out/$mode"/components/
+	${CXX:-c++} --std=c++11 -O2 -o "$out/$mode/benchmark" "$out/$mode"/backend/CBSEBackend.cpp "$out/$mode"/backend/CBSEBenchmark.cpp "$out/$mode"/components/*.cpp || exit
+	"$out/$mode/benchmark" "$@"
+done
@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+
+# Daemon CBSE Source Code
+# Copyright (c) 2014-2015, Daemon Developers
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of Daemon CBSE nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+# Scaling benchmark for the definition parsing of CBSE.py, on synthetic
+# definitions with thousands of components and entities. The first chain of
+# components is a base layer without requirements; every other component
+# requires the previous one of its chain (setting one of its parameters) and
+# two random base components. Entities thus get dependency closures of up to
+# two chains and many inherited defaults. Closures keep growing a little with
+# the total size (more base components to pick from) and there is a message
+# per ten components, so the work per entity grows too: the table shows the
+# mean components and messages per entity next to the time. The garbage
+# collector is disabled while timing, its passes over the growing heap would
+# otherwise add to the larger sizes.
+
+import argparse
+import gc
+import random
+import time
+from collections import OrderedDict
+
+from CBSE import parse_definitions
+
+def synthetic_definitions(n_components, n_entities, chain=40, params=4, per_entity=8, seed=0):
+    rng = random.Random(seed)
+
+    messages = OrderedDict()
+    for i in range(max(1, n_components // 10)):
+        messages['Msg{}'.format(i)] = [{'name': 'value', 'type': 'int'}] if i % 2 else None
+
+    components = OrderedDict()
+    components['Mandatory'] = None
+    names = []
+    for i in range(n_components):
+        name = 'C{}'.format(i)
+        requires = OrderedDict()
+        if i % chain:
+            # The only component setting a value for the previous one's p0.
+            requires[names[-1]] = OrderedDict([('p0', i)])
+        if i >= chain:
+            for other in rng.sample(names[:chain], 2):
+                requires.setdefault(other, None)
+        components[name] = {
+            'messages': rng.sample(list(messages), min(2, len(messages))),
+            'parameters': OrderedDict(('p{}'.format(p), 'int') for p in range(params)),
+            'defaults': OrderedDict(('p{}'.format(p), p) for p in range(params) if p % 2),
+            'requires': requires,
+        }
+        names.append(name)
+
+    entities = OrderedDict()
+    for i in range(n_entities):
+        chosen = rng.sample(names, min(per_entity, len(names)))
+        entities['E{}'.format(i)] = {'components': OrderedDict(
+            (name, OrderedDict([('p3', i)]) if j % 2 else None) for (j, name) in enumerate(chosen))}
+
+    return {
+        'general': {'mandatory_components': ['Mandatory']},
+        'messages': messages,
+        'components': components,
+        'entities': entities,
+    }
+
+def run(sizes, entity_factor, repeat):
+    previous = None
+    print('{:>10} {:>10} {:>12} {:>8} {:>12} {:>12}'.format(
+        'components', 'entities', 'parse (s)', 'ratio', 'comps/entity', 'msgs/entity'))
+    for n in sizes:
+        best = None
+        for _ in range(repeat):
+            # parse_definitions links the objects in place, start from fresh ones
+            definitions = synthetic_definitions(n, n * entity_factor)
+            gc.collect()
+            gc.disable()
+            try:
+                started = time.perf_counter()
+                parsed = parse_definitions(definitions)
+                elapsed = time.perf_counter() - started
+            finally:
+                gc.enable()
+            best = elapsed if best is None else min(best, elapsed)
+        entities = parsed['entities']
+        components = sum(len(e.get_components()) for e in entities) / len(entities)
+        messages = sum(len(e.get_messages_to_handle()) for e in entities) / len(entities)
+        ratio = '' if previous is None else '{:.2f}'.format(best / previous)
+        print('{:>10} {:>10} {:>12.4f} {:>8} {:>12.1f} {:>12.1f}'.format(
+            n, n * entity_factor, best, ratio, components, messages))
+        previous = best
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Times CBSE definition parsing on growing synthetic definitions.",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    parser.add_argument('-n', '--sizes', default="250,500,1000,2000,4000", type=str, help="Comma-separated component counts.")
+    parser.add_argument('-e', '--entity-factor', default=1, type=int, help="Entities per component.")
+    parser.add_argument('-r', '--repeat', default=3, type=int, help="Keep the best of this many runs.")
+
+    args = parser.parse_args()
+    run([int(n) for n in args.sizes.split(',')], args.entity_factor, args.repeat)
+
+# vi:ts=4:et:ai
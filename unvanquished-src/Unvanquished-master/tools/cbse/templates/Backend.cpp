@@ -43,6 +43,7 @@
  */
 
 #include "{{files['entities']}}"
+#include <cstddef>
 #include <tuple>
 
 #define myoffsetof(st, m) static_cast<int>((size_t)(&((st *)1)->m))-1
@@ -51,27 +52,51 @@
 // Base entity //
 // /////////// //
 
-// Base entity constructor.
-Entity::Entity(const MessageHandler *messageHandlers, const int* componentOffsets
-	{%- for attrib in general.common_entity_attributes -%}
-		, {{attrib.get_declaration()}}
-	{%- endfor -%})
-	: messageHandlers(messageHandlers), componentOffsets(componentOffsets)
-	{%- for attrib in general.common_entity_attributes -%}
-		, {{attrib.get_initializer()}}
-	{%- endfor %}
-
-{}
-
-// Base entity's message dispatcher.
-bool Entity::SendMessage(EntityMessage msg, const void* data) {
-	MessageHandler handler = messageHandlers[static_cast<int>(msg)];
-	if (handler) {
-		handler(this, data);
-		return true;
+{% if dispatch == 'table' %}
+	// Base entity constructor.
+	Entity::Entity(const DispatchRange* dispatchRow, const int* componentOffsets
+		{%- for attrib in general.common_entity_attributes -%}
+			, {{attrib.get_declaration()}}
+		{%- endfor -%})
+		: dispatchRow(dispatchRow), componentOffsets(componentOffsets)
+		{%- for attrib in general.common_entity_attributes -%}
+			, {{attrib.get_initializer()}}
+		{%- endfor %}
+
+	{}
+
+	// Base entity's message dispatcher, calls the handlers of the message in the dispatch table.
+	bool Entity::SendMessage(EntityMessage msg, const void* data) {
+		const DispatchRange& range = dispatchRow[static_cast<int>(msg)];
+		for (int i = range.begin; i < range.end; i++) {
+			const DispatchEntry& entry = dispatchEntries[i];
+			entry.handler(reinterpret_cast<char*>(this) + entry.componentOffset, data);
+		}
+		return range.begin != range.end;
 	}
-	return false;
-}
+{% else %}
+	// Base entity constructor.
+	Entity::Entity(const MessageHandler *messageHandlers, const int* componentOffsets
+		{%- for attrib in general.common_entity_attributes -%}
+			, {{attrib.get_declaration()}}
+		{%- endfor -%})
+		: messageHandlers(messageHandlers), componentOffsets(componentOffsets)
+		{%- for attrib in general.common_entity_attributes -%}
+			, {{attrib.get_initializer()}}
+		{%- endfor %}
+
+	{}
+
+	// Base entity's message dispatcher.
+	bool Entity::SendMessage(EntityMessage msg, const void* data) {
+		MessageHandler handler = messageHandlers[static_cast<int>(msg)];
+		if (handler) {
+			handler(this, data);
+			return true;
+		}
+		return false;
+	}
+{% endif %}
 
 // /////////////// //
 // Message helpers //
@@ -122,6 +147,39 @@ bool Entity::SendMessage(EntityMessage msg, const void* data) {
 
 {% endfor %}
 
+{% if dispatch == 'table' %}
+	// ////////////// //
+	// Dispatch table //
+	// ////////////// //
+	{% for (component, message) in dispatch_table.handlers %}
+
+		// {{component.get_type_name()}}'s {{message.get_name()}} handler.
+		static void {{component.get_message_handler_name(message)}}(void* component, const void*{% if message.get_num_args() > 0 %} _data{% endif %}) {
+			{% if message.get_num_args() == 0 %}
+				static_cast<{{component.get_type_name()}}*>(component)->{{message.get_handler_name()}}();
+			{% else %}
+				const auto* data = static_cast<const {{message.get_tuple_type()}}*>(_data);
+				static_cast<{{component.get_type_name()}}*>(component)->{{message.get_handler_name()}}({{message.get_unpacked_tuple_args('*data')}});
+			{% endif %}
+		}
+	{% endfor %}
+
+	// The handlers of every message for every entity type, by component priority.
+	const DispatchEntry Entity::dispatchEntries[] = {
+		{% for (entity, message, component) in dispatch_table.entries %}
+			{myoffsetof({{entity.get_type_name()}}, {{component.get_variable_name()}}), {{component.get_message_handler_name(message)}}}, // {{entity.get_type_name()}} {{message.get_name()}}
+		{% endfor %}
+		{0, nullptr}
+	};
+
+	// Entity type x message ID matrix of the ranges of dispatchEntries handling the message.
+	static const DispatchRange dispatchMatrix[][{{messages|length}}] = {
+		{% for entity in entities %}
+			{ {%- for (begin, end) in dispatch_table.rows[entity.name] %}{{'{'}}{{begin}}, {{end}}{{'}'}}{% if not loop.last %}, {% endif %}{% endfor -%} }, // {{entity.get_type_name()}}
+		{% endfor %}
+	};
+
+{% endif %}
 // ////////////////////// //
 // Entity implementations //
 // ////////////////////// //
@@ -141,46 +199,48 @@ bool Entity::SendMessage(EntityMessage msg, const void* data) {
 			{% endif %}
 		{% endfor %}
 	};
-	{% for message in entity.get_messages_to_handle() %}
+	{% if dispatch != 'table' %}
+		{% for message in entity.get_messages_to_handle() %}
 
-		// {{entity.get_type_name()}}'s {{message.get_name()}} message dispatcher.
-		void {{entity.get_message_handler_name(message)}}(Entity* _entity, const void*{% if message.get_num_args() > 0 %} _data{% endif %}) {
-			//* Cast the entity to the correct type (receive an Entity*)
-			auto* entity = static_cast<{{entity.get_type_name()}}*>(_entity);
-			{% if message.get_num_args() == 0 %}
-				{% for component in entity.get_components() %}
-					{% if message in component.get_messages_to_handle() %}
-						//* No argument for the message, just call the handlers of all the components
-						entity->{{component.get_variable_name()}}.{{message.get_handler_name()}}();
-					{% endif %}
-				{% endfor %}
-			{% else %}
-				//* Cast the message content to the right type (received a const void*)
-				const auto* data = static_cast<const {{message.get_tuple_type()}}*>(_data);
-				{% for component in entity.get_components() %}
-					{% if message in component.get_messages_to_handle() %}
-						entity->{{component.get_variable_name()}}.{{message.get_handler_name()}}({{message.get_unpacked_tuple_args('*data')}});
-					{% endif %}
-				{% endfor %}
-			{% endif %}
-		}
-	{% endfor%}
+			// {{entity.get_type_name()}}'s {{message.get_name()}} message dispatcher.
+			void {{entity.get_message_handler_name(message)}}(Entity* _entity, const void*{% if message.get_num_args() > 0 %} _data{% endif %}) {
+				//* Cast the entity to the correct type (receive an Entity*)
+				auto* entity = static_cast<{{entity.get_type_name()}}*>(_entity);
+				{% if message.get_num_args() == 0 %}
+					{% for component in entity.get_components() %}
+						{% if message in component.get_messages_to_handle() %}
+							//* No argument for the message, just call the handlers of all the components
+							entity->{{component.get_variable_name()}}.{{message.get_handler_name()}}();
+						{% endif %}
+					{% endfor %}
+				{% else %}
+					//* Cast the message content to the right type (received a const void*)
+					const auto* data = static_cast<const {{message.get_tuple_type()}}*>(_data);
+					{% for component in entity.get_components() %}
+						{% if message in component.get_messages_to_handle() %}
+							entity->{{component.get_variable_name()}}.{{message.get_handler_name()}}({{message.get_unpacked_tuple_args('*data')}});
+						{% endif %}
+					{% endfor %}
+				{% endif %}
+			}
+		{% endfor%}
 
-	// {{entity.get_type_name()}}'s message dispatcher vtable.
-	const MessageHandler {{entity.get_type_name()}}::messageHandlers[] = {
-		{% for message in messages %}
-			{% if message in entity.get_messages_to_handle() %}
-				{{entity.get_message_handler_name(message)}},
-			{% else %}
-				nullptr,
-			{% endif %}
-		{% endfor %}
-	};
+		// {{entity.get_type_name()}}'s message dispatcher vtable.
+		const MessageHandler {{entity.get_type_name()}}::messageHandlers[] = {
+			{% for message in messages %}
+				{% if message in entity.get_messages_to_handle() %}
+					{{entity.get_message_handler_name(message)}},
+				{% else %}
+					nullptr,
+				{% endif %}
+			{% endfor %}
+		};
+	{% endif %}
 
 	// {{entity.get_type_name()}}'s constructor.
 	{% set user_params = entity.get_user_params() %}
 	{{entity.get_type_name()}}::{{entity.get_type_name()}}(Params params)
-		: Entity(messageHandlers, componentOffsets
+		: Entity({% if dispatch == 'table' %}dispatchMatrix[{{loop.index0}}]{% else %}messageHandlers{% endif %}, componentOffsets
 			{%- for attrib in general.common_entity_attributes -%}
 				, params.{{attrib.get_name()}}
 			{%- endfor -%}
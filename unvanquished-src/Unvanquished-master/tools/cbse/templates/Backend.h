@@ -59,6 +59,9 @@
 #define CBSE_BACKEND_H_
 
 #include <set>
+{% if dispatch == 'table' %}
+	#include <cstdint>
+{% endif %}
 
 #define CBSE_INCLUDE_TYPES_ONLY
 #include "../{{files['helper']}}"
@@ -87,6 +90,23 @@ class Entity;
 
 /** Message handler declaration. */
 using MessageHandler = void (*)(Entity*, const void* /*_data*/);
+{% if dispatch == 'table' %}
+
+	/** Handler of a message by a component, gets the component and the message data. */
+	using ComponentMessageHandler = void (*)(void* /*component*/, const void* /*_data*/);
+
+	/** A component handling a message, by offset in its entity. */
+	struct DispatchEntry {
+		int componentOffset;
+		ComponentMessageHandler handler;
+	};
+
+	/** The handlers of a message for an entity type, as a range of dispatch entries. */
+	struct DispatchRange {
+		uint16_t begin;
+		uint16_t end;
+	};
+{% endif %}
 
 // //////////////////// //
 // Component priorities //
@@ -113,10 +133,18 @@ class Entity {
 	public:
 		/**
 		 * @brief Base entity constructor.
-		 * @param messageHandlers Message handler vtable.
+		{% if dispatch == 'table' %}
+			 * @param dispatchRow The entity type's row of the message dispatch matrix.
+		{% else %}
+			 * @param messageHandlers Message handler vtable.
+		{% endif %}
 		 * @param componentOffsets Component offset vtable.
 		 */
-		Entity(const MessageHandler* messageHandlers, const int* componentOffsets
+		{% if dispatch == 'table' %}
+			Entity(const DispatchRange* dispatchRow, const int* componentOffsets
+		{%- else %}
+			Entity(const MessageHandler* messageHandlers, const int* componentOffsets
+		{%- endif %}
 		{%- for attrib in general.common_entity_attributes -%}
 			, {{attrib.get_declaration()}}
 		{%- endfor -%}
@@ -162,8 +190,16 @@ class Entity {
 		}
 
 	private:
-		/** Message handler vtable. */
-		const MessageHandler* messageHandlers;
+		{% if dispatch == 'table' %}
+			/** Ranges of dispatchEntries handling each message for this entity type. */
+			const DispatchRange* dispatchRow;
+
+			/** Handlers of all messages for all entity types, by component priority. */
+			static const DispatchEntry dispatchEntries[];
+		{% else %}
+			/** Message handler vtable. */
+			const MessageHandler* messageHandlers;
+		{% endif %}
 
 		/** Component offset vtable. */
 		const int* componentOffsets;
@@ -0,0 +1,89 @@
+//* Daemon CBSE Source Code
+//* Copyright (c) 2014-2015, Daemon Developers
+//* All rights reserved.
+//*
+//* Redistribution and use in source and binary forms, with or without
+//* modification, are permitted provided that the following conditions are met:
+//*
+//* * Redistributions of source code must retain the above copyright notice, this
+//*   list of conditions and the following disclaimer.
+//*
+//* * Redistributions in binary form must reproduce the above copyright notice,
+//*   this list of conditions and the following disclaimer in the documentation
+//*   and/or other materials provided with the distribution.
+//*
+//* * Neither the name of Daemon CBSE nor the names of its
+//*   contributors may be used to endorse or promote products derived from
+//*   this software without specific prior written permission.
+//*
+//* THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+//* AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+//* IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+//* DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+//* FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+//* DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+//* SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+//* CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+//* OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+//* OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+{% if header is defined %}
+	/*
+	{% for line in header %}
+		 * {{line}}
+	{% endfor %}
+	 */
+
+{% endif %}
+// THIS FILE IS AUTO GENERATED, EDIT AT YOUR OWN RISK
+
+/*
+ * This file contains:
+ *   - A micro-benchmark of the message dispatch, sending every message to one
+ *     entity of every type. The component skeletons are enough to build it.
+ */
+
+#include "{{files['entities']}}"
+#include <chrono>
+#include <cstdio>
+#include <cstdlib>
+#include <type_traits>
+
+int main(int argc, char** argv) {
+	long iterations = argc > 1 ? std::atol(argv[1]) : 1000000;
+
+	{% for entity in entities %}
+		{{entity.get_type_name()}} e_{{entity.get_type_name()}}({{entity.get_type_name()}}::Params{});
+	{% endfor %}
+	Entity* entities[] = {
+		{% for entity in entities %}
+			&e_{{entity.get_type_name()}},
+		{% endfor %}
+	};
+
+	{% for message in messages %}
+		{% for (name, type) in message.args %}
+			std::remove_reference<{{type}}>::type {{message.get_name()}}_{{name}}{};
+		{% endfor %}
+	{% endfor %}
+
+	long handled = 0;
+	auto start = std::chrono::steady_clock::now();
+	for (long i = 0; i < iterations; i++) {
+		for (Entity* entity : entities) {
+			{% for message in messages %}
+				handled += entity->{{message.get_name()}}(
+					{%- for (name, type) in message.args -%}
+						{{message.get_name()}}_{{name}}{% if not loop.last %}, {% endif %}
+					{%- endfor -%}
+				);
+			{% endfor %}
+		}
+	}
+	auto end = std::chrono::steady_clock::now();
+
+	double ns = std::chrono::duration<double, std::nano>(end - start).count();
+	long sends = iterations * {{entities|length}} * {{messages|length}};
+	std::printf("dispatch=%s sends=%ld handled=%ld ns/send=%.2f\n", "{{dispatch}}", sends, handled, sends ? ns / sends : 0.0);
+	return 0;
+}
+//* vi:ai:ts=4
@@ -79,8 +79,10 @@
 			{% endfor %}
 
 		private:
-			/** {{entity.get_type_name()}}'s message handler vtable. */
-			static const MessageHandler messageHandlers[];
+			{% if dispatch != 'table' %}
+				/** {{entity.get_type_name()}}'s message handler vtable. */
+				static const MessageHandler messageHandlers[];
+			{% endif %}
 
 			/** {{entity.get_type_name()}}'s component offset table. */
 			static const int componentOffsets[];
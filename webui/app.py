@@ -1,21 +1,105 @@
+import atexit
+import hashlib
 import json
 import os
 import socket
+import threading
+import time
+from collections import deque
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
 import requests
-from flask import Flask, jsonify, render_template, request
+from flask import Flask, Response, g, jsonify, render_template, request, stream_with_context
+from flask.json.provider import DefaultJSONProvider
+
+from gamelog import EVENT_TYPES, GameEventStore, GameLogTailer
+from history import HistoryStore, parse_range
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, Registry
+from profiler import LoadProfiler, ProcSampler
+from sessions import SessionTracker
+from unvquery import (
+    STATUS_QUERY,
+    LatencyStats,
+    Player,
+    key_players,
+    parse_status_response,
+    parse_target,
+    query_many,
+)
+
+
+
+class StatusJSONProvider(DefaultJSONProvider):
+    """Serialize parsed ``Player`` records as plain objects."""
+
+    @staticmethod
+    def default(o: Any) -> Any:
+        if isinstance(o, Player):
+            return o.as_dict()
+        return DefaultJSONProvider.default(o)
+
 
 app = Flask(__name__)
+app.json = StatusJSONProvider(app)
 
 UNV_SERVER_HOST = os.environ.get("UNV_SERVER_HOST", "unvanq-server")
 UNV_SERVER_PORT = int(os.environ.get("UNV_SERVER_PORT", "27960"))
-STATUS_QUERY = b"\xff\xff\xff\xffgetstatus\n"
+STATUS_POLL_INTERVAL = float(os.environ.get("STATUS_POLL_INTERVAL", "2.0"))
+STATUS_QUERY_TIMEOUT = 1.5
+# Number of recent getstatus queries the RTT percentiles and loss rate cover.
+LATENCY_WINDOW = int(os.environ.get("LATENCY_WINDOW", "300"))
+# The dashboard never reads the raw datagram text; keep it out of every
+# payload unless explicitly asked for.
+STATUS_INCLUDE_RAW = os.environ.get("STATUS_INCLUDE_RAW", "false").lower() in ("1", "true", "yes")
 
 LOCALXPOSE_STATUS_URL = os.environ.get(
     "LOCALXPOSE_STATUS_URL",
     "http://unvanq-localxpose:4040/status",
 )
+LOCALXPOSE_LOGS_URL = os.environ.get(
+    "LOCALXPOSE_LOGS_URL",
+    LOCALXPOSE_STATUS_URL.rsplit("/status", 1)[0] + "/logs",
+)
+LOCALXPOSE_LOG_LINES = 200
+LOCALXPOSE_POLL_INTERVAL = float(os.environ.get("LOCALXPOSE_POLL_INTERVAL", "5.0"))
+# Seconds to hold each status request open until the runner reports a
+# change (0 disables long-polling; older runners just answer at once).
+LOCALXPOSE_LONG_POLL = float(os.environ.get("LOCALXPOSE_LONG_POLL", "0"))
+STREAM_KEEPALIVE = float(os.environ.get("STREAM_KEEPALIVE", "15.0"))
+
+# Extra servers for /api/servers, as "host[:port],host[:port],..."
+UNV_SERVERS = [
+    parse_target(item, UNV_SERVER_PORT)
+    for item in os.environ.get("UNV_SERVERS", "").split(",")
+    if item.strip()
+] or [(UNV_SERVER_HOST, UNV_SERVER_PORT)]
+
+HISTORY_DB = os.environ.get("HISTORY_DB", "/data/history.sqlite3")
+HISTORY_DEFAULT_RANGE = "1h"
+
+# games.log files to follow (comma-separated), read from the game server's
+# home volume; an empty value turns the tailer off.
+GAME_LOG_PATHS = [
+    p.strip()
+    for p in os.environ.get("GAME_LOG_PATHS", "/unvanquished-home/game/games.log").split(",")
+    if p.strip()
+]
+GAME_EVENTS_DB = os.environ.get("GAME_EVENTS_DB", "/data/game_events.sqlite3")
+GAME_EVENTS_RETENTION = int(float(os.environ.get("GAME_EVENTS_RETENTION_DAYS", "30")) * 86400)
+GAME_LOG_POLL_INTERVAL = float(os.environ.get("GAME_LOG_POLL_INTERVAL", "5.0"))
+GAME_EVENTS_MAX_LIMIT = 1000
+
+# A player missing from getstatus for this long has left; shorter gaps
+# (a dropped query, a map change) keep their session going.
+SESSION_GRACE = float(os.environ.get("SESSION_GRACE", "30"))
+
+# Per-map/bot-count cost table. The game server's processes are only
+# visible when the container shares its PID namespace (see compose.yml).
+PROFILE_DB = os.environ.get("PROFILE_DB", "/data/load_profile.sqlite3")
+PROFILE_PROCESSES = [
+    p.strip() for p in os.environ.get("PROFILE_PROCESSES", "daemonded,nacl_loader").split(",") if p.strip()
+]
+PROFILE_WARMUP = float(os.environ.get("PROFILE_WARMUP", "30"))
 
 PANEL_ORDER_FILE = Path(os.environ.get("PANEL_ORDER_FILE", "/data/panel_order.json"))
 DEFAULT_PANEL_ORDER = ["server", "localxpose"]
@@ -56,97 +140,308 @@ def save_panel_order(order: List[str]) -> None:
 # ----------------------------------------------------
 # Unvanquished Server Query
 # ----------------------------------------------------
+server_latency = LatencyStats(LATENCY_WINDOW)
+
+
 def query_unvanquished_server() -> Dict[str, Any]:
     result = {
         "online": False,
         "info": {},
         "players": [],
         "raw": "",
+        "rtt_ms": None,
         "error": "",
     }
 
     sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-    sock.settimeout(1.5)
+    sock.settimeout(STATUS_QUERY_TIMEOUT)
+    sent_at = None
 
     try:
         sock.sendto(STATUS_QUERY, (UNV_SERVER_HOST, UNV_SERVER_PORT))
+        sent_at = time.time()
+        sent_perf = time.perf_counter()
         data, _ = sock.recvfrom(65535)
+        rtt_ms = (time.perf_counter() - sent_perf) * 1000.0
     except Exception as exc:
         result["error"] = str(exc)
+        if isinstance(exc, socket.timeout) and sent_at is not None:
+            server_latency.record(sent_at, None)
+        else:
+            server_latency.record_error()
+        result["latency"] = server_latency.summary()
         return result
     finally:
         sock.close()
 
-    try:
-        text = data.decode("latin-1", errors="replace")
-    except:
-        text = repr(data)
+    result["rtt_ms"] = server_latency.record(sent_at, rtt_ms)
+    result["latency"] = server_latency.summary()
+    return parse_status_response(data, result, include_raw=STATUS_INCLUDE_RAW)
 
-    result["raw"] = text
-    lines = text.split("\n")
 
-    if len(lines) < 2:
-        result["error"] = "Unexpected response"
-        return result
-
-    info = parse_info_string(lines[1])
-    players = [
-        parse_player_line(l)
-        for l in lines[2:]
-        if l.strip()
-    ]
-    players = [p for p in players if p]
+# ----------------------------------------------------
+# Background Poller
+# ----------------------------------------------------
+class StatusPoller:
+    """Run a query function on a fixed interval and cache its latest result.
+
+    HTTP handlers read the cached snapshot instead of querying the server
+    themselves, so the number of open dashboards does not change how often
+    the game server is hit. ``version`` only moves when a poll returns
+    something different from the previous one (ignoring ``volatile`` keys
+    such as timings), and ``changed`` (if given) is notified at that moment
+    so streaming clients can wake up. The last few significant snapshots are
+    kept by version so callers can compute deltas against them.
+    """
+
+    def __init__(
+        self,
+        query: Callable[[], Dict[str, Any]],
+        interval: float,
+        changed: Optional[threading.Condition] = None,
+        volatile: tuple = (),
+    ) -> None:
+        self._query = query
+        self._interval = max(0.1, interval)
+        self._changed = changed
+        self._volatile = volatile
+        self._version = 0
+        # Versions are only meaningful within this process (and worker).
+        self._epoch = os.urandom(4).hex()
+        self._recent: Deque[Tuple[int, Dict[str, Any]]] = deque(maxlen=32)
+        self._encoded: Optional[Tuple[str, str]] = None
+        self._listeners: List[Callable[[Dict[str, Any]], None]] = []
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._snapshot: Dict[str, Any] = {}
+        self._updated_mono = 0.0
+        self._updated_at = 0.0
+
+    def start(self) -> None:
+        # Started lazily so that forking servers spawn the thread in the
+        # process that actually serves requests.
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def add_listener(self, listener: Callable[[Dict[str, Any]], None]) -> None:
+        """Call ``listener`` from the poll thread with every new result."""
+        self._listeners.append(listener)
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def version_tag(self) -> str:
+        """Opaque version string clients hand back as ``?since=``."""
+        return f"{self._epoch}.{self._version}"
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                result = self._query()
+            except Exception as exc:
+                result = {"online": False, "error": str(exc)}
+            with self._lock:
+                changed = not self._updated_mono or self._significant(result) != self._significant(
+                    self._snapshot
+                )
+                self._snapshot = result
+                self._updated_mono = time.monotonic()
+                self._updated_at = time.time()
+                self._encoded = None
+                if changed:
+                    self._version += 1
+                    self._recent.append((self._version, self._significant(result)))
+            self._ready.set()
+            if changed and self._changed is not None:
+                with self._changed:
+                    self._changed.notify_all()
+            for listener in self._listeners:
+                try:
+                    listener(result)
+                except Exception:
+                    pass
+            self._stop.wait(self._interval)
+
+    def _significant(self, result: Dict[str, Any]) -> Dict[str, Any]:
+        if not self._volatile:
+            return result
+        return {k: v for k, v in result.items() if k not in self._volatile}
+
+    def _wait_ready(self, wait: float) -> None:
+        self.start()
+        if not self._ready.is_set():
+            self._ready.wait(wait)
+
+    def snapshot(self, wait: float = 2.0) -> Dict[str, Any]:
+        """Return a shallow copy of the latest result with its age in seconds."""
+        self._wait_ready(wait)
+
+        with self._lock:
+            payload = dict(self._snapshot)
+            payload["version"] = self.version_tag()
+            updated_mono = self._updated_mono
+            updated_at = self._updated_at
+
+        if not updated_mono:
+            payload.setdefault("online", False)
+            payload.setdefault("error", "No status snapshot yet")
+            payload["snapshot_age"] = None
+            payload["updated_at"] = None
+            return payload
+
+        payload["snapshot_age"] = round(time.monotonic() - updated_mono, 3)
+        payload["updated_at"] = updated_at
+        return payload
+
+    def encoded(
+        self, dumps: Callable[[Any], str], wait: float = 2.0
+    ) -> Optional[Tuple[str, str, float, float]]:
+        """Return ``(etag, body, updated_mono, updated_at)`` for the latest result.
+
+        The JSON body (without the per-request age fields) is encoded once
+        per poll instead of once per request. The ETag hashes only the
+        significant part of the result, so it survives polls that merely
+        refresh timings. Returns None until the first poll has finished.
+        """
+        self._wait_ready(wait)
+
+        with self._lock:
+            if not self._updated_mono:
+                return None
+            if self._encoded is None:
+                payload = dict(self._snapshot)
+                payload["version"] = self.version_tag()
+                digest = hashlib.blake2b(
+                    dumps(self._significant(self._snapshot)).encode("utf-8"), digest_size=8
+                ).hexdigest()
+                self._encoded = (digest, dumps(payload))
+            return self._encoded + (self._updated_mono, self._updated_at)
+
+    def since(self, tag: str) -> Optional[Tuple[Dict[str, Any], Dict[str, Any]]]:
+        """Return ``(old, current)`` significant snapshots for a version tag.
+
+        None means the tag is unknown here (another process, or too old) and
+        the caller should fall back to a full response.
+        """
+        epoch, _, number = tag.partition(".")
+        if epoch != self._epoch or not number.isdigit():
+            return None
+        wanted = int(number)
+        with self._lock:
+            if not self._recent:
+                return None
+            current = self._recent[-1][1]
+            for version, snap in self._recent:
+                if version == wanted:
+                    return snap, current
+        return None
 
-    result["online"] = True
-    result["info"] = info
-    result["players"] = players
 
-    return result
+status_changed = threading.Condition()
+server_poller = StatusPoller(
+    query_unvanquished_server,
+    STATUS_POLL_INTERVAL,
+    status_changed,
+    volatile=("rtt_ms", "latency"),
+)
 
+history = HistoryStore(HISTORY_DB, poll_interval=STATUS_POLL_INTERVAL)
+server_poller.add_listener(history.record)
+atexit.register(history.flush)
 
-def parse_info_string(info: str) -> Dict[str, str]:
-    parts = info.split("\\")
-    if parts and parts[0] == "":
-        parts = parts[1:]
+sessions = SessionTracker(grace=max(SESSION_GRACE, 2 * STATUS_POLL_INTERVAL))
+server_poller.add_listener(sessions.record)
 
-    out = {}
-    it = iter(parts)
-    for k in it:
-        try:
-            out[k] = next(it)
-        except StopIteration:
-            break
-    return out
+game_events = GameEventStore(GAME_EVENTS_DB, retention=GAME_EVENTS_RETENTION)
+game_tailer = GameLogTailer(
+    GAME_LOG_PATHS,
+    game_events,
+    lock_path=f"{GAME_EVENTS_DB}.lock",
+    poll_interval=GAME_LOG_POLL_INTERVAL,
+)
 
+load_profiler = LoadProfiler(
+    PROFILE_DB,
+    sampler=ProcSampler(PROFILE_PROCESSES),
+    events=game_events if GAME_LOG_PATHS else None,
+    warmup=PROFILE_WARMUP,
+    max_gap=max(10.0, 3 * STATUS_POLL_INTERVAL),
+)
+server_poller.add_listener(load_profiler.record)
+atexit.register(load_profiler.flush)
 
-def parse_player_line(line: str):
-    parts = line.strip().split(" ", 2)
-    if len(parts) < 3:
-        return None
 
-    try:
-        score = int(parts[0])
-    except:
-        score = 0
-    try:
-        ping = int(parts[1])
-    except:
-        ping = 0
+def query_server_list() -> Dict[str, Any]:
+    return {"servers": query_many(UNV_SERVERS, include_raw=STATUS_INCLUDE_RAW)}
 
-    rest = parts[2]
-    name = rest
-    if "\"" in rest:
-        a = rest.find("\"") + 1
-        b = rest.rfind("\"")
-        if b > a:
-            name = rest[a:b]
 
-    return {"score": score, "ping": ping, "name": name}
+servers_poller = StatusPoller(query_server_list, STATUS_POLL_INTERVAL)
 
 
 # ----------------------------------------------------
 # LocalXpose Tunnel Query
 # ----------------------------------------------------
+# Local copy of the runner's log ring, advanced incrementally via /logs.
+_tunnel_logs: Deque[str] = deque(maxlen=LOCALXPOSE_LOG_LINES)
+_tunnel_log_seq = {"seq": 0}
+_tunnel_version: Dict[str, Any] = {"version": None}
+
+
+def _sync_tunnel_logs(data: Dict[str, Any]) -> None:
+    remote_seq = data.get("log_seq")
+    if not isinstance(remote_seq, int):
+        # Older runner without sequence numbers: take the tail as-is.
+        _tunnel_logs.clear()
+        _tunnel_logs.extend(data.get("log_tail", []))
+        return
+
+    if remote_seq < _tunnel_log_seq["seq"]:
+        # The runner restarted and its numbering began again.
+        _tunnel_logs.clear()
+        _tunnel_log_seq["seq"] = 0
+    if remote_seq == _tunnel_log_seq["seq"]:
+        return
+
+    r = requests.get(
+        LOCALXPOSE_LOGS_URL,
+        params={"after": _tunnel_log_seq["seq"], "limit": LOCALXPOSE_LOG_LINES},
+        timeout=1.0,
+    )
+    r.raise_for_status()
+    logs = r.json()
+    if logs.get("truncated"):
+        _tunnel_logs.clear()
+    for entry in logs.get("lines", []):
+        _tunnel_logs.append(entry["line"])
+    _tunnel_log_seq["seq"] = logs.get("last_seq", remote_seq)
+
+
+# Restart bookkeeping from the runner's supervisor and its endpoint probe
+# results, passed through as-is.
+TUNNEL_SUPERVISOR_FIELDS = (
+    "stale",
+    "state_saved_at",
+    "probe",
+    "event_counts",
+    "restarts",
+    "last_exit_code",
+    "downtime_seconds",
+    "next_restart_in",
+    "last_public_url",
+    "endpoint_changes",
+)
+
+
 def query_localxpose_status() -> Dict[str, Any]:
     result = {
         "online": False,
@@ -156,33 +451,367 @@ def query_localxpose_status() -> Dict[str, Any]:
     }
 
     try:
-        r = requests.get(LOCALXPOSE_STATUS_URL, timeout=1.0)
+        params: Dict[str, Any] = {"tail": 0}
+        timeout = 1.0
+        if LOCALXPOSE_LONG_POLL > 0 and _tunnel_version["version"] is not None:
+            params["since"] = _tunnel_version["version"]
+            params["wait"] = int(LOCALXPOSE_LONG_POLL)
+            timeout += LOCALXPOSE_LONG_POLL
+        r = requests.get(LOCALXPOSE_STATUS_URL, params=params, timeout=timeout)
         r.raise_for_status()
         data = r.json()
+        _tunnel_version["version"] = data.get("version")
+        _sync_tunnel_logs(data)
     except Exception as exc:
         result["error"] = str(exc)
         return result
 
-    result["log_tail"] = data.get("log_tail", [])
+    result["log_tail"] = list(_tunnel_logs)
     result["public_url"] = data.get("public_url")
     result["online"] = bool(data.get("online") and result["public_url"])
     if not result["error"]:
         result["error"] = data.get("error", "") or ""
+    for key in TUNNEL_SUPERVISOR_FIELDS:
+        if key in data:
+            result[key] = data[key]
 
     return result
 
 
+tunnel_poller = StatusPoller(
+    query_localxpose_status, LOCALXPOSE_POLL_INTERVAL, status_changed, volatile=("probe",)
+)
+
+
+# ----------------------------------------------------
+# Prometheus Metrics
+# ----------------------------------------------------
+# Everything here is updated from the poll threads or request hooks; a
+# scrape only renders what is already in memory.
+metrics = Registry()
+m_server_up = metrics.gauge("unv_server_up", "1 if the last getstatus query was answered.")
+m_server_players = metrics.gauge("unv_server_players", "Players (including bots) in the last snapshot.")
+m_server_maxclients = metrics.gauge("unv_server_maxclients", "sv_maxclients reported by the server.")
+m_server_queries = metrics.counter(
+    "unv_server_queries_total", "getstatus queries by outcome.", ["outcome"]
+)
+m_server_rtt = metrics.histogram(
+    "unv_server_query_rtt_seconds",
+    "Round-trip time of answered getstatus queries.",
+    [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0],
+)
+m_player_ping = metrics.histogram(
+    "unv_server_player_ping_ms",
+    "Ping of every connected human player, observed on each poll.",
+    [10, 25, 50, 75, 100, 150, 200, 300, 500, 999],
+)
+m_server_rtt_quantile = metrics.gauge(
+    "unv_server_query_rtt_window_ms",
+    "getstatus RTT percentiles over the rolling latency window.",
+    ["quantile"],
+)
+m_server_loss = metrics.gauge(
+    "unv_server_query_loss_ratio", "Share of unanswered getstatus queries in the latency window."
+)
+m_snapshot_age = metrics.gauge(
+    "unv_status_snapshot_age_seconds", "Age of the cached snapshot at scrape time.", ["source"]
+)
+m_tunnel_up = metrics.gauge("unv_tunnel_up", "1 if LocalXpose reports an online public URL.")
+m_tunnel_reconnects = metrics.counter(
+    "unv_tunnel_reconnects_total", "Times the tunnel came back online after being seen offline."
+)
+m_tunnel_restarts = metrics.gauge(
+    "unv_tunnel_restarts", "Tunnel process restarts reported by the LocalXpose runner."
+)
+m_tunnel_events = metrics.gauge(
+    "unv_tunnel_events", "Classified loclx/runner events reported by the runner.", ["type"]
+)
+m_tunnel_probe_quantile = metrics.gauge(
+    "unv_tunnel_probe_rtt_window_ms",
+    "getinfo RTT through the tunnel's public endpoint, percentiles over the probe window.",
+    ["quantile"],
+)
+m_tunnel_probe_loss = metrics.gauge(
+    "unv_tunnel_probe_loss_ratio", "Share of unanswered tunnel probes in the probe window."
+)
+m_http_duration = metrics.histogram(
+    "unv_webui_request_duration_seconds",
+    "Dashboard HTTP request latency.",
+    [0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5],
+    ["route", "method", "status"],
+)
+
+_tunnel_seen = {"online": None}
+
+
+def record_server_metrics(result: Dict[str, Any]) -> None:
+    online = bool(result.get("online"))
+    players = result.get("players") or []
+    m_server_up.set(1 if online else 0)
+    m_server_players.set(len(players))
+    if online:
+        outcome = "ok"
+    elif result.get("error") == "timed out":
+        outcome = "timeout"
+    else:
+        outcome = "error"
+    m_server_queries.inc(1, outcome)
+    latency = result.get("latency") or {}
+    for key, quantile in (("p50_ms", "0.5"), ("p95_ms", "0.95"), ("p99_ms", "0.99")):
+        if latency.get(key) is not None:
+            m_server_rtt_quantile.set(latency[key], quantile)
+    if latency.get("loss_rate") is not None:
+        m_server_loss.set(latency["loss_rate"])
+    maxclients = (result.get("info") or {}).get("sv_maxclients", "")
+    if maxclients.isdigit():
+        m_server_maxclients.set(int(maxclients))
+    if result.get("rtt_ms") is not None:
+        m_server_rtt.observe(result["rtt_ms"] / 1000.0)
+    for player in players:
+        if player.ping:
+            m_player_ping.observe(player.ping)
+
+
+def record_tunnel_metrics(result: Dict[str, Any]) -> None:
+    online = bool(result.get("online"))
+    if online and _tunnel_seen["online"] is False:
+        m_tunnel_reconnects.inc()
+    _tunnel_seen["online"] = online
+    m_tunnel_up.set(1 if online else 0)
+    if isinstance(result.get("restarts"), int):
+        m_tunnel_restarts.set(result["restarts"])
+    for kind, count in (result.get("event_counts") or {}).items():
+        m_tunnel_events.set(count, kind)
+    probe = result.get("probe")
+    if isinstance(probe, dict):
+        for key, quantile in (("p50_ms", "0.5"), ("p95_ms", "0.95"), ("p99_ms", "0.99")):
+            if probe.get(key) is not None:
+                m_tunnel_probe_quantile.set(probe[key], quantile)
+        if probe.get("loss_rate") is not None:
+            m_tunnel_probe_loss.set(probe["loss_rate"])
+
+
+server_poller.add_listener(record_server_metrics)
+tunnel_poller.add_listener(record_tunnel_metrics)
+
+
+@app.before_request
+def _start_request_timer():
+    g.request_started = time.perf_counter()
+
+
+@app.before_request
+def _start_game_log_tailer():
+    # Lazy like the pollers, but any request will do: events should be
+    # indexed whether or not anyone is looking at them yet.
+    game_tailer.start()
+
+
+@app.after_request
+def _observe_request_latency(response):
+    started = getattr(g, "request_started", None)
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        m_http_duration.observe(
+            time.perf_counter() - started, route, request.method, str(response.status_code)
+        )
+    return response
+
+
+def combined_versions() -> tuple:
+    return (server_poller.version, tunnel_poller.version)
+
+
+def stream_status_events():
+    """Yield SSE frames with the combined server/tunnel state on every change."""
+    server_poller.start()
+    tunnel_poller.start()
+    sent = None
+    while True:
+        with status_changed:
+            status_changed.wait_for(lambda: combined_versions() != sent, timeout=STREAM_KEEPALIVE)
+        current = combined_versions()
+        if current == sent:
+            # Comment frame: keeps proxies from closing the idle connection
+            # and lets the server notice clients that went away.
+            yield ": keepalive\n\n"
+            continue
+
+        payload = {
+            "server": server_poller.snapshot(),
+            "localxpose": tunnel_poller.snapshot(),
+        }
+        # Re-read after snapshot(), which may have waited for the first poll.
+        sent = combined_versions()
+        yield f"id: {sent[0]}-{sent[1]}\ndata: {app.json.dumps(payload)}\n\n"
+
+
+# ----------------------------------------------------
+# Conditional / Delta Responses
+# ----------------------------------------------------
+def cached_status_response(poller: StatusPoller) -> Response:
+    """Serve a poller's snapshot with an ETag, answering 304 when it matches.
+
+    The ETag is weak: the body also carries timing fields (query RTT,
+    snapshot age) that move on every poll without the status changing.
+    """
+    encoded = poller.encoded(app.json.dumps)
+    if encoded is None:
+        return jsonify(poller.snapshot(wait=0))
+
+    etag, body, updated_mono, updated_at = encoded
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        age = round(time.monotonic() - updated_mono, 3)
+        # Splice the per-request fields in rather than re-encoding the body:
+        # both are JSON objects, so join their members.
+        extra = app.json.dumps({"snapshot_age": age, "updated_at": updated_at})
+        assert body.endswith("}") and body != "{}" and extra.startswith("{")
+        body = f"{body[:-1]},{extra[1:]}"
+        response = Response(body, mimetype="application/json")
+    response.set_etag(etag, weak=True)
+    # Let browsers keep the body but revalidate it on every fetch.
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
+def status_delta(old: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+    """Describe how the server snapshot ``new`` differs from ``old``."""
+    old_info = old.get("info") or {}
+    new_info = new.get("info") or {}
+    before = key_players(old.get("players") or [])
+    after = key_players(new.get("players") or [])
+    return {
+        "online": new.get("online", False),
+        "error": new.get("error", ""),
+        "info_changed": {k: v for k, v in new_info.items() if old_info.get(k) != v},
+        "info_removed": [k for k in old_info if k not in new_info],
+        "players_joined": [p for k, p in after.items() if k not in before],
+        "players_left": [p for k, p in before.items() if k not in after],
+        "players_updated": [p for k, p in after.items() if k in before and before[k] != p],
+        "player_count": len(after),
+    }
+
+
 @app.route("/")
 def index():
     return render_template("index.j2")
 
 @app.route("/api/status")
 def api_status():
-    return jsonify(query_unvanquished_server())
+    since = request.args.get("since")
+    if since is None:
+        return cached_status_response(server_poller)
+
+    snapshot = server_poller.snapshot()
+    pair = server_poller.since(since)
+    if pair is None:
+        snapshot["full"] = True
+        snapshot["since"] = since
+        return jsonify(snapshot)
+
+    payload = status_delta(*pair)
+    payload["full"] = False
+    payload["since"] = since
+    payload["version"] = snapshot["version"]
+    payload["snapshot_age"] = snapshot["snapshot_age"]
+    payload["updated_at"] = snapshot["updated_at"]
+    return jsonify(payload)
 
 @app.route("/api/localxpose_status")
 def api_localxpose():
-    return jsonify(query_localxpose_status())
+    return cached_status_response(tunnel_poller)
+
+@app.route("/api/servers")
+def api_servers():
+    return cached_status_response(servers_poller)
+
+@app.route("/api/history")
+def api_history():
+    try:
+        seconds = parse_range(request.args.get("range", HISTORY_DEFAULT_RANGE))
+    except ValueError as exc:
+        return jsonify({"error": f"invalid range: {exc}"}), 400
+
+    # Make sure samples are being collected even if nobody opened /api/status.
+    server_poller.start()
+    return jsonify(history.series(seconds))
+
+@app.route("/api/sessions")
+def api_sessions():
+    server_poller.start()
+    return jsonify(sessions.summary())
+
+@app.route("/api/load_profile")
+def api_load_profile():
+    server_poller.start()
+    return jsonify({
+        "processes_found": load_profiler.sampler_found,
+        "cells": load_profiler.table(request.args.get("map") or None),
+    })
+
+@app.route("/api/game_events")
+def api_game_events():
+    """Query the game log index.
+
+    ``type`` (comma-separated), ``player`` (matches either side of a kill),
+    ``range`` (e.g. ``6h``) or ``since``/``until`` (epoch seconds), and
+    ``limit``. ``after`` (an event id) returns the next events oldest first,
+    for clients following the log; without it the newest come first.
+    """
+    args = request.args
+    types = [t for t in args.get("type", "").split(",") if t]
+    unknown = sorted(set(types) - set(EVENT_TYPES))
+    if unknown:
+        return jsonify({"error": f"unknown event type(s): {', '.join(unknown)}"}), 400
+
+    try:
+        since = float(args["since"]) if "since" in args else None
+        until = float(args["until"]) if "until" in args else None
+        if "range" in args:
+            since = time.time() - parse_range(args["range"])
+        after = int(args["after"]) if "after" in args else None
+        limit = min(max(int(args.get("limit", 100)), 1), GAME_EVENTS_MAX_LIMIT)
+    except ValueError as exc:
+        return jsonify({"error": f"invalid parameter: {exc}"}), 400
+
+    events = game_events.query(types, args.get("player") or None, since, until, after, limit)
+    return jsonify({
+        "events": events,
+        "last_id": game_events.last_id(),
+        "tailer": game_tailer.mode,
+    })
+
+@app.route("/metrics")
+def metrics_endpoint():
+    server_poller.start()
+    tunnel_poller.start()
+    for source, poller in (("server", server_poller), ("localxpose", tunnel_poller)):
+        age = poller.snapshot(wait=0).get("snapshot_age")
+        if age is not None:
+            m_snapshot_age.set(age, source)
+    return Response(metrics.render(), content_type=METRICS_CONTENT_TYPE)
+
+@app.route("/api/latency")
+def api_latency():
+    server_poller.start()
+    payload = server_latency.summary()
+    payload["target"] = f"{UNV_SERVER_HOST}:{UNV_SERVER_PORT}"
+    payload["poll_interval"] = STATUS_POLL_INTERVAL
+    payload["timeout"] = STATUS_QUERY_TIMEOUT
+    # Measured by the runner through the public endpoint; compare with the
+    # figures above to tell tunnel lag from server lag.
+    payload["tunnel"] = tunnel_poller.snapshot(wait=0).get("probe")
+    return jsonify(payload)
+
+@app.route("/api/stream")
+def api_stream():
+    return Response(
+        stream_with_context(stream_status_events()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 @app.route("/api/panel_order", methods=["GET", "POST"])
 def api_panel_order():
@@ -0,0 +1,195 @@
+"""Benchmarks for the dashboard's hot path.
+
+Measures, for getstatus payloads with 0, 24 and 64 players:
+
+- parse throughput of ``parse_info_string``, ``parse_player_line`` and the
+  full ``parse_status_response``;
+- a blocking ``query_unvanquished_server()`` round trip against a local
+  fake server (see ``fakeserver.py``);
+- end-to-end latency of the ``/api/*`` routes through the Flask app;
+- bytes allocated per ``/api/status`` request (tracemalloc).
+
+Save a baseline and compare later runs against it to catch regressions:
+
+    python bench/bench_webui.py --json baseline.json
+    python bench/bench_webui.py --baseline baseline.json --tolerance 0.25
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import timeit
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+HERE = Path(__file__).resolve().parent
+sys.path.insert(0, str(HERE.parent))
+sys.path.insert(0, str(HERE))
+
+from fakeserver import FakeServer, status_payload  # noqa: E402
+from unvquery import percentile  # noqa: E402
+
+PLAYER_COUNTS = (0, 24, 64)
+API_PATHS = (
+    "/api/status",
+    "/api/localxpose_status",
+    "/api/servers",
+    "/api/latency",
+    "/api/history?range=15m",
+    "/metrics",
+)
+
+
+def bench_throughput(fn: Callable[[], Any], min_time: float) -> Dict[str, float]:
+    """Best-of-5 calls per second, each round lasting at least ``min_time``."""
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    number = max(1, int(number * min_time / 0.2))
+    best = min(timer.repeat(repeat=5, number=number)) / number
+    return {"ops_per_s": round(1.0 / best, 1), "us_per_op": round(best * 1e6, 3)}
+
+
+def bench_latency(fn: Callable[[], Any], iterations: int) -> Dict[str, float]:
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    samples.sort()
+    return {
+        "p50_ms": round(percentile(samples, 0.50) * 1000, 4),
+        "p95_ms": round(percentile(samples, 0.95) * 1000, 4),
+        "p99_ms": round(percentile(samples, 0.99) * 1000, 4),
+    }
+
+
+def bench_memory(fn: Callable[[], Any], iterations: int) -> Dict[str, float]:
+    fn()
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        for _ in range(iterations):
+            fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"peak_bytes_per_request": peak - before}
+
+
+def run(quick: bool) -> Dict[str, Dict[str, float]]:
+    min_time = 0.05 if quick else 0.2
+    iterations = 200 if quick else 2000
+
+    fake = FakeServer(players=0).start()
+    workdir = tempfile.mkdtemp(prefix="unv-bench-")
+    os.environ.update({
+        "UNV_SERVER_HOST": fake.address[0],
+        "UNV_SERVER_PORT": str(fake.address[1]),
+        "STATUS_POLL_INTERVAL": "0.1",
+        # Nothing listens here; the tunnel poller just records the error.
+        "LOCALXPOSE_STATUS_URL": "http://127.0.0.1:9/status",
+        "HISTORY_DB": ":memory:",
+        # No game log to tail; the event store (and the tailer lock file
+        # named after it) stay in the scratch directory.
+        "GAME_LOG_PATHS": "",
+        "GAME_EVENTS_DB": os.path.join(workdir, "game_events.sqlite3"),
+        "PROFILE_DB": os.path.join(workdir, "load_profile.sqlite3"),
+        "PANEL_ORDER_FILE": os.path.join(workdir, "panel_order.json"),
+    })
+
+    import app as webapp
+    from unvquery import parse_info_string, parse_player_line, parse_status_response
+
+    client = webapp.app.test_client()
+    results: Dict[str, Dict[str, float]] = {}
+
+    for players in PLAYER_COUNTS:
+        payload = status_payload(players)
+        lines = payload.decode("latin-1").split("\n")
+        info_line = lines[1]
+        player_lines = [l for l in lines[2:] if l.strip()]
+
+        results[f"parse_info_string/{players}"] = bench_throughput(
+            lambda: parse_info_string(info_line), min_time
+        )
+        if player_lines:
+            results[f"parse_player_line/{players}"] = bench_throughput(
+                lambda: [parse_player_line(l) for l in player_lines], min_time
+            )
+        results[f"parse_status_response/{players}"] = bench_throughput(
+            lambda: parse_status_response(payload, {}), min_time
+        )
+        results[f"parse_status_response no raw/{players}"] = bench_throughput(
+            lambda: parse_status_response(payload, {}, include_raw=False), min_time
+        )
+
+        fake.set_players(players)
+        results[f"query_unvanquished_server/{players}"] = bench_latency(
+            webapp.query_unvanquished_server, max(50, iterations // 10)
+        )
+
+        # Let the poller pick up the new payload before timing the routes.
+        time.sleep(0.3)
+        for path in API_PATHS:
+            results[f"GET {path}/{players}"] = bench_latency(lambda: client.get(path), iterations)
+        results[f"memory GET /api/status/{players}"] = bench_memory(
+            lambda: client.get("/api/status"), max(20, iterations // 10)
+        )
+
+    fake.close()
+    return results
+
+
+def compare(current: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]], tolerance: float) -> List[str]:
+    """Return a line for every metric that got worse than ``tolerance`` allows."""
+    regressions = []
+    for name, base in baseline.items():
+        now = current.get(name)
+        if not now:
+            continue
+        for key, base_value in base.items():
+            value = now.get(key)
+            if value is None or not base_value:
+                continue
+            # Throughput should not drop; everything else should not grow.
+            if key == "ops_per_s":
+                worse = value < base_value * (1 - tolerance)
+            else:
+                worse = value > base_value * (1 + tolerance)
+            if worse:
+                regressions.append(f"{name} {key}: {base_value} -> {value}")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--quick", action="store_true", help="fewer iterations, for smoke runs")
+    parser.add_argument("--json", type=Path, help="write results to this file")
+    parser.add_argument("--baseline", type=Path, help="compare against a previous --json file")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    results = run(args.quick)
+    width = max(len(name) for name in results)
+    for name, values in results.items():
+        print(f"{name:<{width}}  " + "  ".join(f"{k}={v}" for k, v in values.items()))
+
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2, sort_keys=True))
+
+    if args.baseline:
+        regressions = compare(results, json.loads(args.baseline.read_text()), args.tolerance)
+        if regressions:
+            print("\nRegressions:")
+            for line in regressions:
+                print("  " + line)
+            sys.exit(1)
+        print("\nNo regressions against", args.baseline)
+
+
+if __name__ == "__main__":
+    main()
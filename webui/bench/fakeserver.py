@@ -0,0 +1,108 @@
+"""Local stand-in for an Unvanquished server's connectionless query port.
+
+Answers ``getstatus`` and ``getinfo`` with payloads shaped like the real
+daemon's, for a configurable number of players, so benchmarks and manual
+testing need no game server:
+
+    python bench/fakeserver.py --port 27960 --players 24
+"""
+import argparse
+import random
+import socket
+import threading
+from typing import Optional, Tuple
+
+PREFIX = b"\xff\xff\xff\xff"
+
+NAMES = [
+    "^1Granger", "^3Dretch^7Lord", "^xff8800Tyrant", "^5Rifleman", "Basilisk",
+    "^2Marauder", "^4Dragoon", "^6Overmind", "Reactor", "^9Chaingunner",
+    "^7[BOT] Alien", "^1[BOT] Human", "Lucifer ^^Cannon", "Mass^3Driver",
+]
+
+
+def status_payload(players: int, seed: int = 0) -> bytes:
+    """Build a ``statusResponse`` datagram with ``players`` player lines."""
+    rng = random.Random(seed)
+    info = {
+        "sv_hostname": "^5Pi-5 ^7Unvanquished",
+        "mapname": "plat23",
+        "gamename": "unv",
+        "protocol": "86",
+        "sv_maxclients": "64",
+        "g_needpass": "0",
+        "version": "Unvanquished 0.55.5 Linux-arm64 Nov 10 2025",
+        "sv_hostname_desc": "Pi 5 dedicated server",
+        "g_humanTeamLevel": "2",
+        "g_alienTeamLevel": "3",
+        "sv_cheats": "1",
+        "P": "".join(rng.choice("12-") for _ in range(64)),
+        "B": "".join(rng.choice("01") for _ in range(64)),
+        "timelimit": "45",
+        "g_unlagged": "1",
+    }
+    info_line = "".join(f"\\{k}\\{v}" for k, v in info.items())
+    lines = [PREFIX + b"statusResponse", info_line.encode("latin-1")]
+    for i in range(players):
+        name = f"{rng.choice(NAMES)}{i}"
+        ping = 0 if "[BOT]" in name else rng.randint(15, 180)
+        lines.append(f'{rng.randint(-20, 400)} {ping} "{name}"'.encode("latin-1"))
+    return b"\n".join(lines) + b"\n"
+
+
+def info_payload(players: int) -> bytes:
+    return (
+        PREFIX
+        + b"infoResponse\n\\challenge\\\\hostname\\^5Pi-5 ^7Unvanquished\\mapname\\plat23"
+        + f"\\clients\\{players}\\bots\\0\\sv_maxclients\\64\\gamename\\unv\\protocol\\86".encode()
+    )
+
+
+class FakeServer:
+    """UDP responder running on a background thread."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, players: int = 24) -> None:
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind((host, port))
+        self.address: Tuple[str, int] = self.sock.getsockname()
+        self.set_players(players)
+        self._thread: Optional[threading.Thread] = None
+
+    def set_players(self, players: int) -> None:
+        self.status = status_payload(players)
+        self.info = info_payload(players)
+
+    def serve_forever(self) -> None:
+        while True:
+            try:
+                data, addr = self.sock.recvfrom(2048)
+            except OSError:
+                return
+            if data.startswith(PREFIX + b"getstatus"):
+                self.sock.sendto(self.status, addr)
+            elif data.startswith(PREFIX + b"getinfo"):
+                self.sock.sendto(self.info, addr)
+
+    def start(self) -> "FakeServer":
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self) -> None:
+        self.sock.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=27960)
+    parser.add_argument("--players", type=int, default=24)
+    args = parser.parse_args()
+
+    server = FakeServer(args.host, args.port, args.players)
+    print(f"fake Unvanquished server on {server.address[0]}:{server.address[1]} ({args.players} players)")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
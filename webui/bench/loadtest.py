@@ -0,0 +1,102 @@
+"""Closed-loop HTTP load test for the dashboard API.
+
+Runs ``--concurrency`` client threads, each on its own keep-alive
+connection, hammering one path for ``--duration`` seconds, then prints
+throughput and latency percentiles. Point it at the Pi from another
+machine so the client does not compete with the server for CPU:
+
+    python bench/loadtest.py --url http://pi5.local:8080/api/status -c 32 -d 30
+"""
+import argparse
+import http.client
+import json
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List
+from urllib.parse import urlsplit
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from unvquery import percentile  # noqa: E402
+
+
+def _client(url: str, deadline: float, latencies: List[float], errors: Dict[str, int]) -> None:
+    parts = urlsplit(url)
+    path = parts.path or "/"
+    if parts.query:
+        path += "?" + parts.query
+    conn_cls = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+    conn = conn_cls(parts.netloc, timeout=10)
+
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            conn.request("GET", path)
+            resp = conn.getresponse()
+            resp.read()
+            if resp.status >= 400:
+                errors[f"http {resp.status}"] = errors.get(f"http {resp.status}", 0) + 1
+                continue
+        except Exception as exc:
+            key = type(exc).__name__
+            errors[key] = errors.get(key, 0) + 1
+            conn.close()
+            conn = conn_cls(parts.netloc, timeout=10)
+            continue
+        latencies.append(time.perf_counter() - started)
+    conn.close()
+
+
+def run(url: str, concurrency: int, duration: float) -> Dict[str, object]:
+    deadline = time.perf_counter() + duration
+    per_thread = [([], {}) for _ in range(concurrency)]
+    threads = [
+        threading.Thread(target=_client, args=(url, deadline, lat, err), daemon=True)
+        for lat, err in per_thread
+    ]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(x for lat, _ in per_thread for x in lat)
+    errors: Dict[str, int] = {}
+    for _, err in per_thread:
+        for key, count in err.items():
+            errors[key] = errors.get(key, 0) + count
+
+    return {
+        "url": url,
+        "concurrency": concurrency,
+        "duration_s": round(elapsed, 2),
+        "requests": len(latencies),
+        "requests_per_s": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "latency_ms": {
+            "p50": round((percentile(latencies, 0.50) or 0.0) * 1000, 2),
+            "p95": round((percentile(latencies, 0.95) or 0.0) * 1000, 2),
+            "p99": round((percentile(latencies, 0.99) or 0.0) * 1000, 2),
+            "max": round(latencies[-1] * 1000, 2) if latencies else 0.0,
+        },
+        "errors": errors,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://127.0.0.1:8080/api/status")
+    parser.add_argument("-c", "--concurrency", type=int, default=16)
+    parser.add_argument("-d", "--duration", type=float, default=15.0)
+    parser.add_argument("--warmup", type=float, default=2.0, help="seconds of untimed load first")
+    args = parser.parse_args()
+
+    if args.warmup > 0:
+        run(args.url, args.concurrency, args.warmup)
+    print(json.dumps(run(args.url, args.concurrency, args.duration), indent=2))
+
+
+if __name__ == "__main__":
+    main()
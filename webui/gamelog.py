@@ -0,0 +1,458 @@
+import calendar
+import ctypes
+import fcntl
+import json
+import os
+import re
+import select
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import store
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS event (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    type TEXT NOT NULL,
+    map TEXT NOT NULL,
+    player TEXT,
+    other TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS event_ts ON event (ts);
+CREATE INDEX IF NOT EXISTS event_type_ts ON event (type, ts);
+CREATE INDEX IF NOT EXISTS event_player_ts ON event (player, ts);
+CREATE INDEX IF NOT EXISTS event_other_ts ON event (other, ts);
+CREATE TABLE IF NOT EXISTS cursor (
+    path TEXT PRIMARY KEY,
+    inode INTEGER NOT NULL,
+    offset INTEGER NOT NULL,
+    map TEXT NOT NULL,
+    anchor_wall REAL,
+    anchor_match INTEGER
+);
+"""
+
+EVENT_TYPES = ("connect", "disconnect", "kill", "map_change", "vote_called", "vote_ended")
+
+# Every games.log line starts with the match clock, "%3i:%02i ".
+_LINE = re.compile(r"\s*(\d+):(\d\d) (.*)").match
+
+# (event type or None for bookkeeping lines, pattern) tried in order on the
+# text after the clock. Colour codes are already stripped in the file.
+LINE_RULES: List[Tuple[Optional[str], str]] = [
+    ("kill", r'Die: (?P<killer_slot>\d+) (?P<victim_slot>\d+) (?P<means>\S+)'
+             r'(?: (?P<assistant_slot>\d+) (?P<assistant_team>\d+))?: '
+             r'(?P<player>.*?) killed (?P<other>.*?)(?:; (?P<assistant>.*) assisted)?'),
+    ("connect", r'ClientConnect: (?P<slot>\d+) \[[^\]]*\] \([^)]*\) "(?P<player>.*)" ".*"(?P<bot> \[BOT\])?'),
+    ("disconnect", r'ClientDisconnect: (?P<slot>\d+) \[[^\]]*\] \([^)]*\) "(?P<player>.*)"'),
+    ("vote_called", r'Call(?P<team>Team)?Vote: (?P<slot>-?\d+) "(?P<player>.*)": (?P<vote>.*)'),
+    ("vote_ended", r'EndVote: (?P<team>\S+) (?P<result>pass|fail) (?P<yes>\d+) (?P<no>\d+)'
+                   r' (?P<players>\d+) (?P<voted>\d+)'),
+    ("map_change", r'InitGame: (?P<serverinfo>.*)'),
+    (None, r'RealTime: (?P<realtime>\d{4}-\d\d-\d\d \d\d:\d\d:\d\d) Z'),
+]
+_RULES = [(kind, re.compile(pattern + r"\Z").match) for kind, pattern in LINE_RULES]
+_INT_FIELDS = {
+    "killer_slot", "victim_slot", "assistant_slot", "assistant_team", "slot",
+    "yes", "no", "players", "voted",
+}
+
+READ_CHUNK = 64 * 1024
+# A "line" longer than this without a newline is junk; drop it rather
+# than buffering without bound.
+MAX_LINE = 8 * 1024
+
+
+def parse_line(line: str) -> Optional[Tuple[Optional[str], int, Dict[str, Any]]]:
+    """Return ``(event type, match seconds, fields)`` for a games.log line.
+
+    The type is None for lines that only carry context (``RealTime``).
+    Lines that match no rule return None.
+    """
+    clock = _LINE(line)
+    if not clock:
+        return None
+    text = clock.group(3)
+    for kind, match in _RULES:
+        found = match(text)
+        if found:
+            fields = {k: v for k, v in found.groupdict().items() if v is not None}
+            for key in _INT_FIELDS.intersection(fields):
+                fields[key] = int(fields[key])
+            return kind, int(clock.group(1)) * 60 + int(clock.group(2)), fields
+    return None
+
+
+class _Context:
+    """What a log file has told us so far that later lines depend on."""
+
+    __slots__ = ("map", "anchor_wall", "anchor_match")
+
+    def __init__(self, mapname: str = "", anchor_wall: Optional[float] = None,
+                 anchor_match: Optional[int] = None) -> None:
+        self.map = mapname
+        # RealTime gives the wall clock at one match-clock reading.
+        self.anchor_wall = anchor_wall
+        self.anchor_match = anchor_match
+
+    def timestamp(self, match_seconds: int, fallback: float) -> float:
+        if self.anchor_wall is None or self.anchor_match is None:
+            return fallback
+        if match_seconds < self.anchor_match:
+            # The match clock went backwards (warmup ended): it is no longer
+            # comparable with the anchor.
+            return fallback
+        return self.anchor_wall + (match_seconds - self.anchor_match)
+
+
+class GameEventStore:
+    """Append-only SQLite index of parsed game log events.
+
+    Events are never updated; the read position of every log file is
+    stored in the same transaction as the events read up to it, so a
+    restart resumes exactly where the last commit left off. Rows older
+    than ``retention`` seconds are pruned (0 keeps everything).
+    """
+
+    def __init__(self, path: str, retention: int = 30 * 86400) -> None:
+        self._lock = threading.Lock()
+        self._retention = retention
+        self._db = store.connect(path, SCHEMA)
+
+    def cursor(self, path: str) -> Tuple[int, int, _Context]:
+        """Return ``(inode, offset, context)`` saved for a log file."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT inode, offset, map, anchor_wall, anchor_match FROM cursor WHERE path = ?",
+                (path,),
+            ).fetchone()
+        if row is None:
+            return 0, 0, _Context()
+        return row[0], row[1], _Context(row[2], row[3], row[4])
+
+    def append(self, path: str, inode: int, offset: int, context: _Context,
+               events: List[Tuple[float, str, str, Optional[str], Optional[str], Dict[str, Any]]]) -> None:
+        rows = [
+            (ts, kind, mapname, player, other, json.dumps(data, separators=(",", ":")))
+            for ts, kind, mapname, player, other, data in events
+        ]
+        with self._lock:
+            try:
+                with self._db:
+                    self._db.executemany(
+                        "INSERT INTO event (ts, type, map, player, other, data) VALUES (?,?,?,?,?,?)",
+                        rows,
+                    )
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO cursor VALUES (?,?,?,?,?,?)",
+                        (path, inode, offset, context.map, context.anchor_wall, context.anchor_match),
+                    )
+            except sqlite3.Error:
+                pass
+
+    def prune(self, now: Optional[float] = None) -> None:
+        if not self._retention:
+            return
+        now = time.time() if now is None else now
+        with self._lock:
+            try:
+                with self._db:
+                    self._db.execute("DELETE FROM event WHERE ts < ?", (now - self._retention,))
+            except sqlite3.Error:
+                pass
+
+    def query(
+        self,
+        types: Iterable[str] = (),
+        player: Optional[str] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        after_id: Optional[int] = None,
+        limit: int = 100,
+    ) -> List[Dict[str, Any]]:
+        """Return matching events.
+
+        With ``after_id`` the result is the next ``limit`` events after that
+        id, oldest first (for following the log); otherwise it is the
+        newest ``limit`` events, newest first.
+        """
+        clauses: List[str] = []
+        params: List[Any] = []
+        types = [t for t in types if t]
+        if types:
+            clauses.append(f"type IN ({','.join('?' * len(types))})")
+            params.extend(types)
+        if player:
+            clauses.append("(player = ? OR other = ?)")
+            params.extend((player, player))
+        if since is not None:
+            clauses.append("ts >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("ts < ?")
+            params.append(until)
+        if after_id is not None:
+            clauses.append("id > ?")
+            params.append(after_id)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        order = "id" if after_id is not None else "id DESC"
+        sql = f"SELECT id, ts, type, map, player, other, data FROM event {where} ORDER BY {order} LIMIT ?"
+        params.append(limit)
+
+        with self._lock:
+            try:
+                rows = self._db.execute(sql, params).fetchall()
+            except sqlite3.Error:
+                rows = []
+        return [
+            {"id": i, "ts": ts, "type": kind, "map": mapname, "player": player_name,
+             "other": other, **json.loads(data)}
+            for i, ts, kind, mapname, player_name, other, data in rows
+        ]
+
+    def last_id(self) -> int:
+        with self._lock:
+            try:
+                row = self._db.execute("SELECT max(id) FROM event").fetchone()
+            except sqlite3.Error:
+                return 0
+        return row[0] or 0
+
+
+def _event_from_parsed(
+    kind: str, fields: Dict[str, Any], context: _Context, ts: float
+) -> Tuple[float, str, str, Optional[str], Optional[str], Dict[str, Any]]:
+    player = fields.pop("player", None)
+    other = fields.pop("other", None)
+    if kind == "connect":
+        fields["bot"] = "bot" in fields
+    elif kind == "vote_called":
+        fields["team"] = "team" in fields
+    elif kind == "vote_ended":
+        fields["passed"] = fields.pop("result") == "pass"
+    return ts, kind, context.map, player, other, fields
+
+
+def _info_value(serverinfo: str, key: str) -> str:
+    parts = serverinfo.split("\\")
+    for i in range(1, len(parts) - 1, 2):
+        if parts[i] == key:
+            return parts[i + 1]
+    return ""
+
+
+# ----------------------------------------------------
+# File watching
+# ----------------------------------------------------
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+_WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+
+
+class _Inotify:
+    """Minimal inotify through ctypes: a readable fd plus directory watches.
+
+    Only used as a wake-up signal; which file changed does not matter
+    because every followed file is checked on each wake-up.
+    """
+
+    def __init__(self) -> None:
+        libc = ctypes.CDLL(None, use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._watched: set = set()
+
+    def watch(self, directory: str) -> bool:
+        if directory in self._watched:
+            return True
+        if self._add_watch(self.fd, os.fsencode(directory), _WATCH_MASK) < 0:
+            return False
+        self._watched.add(directory)
+        return True
+
+    def wait(self, timeout: float) -> None:
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if readable:
+            try:
+                while os.read(self.fd, 4096):
+                    pass
+            except BlockingIOError:
+                pass
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+class GameLogTailer:
+    """Follow games.log files and feed their events into a ``GameEventStore``.
+
+    Reads are incremental from the stored offset, in bounded chunks, so
+    memory use does not depend on the size of the log. A file that shrinks
+    or is replaced (new inode) is read again from the start. Changes are
+    picked up through inotify when available and by checking every
+    ``poll_interval`` seconds regardless, which is also the whole
+    mechanism where inotify is missing.
+
+    Only one process may follow the logs into a given database; with
+    several gunicorn workers the others just serve queries.
+    """
+
+    def __init__(
+        self,
+        paths: List[str],
+        store: GameEventStore,
+        lock_path: str,
+        poll_interval: float = 5.0,
+    ) -> None:
+        self._paths = paths
+        self._store = store
+        self._lock_path = lock_path
+        self._poll_interval = poll_interval
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._lock_file = None
+        self.mode = "stopped"
+
+    def start(self) -> None:
+        if self._thread is not None or not self._paths:
+            return
+        with self._start_lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="gamelog-tailer", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _acquire(self) -> bool:
+        try:
+            Path(self._lock_path).parent.mkdir(parents=True, exist_ok=True)
+            handle = open(self._lock_path, "a")
+        except OSError:
+            # Nowhere to put a lock means nowhere shared to write to either.
+            return True
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            handle.close()
+            return False
+        self._lock_file = handle
+        return True
+
+    def _run(self) -> None:
+        while not self._acquire():
+            self.mode = "standby"
+            if self._stop.wait(60):
+                return
+
+        try:
+            notifier: Optional[_Inotify] = _Inotify()
+            self.mode = "inotify"
+        except (OSError, AttributeError):
+            notifier = None
+            self.mode = "polling"
+
+        last_prune = 0.0
+        while not self._stop.is_set():
+            for path in self._paths:
+                if notifier is not None:
+                    notifier.watch(os.path.dirname(path) or ".")
+                try:
+                    self.drain(path)
+                except OSError:
+                    pass
+            now = time.time()
+            if now - last_prune > 3600:
+                self._store.prune(now)
+                last_prune = now
+            if notifier is not None:
+                notifier.wait(self._poll_interval)
+            else:
+                self._stop.wait(self._poll_interval)
+
+        if notifier is not None:
+            notifier.close()
+
+    def drain(self, path: str) -> int:
+        """Read everything new in ``path``; return the number of events stored."""
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return 0
+        inode, offset, context = self._store.cursor(path)
+        if inode != st.st_ino or st.st_size < offset:
+            # Rotated, replaced or truncated: start over on the new file.
+            inode, offset, context = st.st_ino, 0, _Context()
+        if st.st_size == offset:
+            return 0
+
+        stored = 0
+        with open(path, "rb") as fh:
+            fh.seek(offset)
+            while not self._stop.is_set():
+                chunk = fh.read(READ_CHUNK)
+                if not chunk:
+                    break
+                end = chunk.rfind(b"\n")
+                if end < 0:
+                    if len(chunk) < MAX_LINE:
+                        break  # a partial line; wait for the rest
+                    end = len(chunk) - 1  # junk without newlines: skip it
+                # Only consume complete lines; a partial last line is read
+                # again once it has been finished.
+                consumed = chunk[: end + 1]
+                offset += len(consumed)
+                fh.seek(offset)
+                events = self._parse(consumed, context)
+                self._store.append(path, inode, offset, context, events)
+                stored += len(events)
+        return stored
+
+    @staticmethod
+    def _parse(
+        data: bytes, context: _Context
+    ) -> List[Tuple[float, str, str, Optional[str], Optional[str], Dict[str, Any]]]:
+        now = time.time()
+        events = []
+        # InitGame is logged just before the RealTime line that dates it.
+        pending_map: Optional[int] = None
+        for raw in data.decode("utf-8", "replace").splitlines():
+            if len(raw) > MAX_LINE:
+                continue
+            parsed = parse_line(raw)
+            if parsed is None:
+                continue
+            kind, seconds, fields = parsed
+            if kind is None:
+                try:
+                    wall = calendar.timegm(time.strptime(fields["realtime"], "%Y-%m-%d %H:%M:%S"))
+                except ValueError:
+                    # Digits in the right places but no real date (a torn
+                    # or corrupted line): keep the previous anchor.
+                    continue
+                context.anchor_wall, context.anchor_match = float(wall), seconds
+                if pending_map is not None:
+                    _, *rest = events[pending_map]
+                    events[pending_map] = (float(wall), *rest)  # type: ignore[assignment]
+                    pending_map = None
+                continue
+            if kind == "map_change":
+                context.map = _info_value(fields.pop("serverinfo"), "mapname")
+                # The next RealTime line re-anchors the clock for this map.
+                context.anchor_wall = context.anchor_match = None
+                fields["map"] = context.map
+                pending_map = len(events)
+            events.append(_event_from_parsed(kind, fields, context, context.timestamp(seconds, now)))
+        return events
@@ -0,0 +1,31 @@
+"""Production serving settings for the dashboard (``gunicorn -c gunicorn.conf.py app:app``).
+
+Each worker process runs its own status pollers, so keep ``WEB_WORKERS`` at
+1 unless you accept one extra getstatus query per interval per worker; scale
+with threads instead.
+
+Every open ``/api/stream`` (SSE) client holds one thread for as long as its
+tab stays open, and once all threads are taken every other request queues
+behind them, so the page stops loading. The thread count is therefore
+``WEB_SSE_CLIENTS`` (the dashboards you expect open at once, default 16)
+plus ``WEB_SPARE_THREADS`` (default 16) for ordinary requests, unless
+``WEB_THREADS`` sets it outright.
+"""
+import os
+
+bind = f"0.0.0.0:{os.environ.get('WEB_PORT', '8080')}"
+worker_class = "gthread"
+workers = int(os.environ.get("WEB_WORKERS", "1"))
+sse_clients = int(os.environ.get("WEB_SSE_CLIENTS", "16"))
+spare_threads = int(os.environ.get("WEB_SPARE_THREADS", "16"))
+threads = int(os.environ.get("WEB_THREADS") or sse_clients + spare_threads)
+keepalive = int(os.environ.get("WEB_KEEPALIVE", "5"))
+timeout = int(os.environ.get("WEB_TIMEOUT", "30"))
+graceful_timeout = int(os.environ.get("WEB_GRACEFUL_TIMEOUT", "10"))
+backlog = int(os.environ.get("WEB_BACKLOG", "256"))
+max_requests = int(os.environ.get("WEB_MAX_REQUESTS", "0"))
+max_requests_jitter = int(os.environ.get("WEB_MAX_REQUESTS_JITTER", "0"))
+accesslog = os.environ.get("WEB_ACCESS_LOG") or None
+errorlog = "-"
+loglevel = os.environ.get("WEB_LOG_LEVEL", "info")
+
@@ -0,0 +1,250 @@
+import sqlite3
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import store
+
+# (name, bucket width in seconds)
+RESOLUTIONS: List[Tuple[str, int]] = [("1m", 60), ("1h", 3600)]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS rollup (
+    resolution INTEGER NOT NULL,
+    bucket INTEGER NOT NULL,
+    samples INTEGER NOT NULL,
+    online INTEGER NOT NULL,
+    players_min INTEGER NOT NULL,
+    players_max INTEGER NOT NULL,
+    players_sum INTEGER NOT NULL,
+    ping_sum INTEGER NOT NULL,
+    ping_count INTEGER NOT NULL,
+    ping_max INTEGER NOT NULL,
+    mapname TEXT NOT NULL,
+    PRIMARY KEY (resolution, bucket)
+) WITHOUT ROWID
+"""
+
+# Merge into an existing bucket so a partial bucket written at shutdown is
+# completed, not overwritten, by the next process.
+UPSERT = """
+INSERT INTO rollup VALUES (?,?,?,?,?,?,?,?,?,?,?)
+ON CONFLICT (resolution, bucket) DO UPDATE SET
+    samples = samples + excluded.samples,
+    online = online + excluded.online,
+    players_min = min(players_min, excluded.players_min),
+    players_max = max(players_max, excluded.players_max),
+    players_sum = players_sum + excluded.players_sum,
+    ping_sum = ping_sum + excluded.ping_sum,
+    ping_count = ping_count + excluded.ping_count,
+    ping_max = max(ping_max, excluded.ping_max),
+    mapname = excluded.mapname
+"""
+
+RANGE_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+
+
+def parse_range(value: str) -> int:
+    """Turn ``90``, ``15m``, ``6h``, ``7d`` or ``1w`` into seconds."""
+    value = value.strip().lower()
+    if not value:
+        raise ValueError("range is empty")
+    unit = RANGE_UNITS.get(value[-1])
+    number = value[:-1] if unit else value
+    seconds = float(number) * (unit or 1)
+    if not 0 < seconds < float("inf"):
+        raise ValueError("range must be positive")
+    return int(seconds)
+
+
+class _Bucket:
+    __slots__ = (
+        "start", "samples", "online", "players_min", "players_max",
+        "players_sum", "ping_sum", "ping_count", "ping_max", "mapname",
+    )
+
+    def __init__(self, start: int) -> None:
+        self.start = start
+        self.samples = 0
+        self.online = 0
+        self.players_min = 0
+        self.players_max = 0
+        self.players_sum = 0
+        self.ping_sum = 0
+        self.ping_count = 0
+        self.ping_max = 0
+        self.mapname = ""
+
+    def add(self, online: bool, players: int, pings: List[int], mapname: str) -> None:
+        if self.samples == 0 or players < self.players_min:
+            self.players_min = players
+        if players > self.players_max:
+            self.players_max = players
+        self.samples += 1
+        self.online += int(online)
+        self.players_sum += players
+        self.ping_sum += sum(pings)
+        self.ping_count += len(pings)
+        if pings:
+            self.ping_max = max(self.ping_max, max(pings))
+        if mapname:
+            self.mapname = mapname
+
+    def row(self, resolution: int) -> Tuple[Any, ...]:
+        return (
+            resolution, self.start, self.samples, self.online,
+            self.players_min, self.players_max, self.players_sum,
+            self.ping_sum, self.ping_count, self.ping_max, self.mapname,
+        )
+
+
+def _point_from_row(row: Tuple[Any, ...]) -> Dict[str, Any]:
+    (_, start, samples, online, p_min, p_max, p_sum, ping_sum, ping_count, ping_max, mapname) = row
+    return {
+        "t": start,
+        "samples": samples,
+        "uptime": round(online / samples, 3) if samples else 0.0,
+        "players_min": p_min,
+        "players_max": p_max,
+        "players_avg": round(p_sum / samples, 2) if samples else 0.0,
+        "ping_avg": round(ping_sum / ping_count, 1) if ping_count else None,
+        "ping_max": ping_max if ping_count else None,
+        "map": mapname,
+    }
+
+
+class HistoryStore:
+    """Bounded time-series of server status samples.
+
+    Raw samples live in a fixed-size in-memory ring. Every sample is also
+    folded into the current 1-minute and 1-hour buckets, which are written
+    to SQLite once they close, so the database sees one write per minute
+    rather than one per poll. Each resolution is pruned to its own
+    retention window.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        raw_retention: int = 3600,
+        minute_retention: int = 2 * 86400,
+        hour_retention: int = 30 * 86400,
+        poll_interval: float = 2.0,
+    ) -> None:
+        self._lock = threading.Lock()
+        self._raw: Deque[Tuple[float, bool, int, Optional[float], Optional[int], str]] = deque(
+            maxlen=max(1, int(raw_retention / max(poll_interval, 0.1)) + 1)
+        )
+        self._retention = {
+            "raw": raw_retention,
+            "1m": minute_retention,
+            "1h": hour_retention,
+        }
+        self._open: Dict[int, _Bucket] = {}
+        self._db = store.connect(path, SCHEMA)
+
+    def record(self, snapshot: Dict[str, Any], now: Optional[float] = None) -> None:
+        now = time.time() if now is None else now
+        online = bool(snapshot.get("online"))
+        players = snapshot.get("players") or []
+        # Bots report a ping of 0; leave them out of the latency figures.
+        pings = [p.ping for p in players if p.ping]
+        mapname = (snapshot.get("info") or {}).get("mapname", "")
+        count = len(players)
+
+        with self._lock:
+            self._raw.append((
+                now,
+                online,
+                count,
+                round(sum(pings) / len(pings), 1) if pings else None,
+                max(pings) if pings else None,
+                mapname,
+            ))
+
+            closed: List[Tuple[Any, ...]] = []
+            for _, width in RESOLUTIONS:
+                start = int(now // width) * width
+                bucket = self._open.get(width)
+                if bucket is not None and bucket.start != start:
+                    closed.append(bucket.row(width))
+                    bucket = None
+                if bucket is None:
+                    bucket = self._open[width] = _Bucket(start)
+                bucket.add(online, count, pings, mapname)
+
+            if closed:
+                self._flush(closed, now)
+
+    def _flush(self, rows: List[Tuple[Any, ...]], now: float) -> None:
+        try:
+            with self._db:
+                self._db.executemany(UPSERT, rows)
+                for name, width in RESOLUTIONS:
+                    self._db.execute(
+                        "DELETE FROM rollup WHERE resolution = ? AND bucket < ?",
+                        (width, int(now - self._retention[name])),
+                    )
+        except sqlite3.Error:
+            pass
+
+    def flush(self) -> None:
+        """Write the still-open buckets, e.g. before the process exits."""
+        with self._lock:
+            rows = [bucket.row(width) for width, bucket in self._open.items()]
+            self._open.clear()
+            if rows:
+                self._flush(rows, time.time())
+
+    def series(self, range_seconds: int, now: Optional[float] = None) -> Dict[str, Any]:
+        """Return points covering the last ``range_seconds``.
+
+        The finest resolution whose retention covers the range is used, so a
+        one-week query returns ~168 hourly points instead of every poll.
+        """
+        now = time.time() if now is None else now
+        since = now - range_seconds
+
+        if range_seconds <= self._retention["raw"]:
+            with self._lock:
+                points = [
+                    {
+                        "t": round(ts, 3),
+                        "samples": 1,
+                        "uptime": 1.0 if online else 0.0,
+                        "players_min": count,
+                        "players_max": count,
+                        "players_avg": count,
+                        "ping_avg": ping_avg,
+                        "ping_max": ping_max,
+                        "map": mapname,
+                    }
+                    for ts, online, count, ping_avg, ping_max, mapname in self._raw
+                    if ts >= since
+                ]
+            return {"range": range_seconds, "resolution": "raw", "points": points}
+
+        name, width = RESOLUTIONS[-1]
+        for candidate, candidate_width in RESOLUTIONS:
+            if range_seconds <= self._retention[candidate]:
+                name, width = candidate, candidate_width
+                break
+
+        with self._lock:
+            try:
+                rows = self._db.execute(
+                    "SELECT * FROM rollup WHERE resolution = ? AND bucket >= ? ORDER BY bucket",
+                    (width, int(since // width) * width),
+                ).fetchall()
+            except sqlite3.Error:
+                rows = []
+            current = self._open.get(width)
+            if current is not None:
+                rows.append(current.row(width))
+
+        return {
+            "range": range_seconds,
+            "resolution": name,
+            "points": [_point_from_row(row) for row in rows],
+        }
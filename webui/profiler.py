@@ -0,0 +1,342 @@
+"""Per-map, per-bot-count load profile of the game server.
+
+Every status poll is joined with a CPU/RSS sample of the server processes
+read from ``/proc`` and with the kills and map changes the game log tailer
+indexed since the previous poll. Run this module to print the table:
+
+    python profiler.py --db /data/load_profile.sqlite3
+"""
+import argparse
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import store
+from gamelog import GameEventStore
+
+# daemonded runs the engine, but the game logic (and so the bots) lives in
+# the NaCl sandbox it spawns, which shows up as nacl_loader.
+DEFAULT_PROCESSES = ("daemonded", "nacl_loader")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cell (
+    map TEXT NOT NULL,
+    bots INTEGER NOT NULL,
+    samples INTEGER NOT NULL,
+    seconds REAL NOT NULL,
+    humans_sum INTEGER NOT NULL,
+    rtt_sum REAL NOT NULL,
+    rtt_count INTEGER NOT NULL,
+    rtt_max REAL NOT NULL,
+    cpu_sum REAL NOT NULL,
+    cpu_count INTEGER NOT NULL,
+    cpu_max REAL NOT NULL,
+    rss_max INTEGER NOT NULL,
+    kills INTEGER NOT NULL,
+    warmup_samples INTEGER NOT NULL,
+    warmup_cpu_max REAL NOT NULL,
+    PRIMARY KEY (map, bots)
+) WITHOUT ROWID
+"""
+
+# Add to the stored cell, like the history rollups, so several processes
+# (or restarts) keep contributing to the same table.
+UPSERT = """
+INSERT INTO cell VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)
+ON CONFLICT (map, bots) DO UPDATE SET
+    samples = samples + excluded.samples,
+    seconds = seconds + excluded.seconds,
+    humans_sum = humans_sum + excluded.humans_sum,
+    rtt_sum = rtt_sum + excluded.rtt_sum,
+    rtt_count = rtt_count + excluded.rtt_count,
+    rtt_max = max(rtt_max, excluded.rtt_max),
+    cpu_sum = cpu_sum + excluded.cpu_sum,
+    cpu_count = cpu_count + excluded.cpu_count,
+    cpu_max = max(cpu_max, excluded.cpu_max),
+    rss_max = max(rss_max, excluded.rss_max),
+    kills = kills + excluded.kills,
+    warmup_samples = warmup_samples + excluded.warmup_samples,
+    warmup_cpu_max = max(warmup_cpu_max, excluded.warmup_cpu_max)
+"""
+
+COLUMNS = (
+    "map", "bots", "samples", "seconds", "humans_sum", "rtt_sum", "rtt_count",
+    "rtt_max", "cpu_sum", "cpu_count", "cpu_max", "rss_max", "kills",
+    "warmup_samples", "warmup_cpu_max",
+)
+
+
+class ProcSampler:
+    """CPU% and resident memory of the processes named ``names``.
+
+    CPU is summed over the matching processes and given in percent of one
+    core (so it can exceed 100 on the Pi's four cores), averaged over the
+    time since the previous sample. The process list is rescanned when a
+    process disappears and every ``rescan`` seconds, which picks up a
+    restarted server or a new sandbox after a map change.
+    """
+
+    def __init__(self, names: Iterable[str] = DEFAULT_PROCESSES, proc: str = "/proc",
+                 rescan: float = 30.0) -> None:
+        # /proc/<pid>/comm is truncated to 15 characters.
+        self._names = {name[:15] for name in names}
+        self._proc = proc
+        self._rescan = rescan
+        self._scanned = 0.0
+        self._pids: List[int] = []
+        self._ticks: Dict[int, int] = {}
+        self._last: Optional[float] = None
+        self._hz = os.sysconf("SC_CLK_TCK")
+        self._page = os.sysconf("SC_PAGE_SIZE")
+
+    @property
+    def found(self) -> bool:
+        return bool(self._pids)
+
+    def _scan(self) -> None:
+        pids = []
+        try:
+            entries = os.listdir(self._proc)
+        except OSError:
+            entries = []
+        for entry in entries:
+            if not entry.isdigit():
+                continue
+            try:
+                with open(f"{self._proc}/{entry}/comm") as fh:
+                    if fh.read().strip() in self._names:
+                        pids.append(int(entry))
+            except OSError:
+                continue
+        self._pids = pids
+        self._scanned = time.monotonic()
+
+    def _read(self, pid: int) -> Optional[Tuple[int, int]]:
+        """Return ``(utime + stime ticks, rss bytes)`` for a process."""
+        try:
+            with open(f"{self._proc}/{pid}/stat") as fh:
+                stat = fh.read()
+        except OSError:
+            return None
+        # The command name may contain spaces; fields resume after ")".
+        fields = stat[stat.rindex(")") + 2:].split()
+        return int(fields[11]) + int(fields[12]), int(fields[21]) * self._page
+
+    def sample(self) -> Tuple[Optional[float], Optional[int]]:
+        """Return ``(cpu_percent, rss_bytes)``; None where unknown.
+
+        CPU needs two samples, so the first call only returns memory.
+        """
+        now = time.monotonic()
+        if not self._pids or now - self._scanned >= self._rescan:
+            self._scan()
+
+        ticks: Dict[int, int] = {}
+        rss = 0
+        for pid in self._pids:
+            read = self._read(pid)
+            if read is None:
+                # Gone; look again next time.
+                self._scanned = 0.0
+                continue
+            ticks[pid], mem = read
+            rss += mem
+
+        cpu = None
+        if self._last is not None and now > self._last:
+            # Only processes seen both times count; a new one starts next time.
+            used = sum(t - self._ticks[pid] for pid, t in ticks.items() if pid in self._ticks)
+            cpu = round(max(used, 0) / self._hz / (now - self._last) * 100.0, 1)
+        self._ticks = ticks
+        self._last = now
+        if not ticks:
+            return None, None
+        return cpu, rss
+
+
+class _Cell:
+    __slots__ = COLUMNS
+
+    def __init__(self, mapname: str, bots: int) -> None:
+        self.map = mapname
+        self.bots = bots
+        for name in COLUMNS[2:]:
+            setattr(self, name, 0)
+
+    def row(self) -> Tuple[Any, ...]:
+        return tuple(getattr(self, name) for name in COLUMNS)
+
+
+def _summarize(row: Dict[str, Any]) -> Dict[str, Any]:
+    samples = row["samples"] or 1
+    minutes = row["seconds"] / 60.0
+    return {
+        "map": row["map"],
+        "bots": row["bots"],
+        "samples": row["samples"],
+        "minutes": round(minutes, 1),
+        "humans_avg": round(row["humans_sum"] / samples, 2),
+        "rtt_avg_ms": round(row["rtt_sum"] / row["rtt_count"], 2) if row["rtt_count"] else None,
+        "rtt_max_ms": round(row["rtt_max"], 2) if row["rtt_count"] else None,
+        "cpu_avg": round(row["cpu_sum"] / row["cpu_count"], 1) if row["cpu_count"] else None,
+        "cpu_max": row["cpu_max"] if row["cpu_count"] else None,
+        "rss_max_mb": round(row["rss_max"] / 2**20, 1) if row["rss_max"] else None,
+        "kills_per_min": round(row["kills"] / minutes, 2) if minutes else None,
+        "warmup_samples": row["warmup_samples"],
+        "warmup_cpu_max": row["warmup_cpu_max"] if row["warmup_samples"] else None,
+    }
+
+
+class LoadProfiler:
+    """Accumulate server cost per (map, bot count).
+
+    Bots are the players reporting a ping of 0. Samples taken within
+    ``warmup`` seconds of a map change (from the game log when it is
+    tailed, otherwise from the map name in getstatus) are map loading
+    rather than play: they only feed the ``warmup_*`` columns. Pending
+    sums are written to SQLite every ``flush_interval`` seconds.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        sampler: Optional[ProcSampler] = None,
+        events: Optional[GameEventStore] = None,
+        warmup: float = 30.0,
+        flush_interval: float = 60.0,
+        max_gap: float = 10.0,
+    ) -> None:
+        self._lock = threading.Lock()
+        self._sampler = sampler
+        self._events = events
+        self._warmup = warmup
+        self._flush_interval = flush_interval
+        self._max_gap = max_gap
+        self._cells: Dict[Tuple[str, int], _Cell] = {}
+        self._flushed = time.monotonic()
+        self._last_sample: Optional[float] = None
+        self._last_event: Optional[int] = None
+        self._map = ""
+        self._warm_until = 0.0
+        self._db = store.connect(path, SCHEMA)
+
+    @property
+    def sampler_found(self) -> bool:
+        """Whether the server processes were found in /proc at the last sample."""
+        return self._sampler is not None and self._sampler.found
+
+    def _new_events(self) -> Tuple[int, List[float]]:
+        """Kills and map change times logged since the previous poll."""
+        if self._events is None:
+            return 0, []
+        if self._last_event is None:
+            # Start from now; older events belong to samples we never took.
+            self._last_event = self._events.last_id()
+            return 0, []
+        events = self._events.query(("kill", "map_change"), after_id=self._last_event, limit=1000)
+        if events:
+            self._last_event = events[-1]["id"]
+        kills = sum(1 for event in events if event["type"] == "kill")
+        return kills, [event["ts"] for event in events if event["type"] == "map_change"]
+
+    def record(self, snapshot: Dict[str, Any], now: Optional[float] = None) -> None:
+        if not snapshot.get("online"):
+            return
+        now = time.time() if now is None else now
+        players = snapshot.get("players") or []
+        bots = sum(1 for p in players if not p.ping)
+        mapname = (snapshot.get("info") or {}).get("mapname", "")
+        rtt = snapshot.get("rtt_ms")
+        cpu, rss = self._sampler.sample() if self._sampler else (None, None)
+
+        with self._lock:
+            kills, map_changes = self._new_events()
+            if mapname != self._map:
+                if self._map:
+                    map_changes.append(now)
+                self._map = mapname
+            for ts in map_changes:
+                self._warm_until = max(self._warm_until, ts + self._warmup)
+
+            cell = self._cells.get((mapname, bots))
+            if cell is None:
+                cell = self._cells[(mapname, bots)] = _Cell(mapname, bots)
+
+            if now < self._warm_until:
+                cell.warmup_samples += 1
+                if cpu is not None:
+                    cell.warmup_cpu_max = max(cell.warmup_cpu_max, cpu)
+            else:
+                cell.samples += 1
+                if self._last_sample is not None:
+                    # A long gap means we were not watching; do not bill it.
+                    cell.seconds += min(now - self._last_sample, self._max_gap)
+                cell.humans_sum += len(players) - bots
+                cell.kills += kills
+                if rtt is not None:
+                    cell.rtt_sum += rtt
+                    cell.rtt_count += 1
+                    cell.rtt_max = max(cell.rtt_max, rtt)
+                if cpu is not None:
+                    cell.cpu_sum += cpu
+                    cell.cpu_count += 1
+                    cell.cpu_max = max(cell.cpu_max, cpu)
+                if rss is not None:
+                    cell.rss_max = max(cell.rss_max, rss)
+            self._last_sample = now
+
+            if time.monotonic() - self._flushed >= self._flush_interval:
+                self._flush()
+
+    def _flush(self) -> None:
+        rows = [cell.row() for cell in self._cells.values()]
+        self._cells.clear()
+        self._flushed = time.monotonic()
+        try:
+            with self._db:
+                self._db.executemany(UPSERT, rows)
+        except sqlite3.Error:
+            pass
+
+    def flush(self) -> None:
+        with self._lock:
+            self._flush()
+
+    def table(self, mapname: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Return one summary row per (map, bot count), sorted by both."""
+        with self._lock:
+            self._flush()
+            sql = f"SELECT {', '.join(COLUMNS)} FROM cell"
+            params: Tuple[Any, ...] = ()
+            if mapname:
+                sql += " WHERE map = ?"
+                params = (mapname,)
+            try:
+                rows = self._db.execute(sql + " ORDER BY map, bots", params).fetchall()
+            except sqlite3.Error:
+                rows = []
+        return [_summarize(dict(zip(COLUMNS, row))) for row in rows]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", default=os.environ.get("PROFILE_DB", "/data/load_profile.sqlite3"))
+    parser.add_argument("--map", help="only this map")
+    args = parser.parse_args()
+
+    rows = LoadProfiler(args.db).table(args.map)
+    if not rows:
+        print("No samples recorded yet.")
+        return
+    headers = list(rows[0])
+    cells = [["-" if row[h] is None else str(row[h]) for h in headers] for row in rows]
+    widths = [max(len(h), *(len(c[i]) for c in cells)) for i, h in enumerate(headers)]
+    print("  ".join(h.rjust(w) for h, w in zip(headers, widths)))
+    for c in cells:
+        print("  ".join(v.rjust(w) for v, w in zip(c, widths)))
+
+
+if __name__ == "__main__":
+    main()
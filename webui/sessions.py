@@ -0,0 +1,181 @@
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from unvquery import Player, key_players, percentile
+
+# Pings the server reports for clients that are still connecting or
+# timing out; they say nothing about the connection's quality.
+PING_UNKNOWN = 999
+
+
+class _Session:
+    __slots__ = (
+        "name", "started_at", "last_seen", "polls", "bot", "pings",
+        "last_ping", "jitter", "best_score", "renamed_from",
+    )
+
+    def __init__(self, name: str, now: float, ping_window: int) -> None:
+        self.name = name
+        self.started_at = now
+        self.last_seen = now
+        self.polls = 0
+        self.bot = True
+        self.pings: Deque[int] = deque(maxlen=ping_window)
+        self.last_ping: Optional[int] = None
+        # Smoothed mean of successive ping differences (RFC 3550 style).
+        self.jitter = 0.0
+        self.best_score = 0
+        self.renamed_from: List[str] = []
+
+    def observe(self, player: Player, now: float) -> None:
+        self.last_seen = now
+        self.polls += 1
+        self.best_score = max(self.best_score, player.score)
+        ping = player.ping
+        if ping:
+            # Bots always report 0; one real ping makes this a human.
+            self.bot = False
+        if not ping or ping >= PING_UNKNOWN:
+            return
+        if self.last_ping is not None:
+            self.jitter += (abs(ping - self.last_ping) - self.jitter) / 16.0
+        self.last_ping = ping
+        self.pings.append(ping)
+
+    def summary(self, now: Optional[float] = None) -> Dict[str, Any]:
+        end = self.last_seen if now is None else now
+        pings = sorted(self.pings)
+        return {
+            "name": self.name,
+            "bot": self.bot,
+            "started_at": round(self.started_at, 3),
+            "last_seen": round(self.last_seen, 3),
+            "duration": round(end - self.started_at, 1),
+            "polls": self.polls,
+            "best_score": self.best_score,
+            "ping_p50": percentile(pings, 0.50),
+            "ping_p95": percentile(pings, 0.95),
+            "ping_p99": percentile(pings, 0.99),
+            "ping_last": self.last_ping,
+            "jitter_ms": round(self.jitter, 1) if self.last_ping is not None else None,
+            "renamed_from": list(self.renamed_from),
+        }
+
+
+class SessionTracker:
+    """Follow players across getstatus snapshots and keep per-session stats.
+
+    getstatus has no client numbers, only players in slot order, so a
+    player is identified by name plus how many earlier players share that
+    name. When a single scoring player from the previous poll vanishes as
+    a single new name appears with at least their score, that is taken as
+    a rename. A session ends once the player has been missing for
+    ``grace`` seconds, so one lost query does not split it.
+
+    Each ``record`` call costs O(players): sessions keep rolling ping
+    windows and running jitter, and the hourly peaks are one counter per
+    hour. Percentiles are only sorted when ``summary`` is asked for.
+    """
+
+    def __init__(
+        self,
+        grace: float = 30.0,
+        ping_window: int = 300,
+        closed_capacity: int = 200,
+        peak_hours: int = 7 * 24,
+    ) -> None:
+        self._lock = threading.Lock()
+        self._grace = grace
+        self._ping_window = ping_window
+        self._open: Dict[Tuple[str, int], _Session] = {}
+        self._closed: Deque[Dict[str, Any]] = deque(maxlen=closed_capacity)
+        # hour start -> [peak players, peak humans]
+        self._peaks: "OrderedDict[int, List[int]]" = OrderedDict()
+        self._peak_hours = peak_hours
+        self._maxclients: Optional[int] = None
+        self._last_poll: Optional[float] = None
+
+    def record(self, snapshot: Dict[str, Any], now: Optional[float] = None) -> None:
+        if not snapshot.get("online"):
+            # No answer says nothing about who is connected.
+            return
+        now = time.time() if now is None else now
+        current = key_players(snapshot.get("players") or [])
+        maxclients = (snapshot.get("info") or {}).get("sv_maxclients", "")
+
+        with self._lock:
+            if str(maxclients).isdigit():
+                self._maxclients = int(maxclients)
+
+            unmatched_new = [key for key in current if key not in self._open]
+            missing = [key for key in self._open if key not in current]
+            # A rename happens between two polls: only someone seen in the
+            # previous one can have become the new name.
+            just_left = [k for k in missing if self._open[k].last_seen == self._last_poll]
+            if len(unmatched_new) == 1 and len(just_left) == 1:
+                old_key, new_key = just_left[0], unmatched_new[0]
+                session = self._open[old_key]
+                if 0 < session.best_score <= current[new_key].score:
+                    del self._open[old_key]
+                    session.renamed_from.append(session.name)
+                    session.name = new_key[0]
+                    self._open[new_key] = session
+                    missing.remove(old_key)
+
+            for key, player in current.items():
+                session = self._open.get(key)
+                if session is None:
+                    session = self._open[key] = _Session(key[0], now, self._ping_window)
+                session.observe(player, now)
+
+            for key in missing:
+                session = self._open.get(key)
+                if session is not None and now - session.last_seen >= self._grace:
+                    self._closed.append(self._open.pop(key).summary())
+
+            self._record_peak(now, current)
+            self._last_poll = now
+
+    def _record_peak(self, now: float, current: Dict[Tuple[str, int], Player]) -> None:
+        hour = int(now // 3600) * 3600
+        humans = sum(1 for key in current if not self._open[key].bot)
+        peak = self._peaks.get(hour)
+        if peak is None:
+            peak = self._peaks[hour] = [0, 0]
+            while len(self._peaks) > self._peak_hours:
+                self._peaks.popitem(last=False)
+        peak[0] = max(peak[0], len(current))
+        peak[1] = max(peak[1], humans)
+
+    def summary(self, now: Optional[float] = None) -> Dict[str, Any]:
+        now = time.time() if now is None else now
+        with self._lock:
+            active = [s.summary(now) for s in self._open.values()]
+            closed = list(self._closed)
+            peaks = [(hour, p[0], p[1]) for hour, p in self._peaks.items()]
+            maxclients = self._maxclients
+
+        finished = [s for s in closed if not s["bot"]]
+        day = [p for p in peaks if p[0] >= now - 86400]
+        return {
+            "active": sorted(active, key=lambda s: s["started_at"]),
+            "recent": closed[::-1],
+            "hourly_peaks": [
+                {"hour": hour, "players": players, "humans": humans}
+                for hour, players, humans in peaks
+            ],
+            "capacity": {
+                "maxclients": maxclients,
+                "peak_players_24h": max((p[1] for p in day), default=0),
+                "peak_humans_24h": max((p[2] for p in day), default=0),
+                # Hours in which every slot was taken at least once.
+                "full_hours": sum(1 for p in peaks if maxclients and p[1] >= maxclients),
+                "hours_tracked": len(peaks),
+                "avg_session_minutes": (
+                    round(sum(s["duration"] for s in finished) / len(finished) / 60, 1)
+                    if finished else None
+                ),
+            },
+        }
@@ -0,0 +1,20 @@
+import sqlite3
+from pathlib import Path
+
+
+def connect(path: str, schema: str) -> sqlite3.Connection:
+    """Open (or create) a SQLite store shared by the poll and request threads.
+
+    ``schema`` is run on every open, so it must be idempotent. When ``path``
+    cannot be created or opened the store falls back to ``:memory:``: the
+    dashboard keeps working, just without persistence.
+    """
+    try:
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        db = sqlite3.connect(path, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+    except (OSError, sqlite3.Error):
+        db = sqlite3.connect(":memory:", check_same_thread=False)
+    db.executescript(schema)
+    return db
@@ -0,0 +1,20 @@
+import os
+import sys
+import tempfile
+
+# The webui modules import each other as top-level modules.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# app.py reads its settings at import time; point it at addresses where
+# nothing answers and keep its files in a scratch directory.
+_workdir = tempfile.mkdtemp(prefix="unv-webui-test-")
+os.environ.update({
+    "UNV_SERVER_HOST": "127.0.0.1",
+    "UNV_SERVER_PORT": "9",
+    "LOCALXPOSE_STATUS_URL": "http://127.0.0.1:9/status",
+    "PANEL_ORDER_FILE": os.path.join(_workdir, "panel_order.json"),
+    "HISTORY_DB": ":memory:",
+    "GAME_EVENTS_DB": os.path.join(_workdir, "game_events.sqlite3"),
+    "GAME_LOG_PATHS": "",
+    "PROFILE_DB": ":memory:",
+})
@@ -0,0 +1,124 @@
+import calendar
+import time
+
+import pytest
+
+import app
+from gamelog import GameEventStore, GameLogTailer, parse_line
+
+REALTIME = "2024-05-01 20:00:00"
+WALL = calendar.timegm(time.strptime(REALTIME, "%Y-%m-%d %H:%M:%S"))
+
+LOG = [
+    "  0:00 InitGame: \\mapname\\plat23\\g_humanBuildPoints\\100",
+    "  0:00 RealTime: 2024-05-01 20:00:00 Z",
+    '  0:05 ClientConnect: 0 [127.0.0.1] (ABCD) "Alice" "^1Alice"',
+    '  0:06 ClientConnect: 1 [127.0.0.1] (EFGH) "Granger" "Granger" [BOT]',
+    "  1:10 Die: 0 1 MOD_RIFLE: Alice killed Granger",
+    '  2:00 CallVote: 0 "Alice": map atcs',
+    "  2:30 EndVote: global pass 1 0 2 1",
+    '  3:00 ClientDisconnect: 1 [127.0.0.1] (EFGH) "Granger"',
+    "  3:01 say: Alice: gg",
+]
+
+
+def test_parse_line():
+    assert parse_line("  1:10 Die: 0 1 MOD_RIFLE 2 1: Alice killed Bob; Carol assisted") == (
+        "kill", 70, {
+            "killer_slot": 0, "victim_slot": 1, "means": "MOD_RIFLE",
+            "assistant_slot": 2, "assistant_team": 1,
+            "player": "Alice", "other": "Bob", "assistant": "Carol",
+        },
+    )
+    assert parse_line("12:34 RealTime: 2024-05-01 20:00:00 Z") == (
+        None, 754, {"realtime": "2024-05-01 20:00:00"},
+    )
+    assert parse_line("  3:01 say: Alice: gg") is None
+    assert parse_line("no clock here") is None
+
+
+@pytest.fixture
+def store():
+    return GameEventStore(":memory:", retention=0)
+
+
+def _tailer(store, tmp_path):
+    return GameLogTailer([], store, lock_path=str(tmp_path / "lock"))
+
+
+def test_drain_stores_events_with_wall_clock_times(store, tmp_path):
+    log = tmp_path / "games.log"
+    log.write_text("\n".join(LOG) + "\n")
+
+    assert _tailer(store, tmp_path).drain(str(log)) == 7
+    events = store.query(after_id=0)
+    assert [e["type"] for e in events] == [
+        "map_change", "connect", "connect", "kill", "vote_called", "vote_ended", "disconnect",
+    ]
+    # InitGame takes the time of the RealTime line logged right after it.
+    assert events[0]["ts"] == WALL and events[0]["map"] == "plat23"
+    assert events[1]["ts"] == WALL + 5
+    assert (events[1]["player"], events[1]["bot"]) == ("Alice", False)
+    assert events[2]["bot"] is True
+    assert (events[3]["player"], events[3]["other"], events[3]["means"]) == (
+        "Alice", "Granger", "MOD_RIFLE",
+    )
+    assert events[5]["passed"] is True
+
+    assert [e["type"] for e in store.query(player="Granger")] == ["disconnect", "kill", "connect"]
+    assert [e["type"] for e in store.query(types=["vote_called", "vote_ended"])] == [
+        "vote_ended", "vote_called",
+    ]
+    assert store.query(since=WALL + 60, until=WALL + 121, after_id=0)[0]["type"] == "kill"
+
+
+def test_drain_resumes_from_the_stored_offset(store, tmp_path):
+    log = tmp_path / "games.log"
+    log.write_text("\n".join(LOG[:3]) + "\n" + LOG[3][:20])
+    tailer = _tailer(store, tmp_path)
+    assert tailer.drain(str(log)) == 2
+
+    # The partial line is read again once it is complete.
+    with log.open("a") as fh:
+        fh.write(LOG[3][20:] + "\n" + LOG[4] + "\n")
+    assert tailer.drain(str(log)) == 2
+    assert tailer.drain(str(log)) == 0
+    # A new tailer picks up the cursor, and the map, from the store.
+    with log.open("a") as fh:
+        fh.write(LOG[7] + "\n")
+    assert _tailer(store, tmp_path).drain(str(log)) == 1
+    assert store.query(limit=1)[0]["map"] == "plat23"
+
+
+def test_drain_restarts_on_a_truncated_log(store, tmp_path):
+    log = tmp_path / "games.log"
+    log.write_text("\n".join(LOG) + "\n")
+    tailer = _tailer(store, tmp_path)
+    tailer.drain(str(log))
+
+    log.write_text(LOG[2] + "\n")
+    assert tailer.drain(str(log)) == 1
+    assert tailer.drain(str(tmp_path / "missing.log")) == 0
+
+
+def test_api_game_events_validates_its_parameters():
+    client = app.app.test_client()
+    assert client.get("/api/game_events?type=teleport").status_code == 400
+    assert client.get("/api/game_events?limit=lots").status_code == 400
+    body = client.get("/api/game_events?type=kill&range=1h").get_json()
+    assert body["events"] == []
+    assert body["tailer"] == "stopped"
+
+
+def test_drain_skips_realtime_lines_that_are_not_dates(store, tmp_path):
+    log = tmp_path / "games.log"
+    log.write_text("\n".join([
+        LOG[1],
+        "  0:03 RealTime: 2024-13-45 99:00:00 Z",
+        LOG[2],
+    ]) + "\n")
+
+    assert _tailer(store, tmp_path).drain(str(log)) == 1
+    (event,) = store.query()
+    # Still dated from the last good RealTime line.
+    assert event["ts"] == WALL + 5
@@ -0,0 +1,118 @@
+import time
+
+import pytest
+
+from history import HistoryStore, parse_range
+from unvquery import Player
+
+# A recent hour boundary, so buckets line up with the timestamps below and
+# flush(), which prunes against the wall clock, keeps them.
+T0 = int(time.time() // 3600 * 3600) - 3600
+
+
+def _snapshot(pings, online=True, mapname="plat23"):
+    return {
+        "online": online,
+        "info": {"mapname": mapname},
+        "players": [Player(0, ping, f"p{i}") for i, ping in enumerate(pings)],
+    }
+
+
+@pytest.mark.parametrize("value, seconds", [
+    ("90", 90), ("15m", 900), ("6h", 21600), ("7d", 604800), ("1w", 604800), (" 2H ", 7200),
+])
+def test_parse_range(value, seconds):
+    assert parse_range(value) == seconds
+
+
+@pytest.mark.parametrize("value", ["", "0", "-5m", "soon", "infh"])
+def test_parse_range_rejects(value):
+    with pytest.raises(ValueError):
+        parse_range(value)
+
+
+def test_short_ranges_come_from_the_raw_ring():
+    store = HistoryStore(":memory:", raw_retention=600, poll_interval=2.0)
+    store.record(_snapshot([40, 0]), now=T0)
+    store.record(_snapshot([]), now=T0 + 2)
+
+    series = store.series(300, now=T0 + 3)
+    assert series["resolution"] == "raw"
+    first, second = series["points"]
+    # The bot's ping of 0 stays out of the latency figures.
+    assert (first["players_avg"], first["ping_avg"], first["ping_max"]) == (2, 40, 40)
+    assert (second["players_avg"], second["ping_avg"]) == (0, None)
+
+
+def test_samples_roll_up_into_minute_buckets():
+    store = HistoryStore(":memory:", raw_retention=60, poll_interval=2.0)
+    store.record(_snapshot([20, 40]), now=T0 + 1)
+    store.record(_snapshot([60]), now=T0 + 30)
+    store.record(_snapshot([], online=False), now=T0 + 45)
+    # Crossing into the next minute writes the first bucket to the database.
+    store.record(_snapshot([10]), now=T0 + 61)
+
+    series = store.series(3600, now=T0 + 62)
+    assert series["resolution"] == "1m"
+    closed, current = series["points"]
+    assert closed == {
+        "t": T0,
+        "samples": 3,
+        "uptime": round(2 / 3, 3),
+        "players_min": 0,
+        "players_max": 2,
+        "players_avg": 1.0,
+        "ping_avg": 40.0,
+        "ping_max": 60,
+        "map": "plat23",
+    }
+    # The still-open bucket is included as the latest point.
+    assert (current["t"], current["samples"], current["ping_avg"]) == (T0 + 60, 1, 10.0)
+
+
+def test_ranges_beyond_the_minute_retention_use_hourly_buckets():
+    store = HistoryStore(":memory:", raw_retention=60, minute_retention=3600)
+    store.record(_snapshot([30]), now=T0)
+    series = store.series(86400, now=T0 + 1)
+    assert series["resolution"] == "1h"
+    (point,) = series["points"]
+    assert point["t"] == T0
+    # Past every retention window the coarsest resolution is still used.
+    assert store.series(10 * 365 * 86400, now=T0 + 1)["resolution"] == "1h"
+
+
+def test_flushed_partial_buckets_merge_across_restarts(tmp_path):
+    path = str(tmp_path / "history.sqlite3")
+    first = HistoryStore(path, raw_retention=60)
+    first.record(_snapshot([20, 40], mapname="plat23"), now=T0 + 5)
+    first.flush()
+
+    # A second process writes to the same minute and hour before exiting.
+    second = HistoryStore(path, raw_retention=60)
+    second.record(_snapshot([80], mapname="atcs"), now=T0 + 20)
+    second.flush()
+
+    reader = HistoryStore(path, raw_retention=60)
+    (point,) = reader.series(600, now=T0 + 30)["points"]
+    assert point["samples"] == 2
+    assert (point["players_min"], point["players_max"]) == (1, 2)
+    assert point["ping_avg"] == round(140 / 3, 1)
+    assert point["ping_max"] == 80
+    assert point["map"] == "atcs"
+
+
+def test_api_history_rejects_bad_ranges():
+    import app
+
+    response = app.app.test_client().get("/api/history?range=soon")
+    assert response.status_code == 400
+    assert response.get_json()["error"].startswith("invalid range")
+
+
+def test_unwritable_paths_fall_back_to_memory(tmp_path):
+    blocker = tmp_path / "file"
+    blocker.write_text("")
+    store = HistoryStore(str(blocker / "history.sqlite3"), raw_retention=60)
+    store.record(_snapshot([20]), now=T0)
+    store.flush()
+    assert store.series(600, now=T0 + 1)["points"][0]["samples"] == 1
@@ -0,0 +1,74 @@
+import itertools
+import threading
+
+import app
+from unvquery import LatencyStats, percentile
+
+
+def test_percentile():
+    assert percentile([], 0.5) is None
+    assert percentile([10], 0.99) == 10
+    ordered = list(range(1, 101))
+    assert percentile(ordered, 0.50) == 51
+    assert percentile(ordered, 0.95) == 95
+    assert percentile(ordered, 1.0) == 100
+
+
+def test_summary_before_any_query():
+    summary = LatencyStats().summary()
+    assert summary["window"] == 0
+    assert summary["p50_ms"] is None
+    assert summary["loss_rate"] is None
+
+
+def test_percentiles_and_loss_cover_the_window():
+    stats = LatencyStats(window=100)
+    for i in range(1, 91):
+        stats.record(1000.0 + i, float(i))
+    for i in range(10):
+        stats.record(2000.0 + i, None)
+    stats.record_error()
+
+    summary = stats.summary()
+    assert summary["window"] == 100
+    assert (summary["min_ms"], summary["max_ms"]) == (1.0, 90.0)
+    assert summary["p50_ms"] == 45.0
+    assert summary["p95_ms"] == 86.0
+    assert summary["p99_ms"] == 89.0
+    assert summary["loss_rate"] == 0.1
+    assert summary["last_rtt_ms"] is None
+    assert (summary["queries_total"], summary["timeouts_total"], summary["errors_total"]) == (100, 10, 1)
+    assert summary["last_sent_at"] == 2009.0
+    assert summary["last_received_at"] == 1000.0 + 90 + 0.09
+
+
+def test_old_queries_fall_out_of_the_window():
+    stats = LatencyStats(window=3)
+    stats.record(1.0, None)
+    for sent_at in (2.0, 3.0, 4.0):
+        stats.record(sent_at, 10.0)
+
+    summary = stats.summary()
+    assert summary["loss_rate"] == 0
+    # The running totals still count every query.
+    assert summary["timeouts_total"] == 1
+
+
+def test_record_rounds_the_rtt():
+    assert LatencyStats().record(0.0, 1.23456) == 1.23
+
+
+def test_volatile_keys_do_not_bump_the_version():
+    rtts = itertools.count()
+    polled = threading.Semaphore(0)
+
+    def query():
+        return {"online": True, "rtt_ms": next(rtts), "latency": {}}
+
+    poller = app.StatusPoller(query, 0.1, volatile=("rtt_ms", "latency"))
+    poller.add_listener(lambda _: polled.release())
+    poller.start()
+    for _ in range(3):
+        assert polled.acquire(timeout=5)
+    poller.stop()
+    assert poller.version == 1
@@ -0,0 +1,75 @@
+import pytest
+
+import app
+from metrics import CONTENT_TYPE, Registry
+from unvquery import Player
+
+
+def test_gauges_and_counters_render_with_labels():
+    registry = Registry()
+    up = registry.gauge("unv_up", "1 if up.")
+    queries = registry.counter("unv_queries_total", "Queries.", labels=("result",))
+    up.set(1)
+    queries.inc(1, "ok")
+    queries.inc(2, "ok")
+    queries.inc(0.5, 'we"ird\n')
+
+    assert registry.render() == (
+        "# HELP unv_up 1 if up.\n"
+        "# TYPE unv_up gauge\n"
+        "unv_up 1\n"
+        "# HELP unv_queries_total Queries.\n"
+        "# TYPE unv_queries_total counter\n"
+        'unv_queries_total{result="ok"} 3\n'
+        'unv_queries_total{result="we\\"ird\\n"} 0.5\n'
+    )
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = Registry()
+    rtt = registry.histogram("unv_rtt_seconds", "RTT.", buckets=(0.1, 0.01), labels=("server",))
+    for value in (0.005, 0.05, 0.07, 3.0):
+        rtt.observe(value, "a")
+
+    lines = registry.render().splitlines()
+    assert lines[2:] == [
+        'unv_rtt_seconds_bucket{server="a",le="0.01"} 1',
+        'unv_rtt_seconds_bucket{server="a",le="0.1"} 3',
+        'unv_rtt_seconds_bucket{server="a",le="+Inf"} 4',
+        'unv_rtt_seconds_sum{server="a"} 3.125',
+        'unv_rtt_seconds_count{server="a"} 4',
+    ]
+
+
+@pytest.fixture
+def client(monkeypatch):
+    pollers = [
+        app.StatusPoller(lambda: {"online": True, "info": {}}, 60),
+        app.StatusPoller(lambda: {"online": False}, 60),
+    ]
+    monkeypatch.setattr(app, "server_poller", pollers[0])
+    monkeypatch.setattr(app, "tunnel_poller", pollers[1])
+    # /metrics does not wait for a poll; have the first one in place.
+    for poller in pollers:
+        poller.snapshot()
+    yield app.app.test_client()
+    for poller in pollers:
+        poller.stop()
+
+
+def test_metrics_endpoint_reports_the_last_snapshot(client):
+    app.record_server_metrics({
+        "online": True,
+        "info": {"sv_maxclients": "24"},
+        "players": [Player(5, 40, "Alice"), Player(0, 0, "Bot")],
+        "rtt_ms": 12.0,
+    })
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.content_type == CONTENT_TYPE
+    lines = response.get_data(as_text=True).splitlines()
+    assert "unv_server_up 1" in lines
+    assert "unv_server_players 2" in lines
+    assert "unv_server_maxclients 24" in lines
+    assert any(line.startswith('unv_status_snapshot_age_seconds{source="server"} ') for line in lines)
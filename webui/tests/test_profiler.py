@@ -0,0 +1,117 @@
+import os
+
+from gamelog import GameEventStore, _Context
+from profiler import LoadProfiler, ProcSampler
+from unvquery import Player
+
+T0 = 1_700_000_000.0
+PAGE = os.sysconf("SC_PAGE_SIZE")
+
+
+def _write_proc(proc, pid, comm, ticks, pages):
+    d = proc / str(pid)
+    d.mkdir(exist_ok=True)
+    (d / "comm").write_text(comm + "\n")
+    # Fields after the command name: state is first, utime/stime are the
+    # 12th/13th and rss the 22nd.
+    fields = ["S"] + ["0"] * 25
+    fields[11], fields[12], fields[21] = str(ticks), "0", str(pages)
+    (d / "stat").write_text(f"{pid} ({comm}) " + " ".join(fields))
+
+
+def test_proc_sampler_sums_the_named_processes(tmp_path):
+    _write_proc(tmp_path, 10, "daemonded", 100, 1000)
+    _write_proc(tmp_path, 11, "nacl_loader", 50, 500)
+    _write_proc(tmp_path, 12, "bash", 900, 9000)
+    (tmp_path / "self").mkdir()
+
+    sampler = ProcSampler(proc=str(tmp_path))
+    cpu, rss = sampler.sample()
+    # CPU needs a second sample.
+    assert cpu is None
+    assert rss == 1500 * PAGE
+    assert sampler.found
+
+    _write_proc(tmp_path, 10, "daemonded", 200, 1000)
+    cpu, _ = sampler.sample()
+    assert cpu > 0
+
+
+def test_proc_sampler_without_matching_processes(tmp_path):
+    _write_proc(tmp_path, 12, "bash", 900, 9000)
+    sampler = ProcSampler(proc=str(tmp_path))
+    assert sampler.sample() == (None, None)
+    assert not sampler.found
+
+
+class FixedSampler:
+    found = True
+
+    def __init__(self, cpu, rss):
+        self.cpu, self.rss = cpu, rss
+
+    def sample(self):
+        return self.cpu, self.rss
+
+
+def _snapshot(mapname, humans, bots, rtt=10.0):
+    players = [Player(0, 50, f"h{i}") for i in range(humans)]
+    players += [Player(0, 0, f"b{i}") for i in range(bots)]
+    return {"online": True, "info": {"mapname": mapname}, "players": players, "rtt_ms": rtt}
+
+
+def test_samples_are_split_by_map_and_bot_count():
+    profiler = LoadProfiler(":memory:", sampler=FixedSampler(40.0, 2**20), warmup=0)
+    profiler.record(_snapshot("plat23", 2, 4), now=T0)
+    profiler.record(_snapshot("plat23", 2, 4, rtt=20.0), now=T0 + 2)
+    profiler.record(_snapshot("plat23", 1, 6), now=T0 + 4)
+    profiler.record({"online": False}, now=T0 + 6)
+
+    four, six = profiler.table()
+    assert (four["map"], four["bots"], four["samples"]) == ("plat23", 4, 2)
+    assert four["minutes"] == round(2 / 60, 1)
+    assert four["humans_avg"] == 2
+    assert (four["rtt_avg_ms"], four["rtt_max_ms"]) == (15.0, 20.0)
+    assert (four["cpu_avg"], four["cpu_max"], four["rss_max_mb"]) == (40.0, 40.0, 1.0)
+    assert six["bots"] == 6
+    assert profiler.table("atcs") == []
+
+
+def test_map_changes_count_as_warmup():
+    profiler = LoadProfiler(":memory:", sampler=FixedSampler(90.0, None), warmup=30)
+    profiler.record(_snapshot("plat23", 0, 2), now=T0)
+    profiler.record(_snapshot("atcs", 0, 2), now=T0 + 100)
+    profiler.record(_snapshot("atcs", 0, 2), now=T0 + 110)
+    profiler.record(_snapshot("atcs", 0, 2), now=T0 + 140)
+
+    atcs, plat = profiler.table()
+    assert (atcs["samples"], atcs["warmup_samples"], atcs["warmup_cpu_max"]) == (1, 2, 90.0)
+    # Only play time is billed to the cell, capped by max_gap per poll.
+    assert atcs["minutes"] == round(10 / 60, 1)
+    assert plat["samples"] == 1 and plat["warmup_samples"] == 0
+
+
+def test_kills_come_from_the_game_event_index():
+    events = GameEventStore(":memory:", retention=0)
+    profiler = LoadProfiler(":memory:", events=events, warmup=0)
+    profiler.record(_snapshot("plat23", 2, 0), now=T0)
+
+    kill = (T0 + 1, "kill", "plat23", "a", "b", {})
+    events.append("games.log", 1, 10, _Context(), [kill, kill, kill])
+    profiler.record(_snapshot("plat23", 2, 0), now=T0 + 2)
+
+    (cell,) = profiler.table()
+    assert cell["kills_per_min"] == round(3 / (2 / 60), 2)
+
+
+def test_cells_merge_across_flushes(tmp_path):
+    path = str(tmp_path / "profile.sqlite3")
+    first = LoadProfiler(path, warmup=0)
+    first.record(_snapshot("plat23", 1, 2), now=T0)
+    first.flush()
+    second = LoadProfiler(path, warmup=0)
+    second.record(_snapshot("plat23", 3, 2), now=T0 + 10)
+
+    (cell,) = second.table()
+    assert cell["samples"] == 2
+    assert cell["humans_avg"] == 2
@@ -0,0 +1,93 @@
+import socket
+import threading
+
+import pytest
+
+from unvquery import parse_info_string, parse_target, query_many
+
+STATUS = (
+    b'\xff\xff\xff\xffstatusResponse\n'
+    b'\\sv_hostname\\Pi 5\\mapname\\plat23\\sv_maxclients\\24\n'
+    b'12 48 "Alice"\n'
+    b'0 0 "[bot] Granger"\n'
+)
+INFO = b'\xff\xff\xff\xffinfoResponse\n\\hostname\\Pi 5\\clients\\2\n'
+
+
+@pytest.fixture
+def server():
+    """A UDP responder answering getstatus and getinfo like the game server."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(("127.0.0.1", 0))
+    sock.settimeout(0.1)
+    stop = threading.Event()
+
+    def serve():
+        while not stop.is_set():
+            try:
+                data, addr = sock.recvfrom(2048)
+            except socket.timeout:
+                continue
+            if data.startswith(b"\xff\xff\xff\xffgetstatus"):
+                sock.sendto(STATUS, addr)
+            elif data.startswith(b"\xff\xff\xff\xffgetinfo"):
+                sock.sendto(INFO, addr)
+
+    thread = threading.Thread(target=serve, daemon=True)
+    thread.start()
+    yield sock.getsockname()
+    stop.set()
+    thread.join()
+    sock.close()
+
+
+def _silent_port():
+    # Bound but never read: queries to it are simply never answered.
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(("127.0.0.1", 0))
+    return sock
+
+
+def test_query_many_answers_in_input_order(server):
+    silent = _silent_port()
+    try:
+        results = query_many([server, silent.getsockname(), server], timeout=0.3)
+    finally:
+        silent.close()
+
+    live, dead, again = results
+    assert live["address"] == f"{server[0]}:{server[1]}"
+    assert live["online"] is True
+    assert live["info"]["mapname"] == "plat23"
+    assert live["getinfo"] == {"hostname": "Pi 5", "clients": "2"}
+    assert len(live["players"]) == 2
+    assert live["rtt_ms"] is not None and live["rtt_ms"] >= 0
+    # Every entry gets its own result, even for a repeated target.
+    assert again["online"] is True and again["info"] == live["info"]
+
+    assert dead["online"] is False
+    assert dead["error"] == "timed out"
+
+
+def test_query_many_without_getinfo(server):
+    (result,) = query_many([server], timeout=0.3, with_info=False)
+    assert result["online"] is True
+    assert result["getinfo"] == {}
+
+
+def test_query_many_reports_resolution_errors():
+    (result,) = query_many([("no-such-host.invalid", 27960)], timeout=0.3)
+    assert result["online"] is False
+    assert result["error"]
+
+
+def test_parse_target():
+    assert parse_target("udp://eu.loclx.io:4321", 27960) == ("eu.loclx.io", 4321)
+    assert parse_target(" unvanq-server ", 27960) == ("unvanq-server", 27960)
+    assert parse_target("host:port", 27960) == ("host:port", 27960)
+
+
+def test_parse_info_string():
+    assert parse_info_string("\\a\\1\\b\\2") == {"a": "1", "b": "2"}
+    # A key without a value is dropped.
+    assert parse_info_string("\\a\\1\\b") == {"a": "1"}
@@ -0,0 +1,109 @@
+from sessions import SessionTracker
+from unvquery import Player
+
+T0 = 1_700_000_000.0
+
+
+def _snapshot(*players, maxclients="4"):
+    return {"online": True, "info": {"sv_maxclients": maxclients}, "players": list(players)}
+
+
+def test_sessions_collect_ping_stats_and_tell_bots_apart():
+    tracker = SessionTracker(grace=10)
+    for i, ping in enumerate([40, 50, 999, 60, 40]):
+        tracker.record(_snapshot(Player(i, ping, "Alice"), Player(0, 0, "Granger")), now=T0 + 2 * i)
+
+    alice, granger = tracker.summary(now=T0 + 8)["active"]
+    assert (alice["name"], alice["bot"], granger["bot"]) == ("Alice", False, True)
+    assert alice["polls"] == 5
+    assert alice["duration"] == 8.0
+    assert alice["best_score"] == 4
+    # 999 means "still connecting" and stays out of the figures.
+    assert (alice["ping_p50"], alice["ping_p95"], alice["ping_last"]) == (50, 60, 40)
+    # Jitter smooths the ping steps 10, 10, 20 by 1/16 each.
+    assert alice["jitter_ms"] == 2.4
+    assert granger["ping_p50"] is None and granger["jitter_ms"] is None
+
+
+def test_repeated_names_are_separate_sessions():
+    tracker = SessionTracker()
+    tracker.record(_snapshot(Player(0, 0, "Bot"), Player(0, 0, "Bot")), now=T0)
+    assert len(tracker.summary(now=T0)["active"]) == 2
+
+
+def test_a_missed_poll_does_not_end_the_session():
+    tracker = SessionTracker(grace=10)
+    tracker.record(_snapshot(Player(3, 40, "Alice")), now=T0)
+    tracker.record(_snapshot(), now=T0 + 2)
+    # Offline snapshots say nothing about who is connected.
+    tracker.record({"online": False}, now=T0 + 20)
+    tracker.record(_snapshot(Player(3, 40, "Alice")), now=T0 + 4)
+    summary = tracker.summary(now=T0 + 4)
+    assert [s["name"] for s in summary["active"]] == ["Alice"]
+    assert summary["active"][0]["started_at"] == T0
+    assert summary["recent"] == []
+
+
+def test_sessions_close_after_the_grace_period():
+    tracker = SessionTracker(grace=10)
+    tracker.record(_snapshot(Player(3, 40, "Alice")), now=T0)
+    tracker.record(_snapshot(Player(3, 40, "Alice")), now=T0 + 60)
+    tracker.record(_snapshot(), now=T0 + 65)
+    assert tracker.summary(now=T0 + 65)["active"]
+    tracker.record(_snapshot(), now=T0 + 70)
+
+    summary = tracker.summary(now=T0 + 70)
+    assert summary["active"] == []
+    (closed,) = summary["recent"]
+    assert (closed["name"], closed["duration"]) == ("Alice", 60.0)
+    assert summary["capacity"]["avg_session_minutes"] == 1.0
+
+
+def test_a_scoring_player_changing_name_keeps_the_session():
+    tracker = SessionTracker(grace=10)
+    tracker.record(_snapshot(Player(5, 40, "Alice")), now=T0)
+    tracker.record(_snapshot(Player(6, 40, "Alicia")), now=T0 + 2)
+
+    (session,) = tracker.summary(now=T0 + 2)["active"]
+    assert session["name"] == "Alicia"
+    assert session["renamed_from"] == ["Alice"]
+    assert session["started_at"] == T0
+
+
+def test_a_new_player_with_a_lower_score_is_not_a_rename():
+    tracker = SessionTracker(grace=10)
+    tracker.record(_snapshot(Player(5, 40, "Alice")), now=T0)
+    tracker.record(_snapshot(Player(0, 40, "Bob")), now=T0 + 2)
+    names = [s["name"] for s in tracker.summary(now=T0 + 2)["active"]]
+    assert names == ["Alice", "Bob"]
+
+
+def test_hourly_peaks_and_capacity():
+    tracker = SessionTracker()
+    hour = int(T0 // 3600) * 3600
+    full = [Player(0, 40, "A"), Player(0, 0, "B"), Player(0, 50, "C"), Player(0, 0, "D")]
+    tracker.record(_snapshot(*full[:2]), now=hour + 10)
+    tracker.record(_snapshot(*full), now=hour + 20)
+    tracker.record(_snapshot(full[0]), now=hour + 3600)
+
+    summary = tracker.summary(now=hour + 3601)
+    assert summary["hourly_peaks"] == [
+        {"hour": hour, "players": 4, "humans": 2},
+        {"hour": hour + 3600, "players": 1, "humans": 1},
+    ]
+    capacity = summary["capacity"]
+    assert capacity["maxclients"] == 4
+    assert (capacity["peak_players_24h"], capacity["peak_humans_24h"]) == (4, 2)
+    assert (capacity["full_hours"], capacity["hours_tracked"]) == (1, 2)
+
+
+def test_only_players_from_the_previous_poll_can_be_renamed():
+    tracker = SessionTracker(grace=30)
+    tracker.record(_snapshot(Player(5, 40, "Alice")), now=T0)
+    tracker.record(_snapshot(), now=T0 + 2)
+    # Alice has been gone for a poll already; Carol is someone else.
+    tracker.record(_snapshot(Player(9, 40, "Carol")), now=T0 + 4)
+
+    sessions = {s["name"]: s for s in tracker.summary(now=T0 + 4)["active"]}
+    assert sorted(sessions) == ["Alice", "Carol"]
+    assert sessions["Carol"]["renamed_from"] == []
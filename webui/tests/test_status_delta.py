@@ -0,0 +1,110 @@
+import threading
+
+import app
+from unvquery import Player
+
+
+def test_status_delta():
+    old = {
+        "online": True,
+        "info": {"mapname": "plat23", "g_needpass": "0"},
+        "players": [Player(1, 0, "Bot"), Player(5, 30, "Alice"), Player(2, 0, "Bot")],
+    }
+    new = {
+        "online": True,
+        "info": {"mapname": "atcs"},
+        "players": [Player(1, 0, "Bot"), Player(9, 31, "Alice"), Player(0, 40, "Bob")],
+    }
+    delta = app.status_delta(old, new)
+    assert delta["info_changed"] == {"mapname": "atcs"}
+    assert delta["info_removed"] == ["g_needpass"]
+    assert delta["players_joined"] == [Player(0, 40, "Bob")]
+    assert delta["players_left"] == [Player(2, 0, "Bot")]
+    assert delta["players_updated"] == [Player(9, 31, "Alice")]
+    assert delta["player_count"] == 3
+
+
+def _poll(results):
+    """Run a StatusPoller over ``results`` and return it once all were seen."""
+    done = threading.Event()
+    pending = list(results)
+
+    def query():
+        result = pending.pop(0) if pending else results[-1]
+        if not pending:
+            done.set()
+        return result
+
+    poller = app.StatusPoller(query, 0.01, volatile=("rtt_ms",))
+    poller.start()
+    assert done.wait(5)
+    poller.stop()
+    poller._thread.join(5)
+    return poller
+
+
+def test_since_pairs_a_known_version_with_the_current_snapshot():
+    first = {"online": True, "players": [], "rtt_ms": 1.0}
+    second = {"online": True, "players": [Player(0, 20, "Alice")], "rtt_ms": 2.0}
+    poller = _poll([first, dict(first, rtt_ms=3.0), second])
+
+    # The timing-only change did not make a version.
+    assert poller.version == 2
+    tag = poller.version_tag()
+    old, current = poller.since(tag.replace(".2", ".1"))
+    assert old == {"online": True, "players": []}
+    assert current["players"] == [Player(0, 20, "Alice")]
+    assert poller.since(tag) == (current, current)
+
+
+def test_since_rejects_foreign_or_unknown_tags():
+    poller = _poll([{"online": True}])
+    epoch, _, number = poller.version_tag().partition(".")
+    assert poller.since(f"{epoch}.{number}") is not None
+    assert poller.since(f"{epoch}.99") is None
+    assert poller.since(f"deadbeef.{number}") is None
+    assert poller.since("garbage") is None
+
+
+def test_status_responses_carry_a_weak_etag(monkeypatch):
+    poller = _poll([{"online": True, "info": {"mapname": "plat23"}, "rtt_ms": 1.0}])
+    monkeypatch.setattr(app, "server_poller", poller)
+    client = app.app.test_client()
+
+    first = client.get("/api/status")
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+    assert etag.startswith('W/"')
+    assert first.headers["Cache-Control"] == "no-cache"
+    body = first.get_json()
+    assert body["info"] == {"mapname": "plat23"}
+    assert body["version"] == poller.version_tag()
+    assert body["snapshot_age"] >= 0
+
+    again = client.get("/api/status", headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.data == b""
+    assert again.headers["ETag"] == etag
+
+    stale = client.get("/api/status", headers={"If-None-Match": 'W/"0000"'})
+    assert stale.status_code == 200
+
+
+def test_api_status_since_returns_a_delta(monkeypatch):
+    first = {"online": True, "info": {"mapname": "plat23"}, "players": []}
+    second = {"online": True, "info": {"mapname": "atcs"}, "players": [Player(0, 20, "Alice")]}
+    poller = _poll([first, second])
+    monkeypatch.setattr(app, "server_poller", poller)
+    client = app.app.test_client()
+    epoch = poller.version_tag().partition(".")[0]
+
+    delta = client.get(f"/api/status?since={epoch}.1").get_json()
+    assert delta["full"] is False
+    assert delta["info_changed"] == {"mapname": "atcs"}
+    assert delta["players_joined"] == [{"score": 0, "ping": 20, "name": "Alice"}]
+    assert delta["version"] == f"{epoch}.2"
+
+    # An unknown tag falls back to the full snapshot.
+    full = client.get("/api/status?since=elsewhere.1").get_json()
+    assert full["full"] is True
+    assert full["info"] == {"mapname": "atcs"}
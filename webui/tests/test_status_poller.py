@@ -0,0 +1,58 @@
+import threading
+
+import pytest
+
+import app
+
+
+def test_snapshot_before_the_first_poll_reports_no_data():
+    poller = app.StatusPoller(lambda: threading.Event().wait(5) or {}, 60)
+    snapshot = poller.snapshot(wait=0)
+    assert snapshot["online"] is False
+    assert snapshot["error"] == "No status snapshot yet"
+    assert snapshot["snapshot_age"] is None
+    poller.stop()
+
+
+def test_snapshot_serves_the_cached_result():
+    calls = []
+
+    def query():
+        calls.append(1)
+        return {"online": True, "players": []}
+
+    poller = app.StatusPoller(query, 60)
+    first = poller.snapshot()
+    second = poller.snapshot()
+    poller.stop()
+    assert first["online"] is True and second["online"] is True
+    # One poll answered both reads.
+    assert len(calls) == 1
+    assert second["snapshot_age"] >= 0
+    assert second["updated_at"] is not None
+
+
+def test_query_errors_become_offline_snapshots():
+    def query():
+        raise OSError("unreachable")
+
+    poller = app.StatusPoller(query, 60)
+    snapshot = poller.snapshot()
+    poller.stop()
+    assert snapshot["online"] is False
+    assert snapshot["error"] == "unreachable"
+
+
+@pytest.fixture
+def client(monkeypatch):
+    poller = app.StatusPoller(lambda: {"online": True, "info": {"mapname": "plat23"}}, 60)
+    monkeypatch.setattr(app, "server_poller", poller)
+    yield app.app.test_client()
+    poller.stop()
+
+
+def test_api_status_reads_the_poller(client):
+    body = client.get("/api/status").get_json()
+    assert body["online"] is True
+    assert body["info"] == {"mapname": "plat23"}
+    assert "snapshot_age" in body
@@ -0,0 +1,51 @@
+import json
+
+import pytest
+
+import app
+
+
+@pytest.fixture
+def state(monkeypatch):
+    """Mutable server state behind fast pollers wired to the stream."""
+    current = {"online": True, "info": {"mapname": "plat23"}}
+    server = app.StatusPoller(lambda: dict(current), 0.1, app.status_changed)
+    tunnel = app.StatusPoller(lambda: {"online": False, "public_url": None}, 60, app.status_changed)
+    monkeypatch.setattr(app, "server_poller", server)
+    monkeypatch.setattr(app, "tunnel_poller", tunnel)
+    monkeypatch.setattr(app, "STREAM_KEEPALIVE", 0.05)
+    yield current
+    server.stop()
+    tunnel.stop()
+
+
+def _data(frame):
+    lines = frame.strip().split("\n")
+    assert lines[0].startswith("id: ")
+    assert lines[1].startswith("data: ")
+    return json.loads(lines[1][len("data: "):])
+
+
+def test_stream_sends_state_then_changes_and_keepalives(state):
+    frames = app.stream_status_events()
+    first = _data(next(frames))
+    assert first["server"]["info"] == {"mapname": "plat23"}
+    assert first["localxpose"]["online"] is False
+
+    # Nothing changed: only comment frames.
+    assert next(frames) == ": keepalive\n\n"
+
+    state["info"] = {"mapname": "atcs"}
+    for _ in range(100):
+        frame = next(frames)
+        if not frame.startswith(":"):
+            break
+    assert _data(frame)["server"]["info"] == {"mapname": "atcs"}
+
+
+def test_stream_route_is_an_event_stream(state):
+    response = app.app.test_client().get("/api/stream", buffered=False)
+    assert response.status_code == 200
+    assert response.mimetype == "text/event-stream"
+    assert response.headers["Cache-Control"] == "no-cache"
+    response.close()
@@ -0,0 +1,55 @@
+import app
+from unvquery import Player, key_players, parse_status_response
+
+STATUS = (
+    b'\xff\xff\xff\xffstatusResponse\n'
+    b'\\sv_hostname\\Pi 5\\mapname\\plat23\\sv_maxclients\\24\n'
+    b'12 48 "Alice"\n'
+    b'0 0 "[bot] Granger"\n'
+    b'-3 999 "spaced name "quoted""\n'
+)
+
+
+def test_parse_status_response():
+    result = parse_status_response(STATUS, {}, include_raw=False)
+    assert result["online"] is True
+    assert "raw" not in result
+    assert result["info"] == {"sv_hostname": "Pi 5", "mapname": "plat23", "sv_maxclients": "24"}
+    assert result["players"] == [
+        Player(12, 48, "Alice"),
+        Player(0, 0, "[bot] Granger"),
+        Player(-3, 999, 'spaced name "quoted"'),
+    ]
+
+
+def test_parse_status_response_accepts_buffers_and_keeps_raw():
+    result = parse_status_response(memoryview(bytearray(STATUS)), {})
+    assert result["raw"] == STATUS.decode("latin-1")
+    assert len(result["players"]) == 3
+
+
+def test_parse_status_response_falls_back_for_odd_player_lines():
+    data = b'\xff\xff\xff\xffstatusResponse\n\\mapname\\atcs\nx 7 Bob\n\n'
+    result = parse_status_response(data, {})
+    assert result["players"] == [Player(0, 7, "Bob")]
+
+
+def test_parse_status_response_rejects_truncated_datagrams():
+    result = parse_status_response(b"\xff\xff\xff\xffstatusResponse", {})
+    assert result["error"] == "Unexpected response"
+    assert "online" not in result
+
+
+def test_key_players_numbers_repeated_names():
+    players = [Player(1, 0, "Bot"), Player(5, 30, "Alice"), Player(2, 0, "Bot")]
+    assert list(key_players(players)) == [("Bot", 0), ("Alice", 0), ("Bot", 1)]
+
+
+def test_players_serialize_as_plain_objects(monkeypatch):
+    poller = app.StatusPoller(lambda: parse_status_response(STATUS, {}, include_raw=False), 60)
+    monkeypatch.setattr(app, "server_poller", poller)
+    try:
+        body = app.app.test_client().get("/api/status").get_json()
+    finally:
+        poller.stop()
+    assert body["players"][0] == {"score": 12, "ping": 48, "name": "Alice"}
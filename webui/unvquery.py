@@ -0,0 +1,384 @@
+import asyncio
+import re
+import socket
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, List, Optional, Sequence, Tuple, TypeVar
+
+QUERY_PREFIX = b"\xff\xff\xff\xff"
+STATUS_QUERY = QUERY_PREFIX + b"getstatus\n"
+INFO_QUERY = QUERY_PREFIX + b"getinfo\n"
+STATUS_RESPONSE = QUERY_PREFIX + b"statusResponse"
+INFO_RESPONSE = QUERY_PREFIX + b"infoResponse"
+
+Address = Tuple[str, int]
+
+T = TypeVar("T")
+
+# The shape the daemon actually emits: `<score> <ping> "<name>"`. Anything
+# else goes through parse_player_line().
+_PLAYER_LINE = re.compile(r'(-?\d+) (-?\d+) "(.+)"\Z').match
+
+
+# ----------------------------------------------------
+# Response Parsing
+# ----------------------------------------------------
+def parse_info_string(info: str) -> Dict[str, str]:
+    parts = info.split("\\")
+    if parts and parts[0] == "":
+        parts = parts[1:]
+
+    out = {}
+    it = iter(parts)
+    for k in it:
+        try:
+            out[k] = next(it)
+        except StopIteration:
+            break
+    return out
+
+
+def parse_player_line(line: str):
+    parts = line.strip().split(" ", 2)
+    if len(parts) < 3:
+        return None
+
+    try:
+        score = int(parts[0])
+    except:
+        score = 0
+    try:
+        ping = int(parts[1])
+    except:
+        ping = 0
+
+    rest = parts[2]
+    name = rest
+    if "\"" in rest:
+        a = rest.find("\"") + 1
+        b = rest.rfind("\"")
+        if b > a:
+            name = rest[a:b]
+
+    return {"score": score, "ping": ping, "name": name}
+
+
+class Player:
+    """One player line from a ``statusResponse``.
+
+    A ``__slots__`` record is a fraction of the size of a dict and is what
+    every consumer (history, metrics, JSON encoding) reads; ``as_dict()``
+    gives the ``{"score", "ping", "name"}`` shape the API has always used.
+    """
+
+    __slots__ = ("score", "ping", "name")
+
+    def __init__(self, score: int, ping: int, name: str) -> None:
+        self.score = score
+        self.ping = ping
+        self.name = name
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {"score": self.score, "ping": self.ping, "name": self.name}
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Player):
+            return NotImplemented
+        return self.score == other.score and self.ping == other.ping and self.name == other.name
+
+    def __hash__(self) -> int:
+        return hash((self.score, self.ping, self.name))
+
+    def __repr__(self) -> str:
+        return f"Player(score={self.score}, ping={self.ping}, name={self.name!r})"
+
+
+def key_players(players: Iterable[Player]) -> Dict[Tuple[str, int], Player]:
+    """Key players by ``(name, n)``, ``n`` counting earlier players of that name.
+
+    getstatus has no client numbers and names are not unique (bots,
+    renames), so this is the closest thing to an identity across snapshots.
+    """
+    seen: Dict[str, int] = {}
+    out: Dict[Tuple[str, int], Player] = {}
+    for player in players:
+        n = seen.get(player.name, 0)
+        seen[player.name] = n + 1
+        out[(player.name, n)] = player
+    return out
+
+
+def parse_status_response(
+    data: bytes,
+    result: Dict[str, Any],
+    include_raw: bool = True,
+) -> Dict[str, Any]:
+    """Fill ``result`` from a raw ``statusResponse`` datagram.
+
+    The datagram is decoded once and split once; info pairs are built with
+    ``dict(zip())`` and well-formed player lines with a single regex match,
+    producing ``Player`` records. ``include_raw=False`` leaves out the copy
+    of the datagram text that would otherwise be serialized to clients.
+    """
+    # str() accepts bytes, bytearray or a memoryview over a receive buffer
+    # alike. It still builds a new str of the whole datagram, which is
+    # decoded only once and shared by "raw" and the splitting below.
+    text = str(data, "latin-1")
+    if include_raw:
+        result["raw"] = text
+
+    lines = text.split("\n")
+    if len(lines) < 2:
+        result["error"] = "Unexpected response"
+        return result
+
+    fields = lines[1].split("\\")
+    it = iter(fields)
+    if fields[0] == "":
+        next(it)
+    info = dict(zip(it, it))
+
+    players: List[Player] = []
+    append = players.append
+    for line in lines[2:]:
+        match = _PLAYER_LINE(line)
+        if match is not None:
+            append(Player(int(match[1]), int(match[2]), match[3]))
+        elif line.strip():
+            parsed = parse_player_line(line)
+            if parsed:
+                append(Player(parsed["score"], parsed["ping"], parsed["name"]))
+
+    result["online"] = True
+    result["info"] = info
+    result["players"] = players
+    return result
+
+
+def parse_info_response(data: bytes) -> Dict[str, str]:
+    """Parse the key/value line of a raw ``infoResponse`` datagram."""
+    lines = data.decode("latin-1", errors="replace").split("\n")
+    if len(lines) < 2:
+        return {}
+    return parse_info_string(lines[1])
+
+
+def parse_target(target: str, default_port: int) -> Address:
+    """Split ``host[:port]`` (``udp://`` prefix allowed) into a host/port pair."""
+    target = target.strip()
+    if target.startswith("udp://"):
+        target = target[len("udp://"):]
+    host, sep, port = target.rpartition(":")
+    if not sep or not port.isdigit():
+        return target, default_port
+    return host, int(port)
+
+
+# ----------------------------------------------------
+# Query Latency Tracking
+# ----------------------------------------------------
+def percentile(ordered: Sequence[T], fraction: float) -> Optional[T]:
+    """Nearest-rank percentile of an already sorted sequence (None if empty)."""
+    if not ordered:
+        return None
+    index = min(len(ordered) - 1, max(0, int(round(fraction * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+class LatencyStats:
+    """Rolling window of query outcomes: RTT for answers, loss for timeouts.
+
+    Only the last ``window`` queries are kept, so the percentiles follow the
+    server's current state rather than its whole uptime.
+    """
+
+    def __init__(self, window: int = 300) -> None:
+        self._lock = threading.Lock()
+        # RTT in milliseconds, or None for a query that was never answered.
+        self._samples: Deque[Optional[float]] = deque(maxlen=max(1, window))
+        self._total = 0
+        self._lost = 0
+        self._errors = 0
+        self._last_sent_at: Optional[float] = None
+        self._last_received_at: Optional[float] = None
+
+    def record(self, sent_at: float, rtt_ms: Optional[float]) -> Optional[float]:
+        """Record one query sent at wall-clock ``sent_at``; ``None`` means lost."""
+        if rtt_ms is not None:
+            rtt_ms = round(rtt_ms, 2)
+        with self._lock:
+            self._samples.append(rtt_ms)
+            self._total += 1
+            if rtt_ms is None:
+                self._lost += 1
+            self._last_sent_at = sent_at
+            if rtt_ms is not None:
+                self._last_received_at = sent_at + rtt_ms / 1000.0
+        return rtt_ms
+
+    def record_error(self) -> None:
+        """Count a query that failed before anything was sent (e.g. DNS)."""
+        with self._lock:
+            self._errors += 1
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            samples = list(self._samples)
+            totals = (self._total, self._lost, self._errors)
+            last_sent_at, last_received_at = self._last_sent_at, self._last_received_at
+
+        answered = sorted(s for s in samples if s is not None)
+        lost = len(samples) - len(answered)
+        return {
+            "window": len(samples),
+            "p50_ms": percentile(answered, 0.50),
+            "p95_ms": percentile(answered, 0.95),
+            "p99_ms": percentile(answered, 0.99),
+            "min_ms": answered[0] if answered else None,
+            "max_ms": answered[-1] if answered else None,
+            "loss_rate": round(lost / len(samples), 4) if samples else None,
+            "last_rtt_ms": samples[-1] if samples else None,
+            "last_sent_at": last_sent_at,
+            "last_received_at": last_received_at,
+            "queries_total": totals[0],
+            "timeouts_total": totals[1],
+            "errors_total": totals[2],
+        }
+
+
+# ----------------------------------------------------
+# Async Multi-Server Query
+# ----------------------------------------------------
+class _QueryProtocol(asyncio.DatagramProtocol):
+    """Route replies on one shared socket to the future waiting for them.
+
+    Replies are matched on their source address and on the response type,
+    so a ``getinfo`` answer never completes a pending ``getstatus``.
+    """
+
+    def __init__(self) -> None:
+        self.pending: Dict[Tuple[Address, bytes], asyncio.Future] = {}
+
+    def expect(self, addr: Address, kind: bytes) -> asyncio.Future:
+        fut = asyncio.get_running_loop().create_future()
+        self.pending[(addr, kind)] = fut
+        return fut
+
+    def datagram_received(self, data: bytes, addr: Tuple[Any, ...]) -> None:
+        if data.startswith(STATUS_RESPONSE):
+            kind = STATUS_RESPONSE
+        elif data.startswith(INFO_RESPONSE):
+            kind = INFO_RESPONSE
+        else:
+            return
+
+        fut = self.pending.pop(((addr[0], addr[1]), kind), None)
+        if fut is not None and not fut.done():
+            fut.set_result((data, time.perf_counter()))
+
+    def error_received(self, exc: Exception) -> None:
+        # ICMP errors on an unconnected socket cannot be attributed to a
+        # target reliably; the affected queries simply time out.
+        pass
+
+
+async def _resolve(loop: asyncio.AbstractEventLoop, host: str, port: int) -> Address:
+    infos = await loop.getaddrinfo(host, port, family=socket.AF_INET, type=socket.SOCK_DGRAM)
+    return infos[0][4][0], port
+
+
+async def query_servers(
+    targets: Iterable[Address],
+    timeout: float = 1.5,
+    with_info: bool = True,
+    include_raw: bool = True,
+) -> List[Dict[str, Any]]:
+    """Send ``getstatus`` (and ``getinfo``) to every target over one socket.
+
+    Returns one result per target, in input order, shaped like
+    ``query_unvanquished_server()`` plus ``address``, ``getinfo`` and
+    ``rtt_ms``. Every target gets its own ``timeout``; a slow or dead
+    server only affects its own entry.
+    """
+    loop = asyncio.get_running_loop()
+    targets = list(targets)
+    results: List[Dict[str, Any]] = [
+        {
+            "address": f"{host}:{port}",
+            "online": False,
+            "info": {},
+            "getinfo": {},
+            "players": [],
+            "raw": "",
+            "rtt_ms": None,
+            "error": "",
+        }
+        for host, port in targets
+    ]
+
+    resolved = await asyncio.gather(
+        *(_resolve(loop, host, port) for host, port in targets),
+        return_exceptions=True,
+    )
+
+    transport, protocol = await loop.create_datagram_endpoint(
+        _QueryProtocol, family=socket.AF_INET
+    )
+    try:
+        # Several targets may resolve to one address; query it once.
+        waiters: Dict[Address, Tuple[asyncio.Future, Optional[asyncio.Future], float]] = {}
+        for addr in resolved:
+            if isinstance(addr, BaseException) or addr in waiters:
+                continue
+            status_fut = protocol.expect(addr, STATUS_RESPONSE)
+            info_fut = protocol.expect(addr, INFO_RESPONSE) if with_info else None
+            sent_at = time.perf_counter()
+            transport.sendto(STATUS_QUERY, addr)
+            if with_info:
+                transport.sendto(INFO_QUERY, addr)
+            waiters[addr] = (status_fut, info_fut, sent_at)
+
+        async def collect(addr: Address):
+            status_fut, info_fut, sent_at = waiters[addr]
+            futs = [status_fut] + ([info_fut] if info_fut is not None else [])
+            done, _ = await asyncio.wait(futs, timeout=timeout)
+            return addr, (
+                sent_at,
+                status_fut if status_fut in done else None,
+                info_fut if info_fut in done else None,
+            )
+
+        collected = dict(await asyncio.gather(*(collect(a) for a in waiters)))
+    finally:
+        transport.close()
+
+    for result, addr in zip(results, resolved):
+        if isinstance(addr, BaseException):
+            result["error"] = str(addr)
+            continue
+
+        sent_at, status_fut, info_fut = collected[addr]
+        if info_fut is not None:
+            result["getinfo"] = parse_info_response(info_fut.result()[0])
+        if status_fut is None:
+            result["error"] = "timed out"
+            continue
+
+        data, received_at = status_fut.result()
+        result["rtt_ms"] = round((received_at - sent_at) * 1000.0, 2)
+        parse_status_response(data, result, include_raw=include_raw)
+
+    return results
+
+
+def query_many(
+    targets: Iterable[Address],
+    timeout: float = 1.5,
+    with_info: bool = True,
+    include_raw: bool = True,
+) -> List[Dict[str, Any]]:
+    """Blocking wrapper around :func:`query_servers` for use from threads."""
+    return asyncio.run(
+        query_servers(targets, timeout=timeout, with_info=with_info, include_raw=include_raw)
+    )